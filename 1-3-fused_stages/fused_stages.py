@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Fused Stages Service
+
+Runs several consecutive pipeline stages in one process with a
+CompositeMessageProcessor. Cheap stages (validation is a handful of checks)
+then no longer cost a queue hop and a serialize/parse cycle each.
+
+FUSED_STAGES selects the stages, in pipeline order, e.g.
+
+    FUSED_STAGES=ingestion,validation,pii-scanning
+
+The service consumes the input queue of the first stage and publishes to the
+output queue of the last one, so it replaces those containers one-to-one.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from types import ModuleType
+
+from dotenv import load_dotenv
+
+# Ensure '/app' (the project root in containers) is on sys.path before importing 'shared'
+current_dir = Path(__file__).parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+
+from shared.tools.CompositeMessageProcessor import CompositeMessageProcessor
+from shared.tools.MessageProcessor import MessageProcessor
+from shared.tools.ServiceBusHandler import ServiceBusHandler
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+logging.getLogger("azure").setLevel(logging.WARNING)
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A stage that can be fused: where its code lives and which queues it uses."""
+
+    module: str
+    # Service directories in the container image and in the repository
+    dirs: tuple[str, ...]
+    processor: str
+    input_queue: str
+    output_queue: str
+
+
+# In pipeline order; only stages that run on a plain ServiceBusHandler can be fused
+STAGES: dict[str, Stage] = {
+    "ingestion": Stage(
+        module="data_ingestion",
+        dirs=("data_ingestion", "1-data_ingestion"),
+        processor="DataIngestionMessageProcessor",
+        input_queue=(
+            os.getenv("AZURE_DATA_INGESTION_QUEUE") or os.getenv("AZURE_DOCUMENT_INGESTION_QUEUE") or "ingestion"
+        ),
+        output_queue=os.getenv("AZURE_VALIDATION_QUEUE", "validation"),
+    ),
+    "validation": Stage(
+        module="validation",
+        dirs=("validation", "2-validation"),
+        processor="ValidationProcessor",
+        input_queue=os.getenv("AZURE_VALIDATION_QUEUE", "validation"),
+        output_queue=os.getenv("AZURE_PII_SCANNING_QUEUE", "pii-scanning"),
+    ),
+    "pii-scanning": Stage(
+        module="pii_scanning",
+        dirs=("pii_scanning", "3-pii_scanning"),
+        processor="PiiProcessor",
+        input_queue=os.getenv("AZURE_PII_SCANNING_QUEUE", "pii-scanning"),
+        output_queue=os.getenv("AZURE_EXTRACTOR_QUEUE", "extractor"),
+    ),
+}
+
+
+def parse_stages(value: str) -> list[str]:
+    """Validate a FUSED_STAGES value: known stages, consecutive, in pipeline order."""
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s) {', '.join(unknown)} (available: {', '.join(STAGES)})")
+    order = list(STAGES)
+    if not names or names != order[order.index(names[0]) : order.index(names[0]) + len(names)]:
+        raise ValueError(f"FUSED_STAGES must be consecutive stages in pipeline order: {', '.join(order)}")
+    return names
+
+
+def _load_module(stage: Stage) -> ModuleType:
+    # Service directories start with a digit locally, so they are loaded by path
+    for directory in stage.dirs:
+        path = parent_dir / directory / f"{stage.module}.py"
+        if path.exists():
+            spec = importlib.util.spec_from_file_location(stage.module, path)
+            assert spec and spec.loader
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[stage.module] = module
+            spec.loader.exec_module(module)
+            return module
+    raise FileNotFoundError(f"Code of stage {stage.module} not found in {', '.join(stage.dirs)}")
+
+
+def build_processor(names: list[str]) -> CompositeMessageProcessor:
+    stages: list[tuple[str, MessageProcessor]] = []
+    for name in names:
+        stage = STAGES[name]
+        processor_class = getattr(_load_module(stage), stage.processor)
+        stages.append((name, processor_class()))
+    return CompositeMessageProcessor(stages)
+
+
+def main() -> None:
+    """Main entry point for the Fused Stages Service."""
+    try:
+        connection_string = os.getenv("AZURE_SERVICEBUS_CONNECTION_STRING", "")
+        if not connection_string:
+            raise ValueError("AZURE_SERVICEBUS_CONNECTION_STRING not set")
+
+        names = parse_stages(os.getenv("FUSED_STAGES", "ingestion,validation,pii-scanning"))
+        first, last = STAGES[names[0]], STAGES[names[-1]]
+        logger.info("Fusing stages %s: %s -> %s", " -> ".join(names), first.input_queue, last.output_queue)
+
+        handler = ServiceBusHandler(
+            connection_string=connection_string,
+            input_queue=first.input_queue,
+            output_queue=last.output_queue,
+            message_processor=build_processor(names),
+            message_subject="document_processed",
+        )
+        handler.start()
+    except Exception as e:  # noqa: BLE001
+        logger.error("Failed to start Fused Stages Service: %s", e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+PDF extraction engine benchmark
+
+Runs every extraction engine over a local corpus of sample PDFs and reports
+pages/second, output size and failures per engine. When a reference engine is
+given, the word overlap with its output is reported as a rough correctness
+signal (an engine that is fast but drops half of the words is not a candidate).
+
+Example:
+    uv run data_ingestion/benchmark_extractors.py /data/sample-pdfs --reference pypdf2
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from pdf_extraction import ENGINES, extract_pdf_text
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger("benchmark_extractors")
+
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class EngineStats:
+    files: int = 0
+    failed: int = 0
+    empty: int = 0
+    pages: int = 0
+    chars: int = 0
+    seconds: float = 0.0
+    overlap: list[float] = field(default_factory=list)
+
+
+def _words(text: str) -> set[str]:
+    return set(_WORD.findall(text.lower()))
+
+
+def _overlap(text: str, reference: str) -> float:
+    """Share of the reference words that the engine also produced."""
+    ref = _words(reference)
+    return len(_words(text) & ref) / len(ref) if ref else 1.0
+
+
+def run(corpus: list[Path], engines: list[str], reference: str | None, repeat: int) -> dict[str, EngineStats]:
+    stats = {name: EngineStats() for name in engines}
+    reference_texts: dict[Path, str] = {}
+    if reference:
+        for path in corpus:
+            try:
+                reference_texts[path] = extract_pdf_text(str(path), parallel=False, engines=[reference]).text
+            except Exception:  # noqa: BLE001
+                reference_texts[path] = ""
+
+    for name in engines:
+        engine_stats = stats[name]
+        for path in corpus:
+            engine_stats.files += 1
+            try:
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    result = extract_pdf_text(str(path), parallel=False, engines=[name])
+                engine_stats.seconds += (time.perf_counter() - started) / repeat
+            except Exception as e:  # noqa: BLE001
+                engine_stats.failed += 1
+                logger.warning("  %s failed on %s: %s", name, path.name, e)
+                continue
+            engine_stats.pages += result.page_count
+            engine_stats.chars += len(result.text)
+            if not result.text:
+                engine_stats.empty += 1
+            if reference_texts.get(path):
+                engine_stats.overlap.append(_overlap(result.text, reference_texts[path]))
+    return stats
+
+
+def print_report(stats: dict[str, EngineStats]) -> None:
+    header = (
+        f"{'engine':<10} {'files':>6} {'failed':>6} {'empty':>6} {'pages':>7} {'pages/s':>9} "
+        f"{'chars':>11} {'chars/page':>10} {'overlap':>8}"
+    )
+    logger.info(header)
+    logger.info("-" * len(header))
+    ranked = sorted(stats.items(), key=lambda item: item[1].pages / item[1].seconds if item[1].seconds else 0.0)
+    for name, s in reversed(ranked):
+        pages_per_s = s.pages / s.seconds if s.seconds else 0.0
+        chars_per_page = s.chars / s.pages if s.pages else 0.0
+        overlap = f"{sum(s.overlap) / len(s.overlap):.3f}" if s.overlap else "-"
+        logger.info(
+            f"{name:<10} {s.files:>6} {s.failed:>6} {s.empty:>6} {s.pages:>7} {pages_per_s:>9.1f} "
+            f"{s.chars:>11} {chars_per_page:>10.0f} {overlap:>8}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare PDF text extraction engines on a local corpus.")
+    parser.add_argument("corpus", help="Directory with sample PDFs (searched recursively)")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="Comma-separated engines to compare")
+    parser.add_argument("--reference", help="Engine whose output is used to compute word overlap")
+    parser.add_argument("--repeat", type=int, default=1, help="Extractions per file (timings are averaged)")
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N files")
+    args = parser.parse_args()
+
+    corpus = sorted(Path(args.corpus).rglob("*.pdf"))
+    if args.limit:
+        corpus = corpus[: args.limit]
+    if not corpus:
+        parser.error(f"No PDFs found under {args.corpus}")
+
+    engines = [name.strip() for name in args.engines.split(",") if name.strip()]
+    logger.info("Benchmarking %s on %d PDFs\n", ", ".join(engines), len(corpus))
+    print_report(run(corpus, engines, args.reference, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
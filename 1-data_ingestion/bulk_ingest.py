@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Bulk Ingestion CLI
+
+Ingests many documents at once without hand-crafting Service Bus messages.
+Sources can be a directory, a glob pattern or a JSONL/CSV manifest of URLs.
+Documents are downloaded with bounded asyncio concurrency (global and per
+host), extracted in a process pool and published to the validation queue in
+batches. Published document ids are appended to a checkpoint file so an
+interrupted backfill resumes where it stopped.
+
+As in the live ingestion service, URLs fetched before are requested
+conditionally (an unchanged document is skipped on 304 Not Modified) and
+documents with more than DOCUMENT_SPLIT_PAGES pages are published as parts.
+
+Examples:
+    uv run data_ingestion/bulk_ingest.py --dir /uploads/staatscourant
+    uv run data_ingestion/bulk_ingest.py --glob "/data/**/*.pdf"
+    uv run data_ingestion/bulk_ingest.py --manifest urls.jsonl --concurrency 64 --per-host 8
+
+Manifest rows need a ``url`` field and may set ``id``, ``name`` and ``source``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse
+
+import aiohttp
+from dotenv import load_dotenv
+
+# Ensure '/app' (the project root in containers) is on sys.path before importing 'shared'
+current_dir = Path(__file__).parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from extraction_cache import get_cached_extraction, sha256_file, store_extraction
+from fetch_state import conditional_headers, get_fetch_state, store_fetch_state
+from pdf_extraction import ExtractionResult, extract_pdf_text
+from text_normalization import NORMALIZATION_ENABLED, normalize_pages
+
+from shared.models.messages import AppMessage, DocumentData
+from shared.tools.document_parts import part_info, split_pages
+from shared.tools.pipeline_status import update_status
+from shared.tools.ServiceBusPublisher import ServiceBusPublisher
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+logging.getLogger("azure").setLevel(logging.WARNING)
+logger = logging.getLogger("bulk_ingest")
+
+# Documents with more pages than this are published as parts of at most this many pages (0 = never split)
+DOCUMENT_SPLIT_PAGES = int(os.getenv("DOCUMENT_SPLIT_PAGES", "0"))
+
+
+@dataclass
+class IngestItem:
+    """One document to ingest: a local path or a URL."""
+
+    id: str
+    url: str
+    name: str
+    source: str
+
+
+@dataclass
+class Download:
+    """A downloaded (or local) PDF and the HTTP validators to store for its URL."""
+
+    path: str | None
+    etag: str | None = None
+    last_modified: str | None = None
+    # True when the server answered 304 Not Modified (nothing was downloaded)
+    unchanged: bool = False
+    previous: dict[str, Any] | None = None
+
+
+@dataclass
+class BulkStats:
+    total: int = 0
+    skipped: int = 0
+    published: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    bytes: int = 0
+    started: float = 0.0
+
+    def report(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        done = self.published + self.unchanged + self.failed
+        return (
+            f"{done}/{self.total} done ({self.published} published, {self.unchanged} unchanged, "
+            f"{self.failed} failed, {self.skipped} skipped) | {done / elapsed:.1f} docs/s | "
+            f"{self.bytes / elapsed / 1024**2:.2f} MB/s"
+        )
+
+
+def _doc_id(url: str) -> str:
+    # Deterministic so a resumed run recognises documents it already published
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, url))
+
+
+def _item(url: str, source: str, doc_id: str | None = None, name: str | None = None) -> IngestItem:
+    return IngestItem(
+        id=doc_id or _doc_id(url),
+        url=url,
+        name=name or os.path.basename(urlparse(url).path) or url,
+        source=source,
+    )
+
+
+def iter_items(args: argparse.Namespace) -> Iterator[IngestItem]:
+    """Yield the documents described by --dir, --glob or --manifest."""
+    if args.dir:
+        for path in sorted(Path(args.dir).rglob("*.pdf")):
+            yield _item(str(path.resolve()), args.source)
+    elif args.glob:
+        for path in sorted(glob.glob(args.glob, recursive=True)):
+            yield _item(str(Path(path).resolve()), args.source)
+    elif args.manifest:
+        with open(args.manifest, encoding="utf-8", newline="") as file:
+            if args.manifest.endswith(".csv"):
+                rows: Iterator[dict] = csv.DictReader(file)
+            else:
+                rows = (json.loads(line) for line in file if line.strip())
+            for row in rows:
+                if not row.get("url"):
+                    logger.warning("Skipping manifest row without url: %s", row)
+                    continue
+                yield _item(row["url"], row.get("source") or args.source, row.get("id"), row.get("name"))
+
+
+def load_checkpoint(path: str) -> set[str]:
+    """Return the ids already published (or found unchanged) by a previous run."""
+    if not os.path.exists(path):
+        return set()
+    done: set[str] = set()
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a partially written last line after a crash
+            if entry.get("status") in {"published", "unchanged"}:
+                done.add(entry["id"])
+    return done
+
+
+def _document_id(message: AppMessage) -> str | None:
+    """Id of the document a message belongs to: the parent for a part, else its own id."""
+    info = part_info(message)
+    if info is not None:
+        return info.parent_document_id
+    return message.data.id if message.data else None
+
+
+def _extract_file(path: str) -> tuple[list[str], str, dict[str, int | float]]:
+    """Hash, extract and normalize one PDF. Runs in a worker process."""
+    content_sha256 = sha256_file(path)
+    pages = get_cached_extraction(content_sha256)
+    if pages is None:
+        # The pool already parallelises across documents, so no nested pool per document; the time
+        # budget is enforced by an alarm in this worker (pages stuck in C code, e.g. PDFium, are not interrupted)
+        result = extract_pdf_text(path, parallel=False)
+        if result.text:
+            store_extraction(content_sha256, result.pages)
+        pages = result.pages
+    if not NORMALIZATION_ENABLED:
+        return pages, content_sha256, {}
+    normalized = normalize_pages(pages)
+    return normalized.pages, content_sha256, normalized.stats()
+
+
+class BulkIngestor:
+    """Downloads, extracts and publishes documents with bounded concurrency."""
+
+    def __init__(self, args: argparse.Namespace, publisher: ServiceBusPublisher) -> None:
+        self.args = args
+        self.publisher = publisher
+        self.stats = BulkStats()
+        self.pending: list[AppMessage] = []
+        # URL validators of the pending documents (url, etag, last_modified, content_sha256), stored once the
+        # document is published: stored earlier, a rerun after a failed batch would get a 304 and skip it
+        self.pending_fetch_state: dict[str, tuple[str, str | None, str | None, str]] = {}
+        self.publish_lock = asyncio.Lock()
+        self.checkpoint = open(args.checkpoint, "a", encoding="utf-8")
+        self.pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _checkpoint(self, doc_ids: list[str], status: str) -> None:
+        for doc_id in doc_ids:
+            self.checkpoint.write(json.dumps({"id": doc_id, "status": status}) + "\n")
+        self.checkpoint.flush()
+
+    async def _update_status(self, doc_id: str, status: str, **extra: Any) -> None:
+        """Record the ingestion status; a MongoDB error is logged instead of failing the document or the run."""
+        try:
+            await asyncio.to_thread(update_status, "ingestion", doc_id, status, **extra)
+        except Exception as e:  # noqa: BLE001
+            logger.warning("Could not update the status of %s to %s: %s", doc_id, status, e)
+
+    async def _download(self, session: aiohttp.ClientSession, item: IngestItem) -> Download | None:
+        """Return a local path for the item (downloading URLs to a temp file)."""
+        if os.path.exists(item.url):
+            self.stats.bytes += os.path.getsize(item.url)
+            return Download(item.url)
+        state = None if self.args.force_refetch else await asyncio.to_thread(get_fetch_state, item.url)
+        async with session.get(item.url, headers=conditional_headers(state), ssl=False) as response:
+            if response.status == 304:
+                return Download(None, unchanged=True, previous=state)
+            if response.status != 200:
+                logger.error("Error downloading %s: %s", item.url, response.status)
+                return None
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+                try:
+                    async for block in response.content.iter_chunked(1 << 16):
+                        temp_file.write(block)
+                        self.stats.bytes += len(block)
+                except BaseException:
+                    # A timeout or reset mid-download (or a cancelled run) must not leave the file behind
+                    temp_file.close()
+                    os.remove(temp_file.name)
+                    raise
+                return Download(temp_file.name, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+    async def _ingest(self, session: aiohttp.ClientSession, item: IngestItem) -> None:
+        path = None
+        try:
+            download = await self._download(session, item)
+            if download is None:
+                raise RuntimeError("download_failed")
+            if download.unchanged:
+                logger.info("Not modified since last fetch: %s", item.url)
+                self.stats.unchanged += 1
+                self._checkpoint([item.id], "unchanged")
+                previous = download.previous or {}
+                await self._update_status(
+                    item.id,
+                    "unchanged",
+                    url=item.url,
+                    content_sha256=previous.get("content_sha256"),
+                    previous_document_id=previous.get("document_id"),
+                )
+                return
+            path = download.path
+            assert path is not None
+            pages, content_sha256, normalization = await asyncio.get_running_loop().run_in_executor(
+                self.pool, _extract_file, path
+            )
+            extraction = ExtractionResult(pages=pages)
+            if not extraction.text:
+                raise RuntimeError("extraction_failed")
+        except Exception as e:  # noqa: BLE001
+            logger.error("Failed to ingest %s: %s", item.url, e)
+            self.stats.failed += 1
+            self._checkpoint([item.id], "failed")
+            await self._update_status(item.id, "error", reason=str(e))
+            return
+        finally:
+            if path and path != item.url:
+                os.remove(path)
+        if download.etag or download.last_modified:
+            self.pending_fetch_state[item.id] = (item.url, download.etag, download.last_modified, content_sha256)
+
+        message = AppMessage(
+            data=DocumentData(
+                source=item.source,
+                id=item.id,
+                name=item.name,
+                url=item.url,
+                extension="pdf",
+                payload={
+                    "extracted_text": extraction.text,
+                    "page_count": extraction.page_count,
+                    "content_sha256": content_sha256,
+                    **({"normalization": normalization} if normalization else {}),
+                },
+            )
+        )
+        messages = [message]
+        if DOCUMENT_SPLIT_PAGES > 0:
+            messages = split_pages(message, extraction.pages, DOCUMENT_SPLIT_PAGES)
+            if len(messages) > 1:
+                logger.info("Split %s (%d pages) into %d parts", item.id, extraction.page_count, len(messages))
+        # Added at once, so all parts of a document are published (and checkpointed) in the same batch
+        self.pending.extend(messages)
+        if len(self.pending) >= self.args.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Publish the pending messages as one batch and checkpoint them."""
+        async with self.publish_lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, []
+            # Messages per document: more than one for a document published as parts
+            part_counts = Counter(doc_id for doc_id in map(_document_id, batch) if doc_id)
+            doc_ids = list(part_counts)
+            fetch_states = {
+                doc_id: self.pending_fetch_state.pop(doc_id) for doc_id in doc_ids if doc_id in self.pending_fetch_state
+            }
+            ok = await asyncio.to_thread(self.publisher.publish_batch_messages, [m.to_dict() for m in batch])
+            if not ok:
+                logger.error("Failed to publish a batch of %d messages", len(batch))
+                self.stats.failed += len(doc_ids)
+                self._checkpoint(doc_ids, "failed")
+                return
+            self.stats.published += len(doc_ids)
+            self._checkpoint(doc_ids, "published")
+            for doc_id, (url, etag, last_modified, content_sha256) in fetch_states.items():
+                await asyncio.to_thread(store_fetch_state, url, etag, last_modified, content_sha256, doc_id)
+            for doc_id, part_count in part_counts.items():
+                extra = {"part_count": part_count} if part_count > 1 else {}
+                await self._update_status(doc_id, "ok", source="bulk", **extra)
+
+    async def _progress(self) -> None:
+        while True:
+            await asyncio.sleep(self.args.progress_interval)
+            logger.info(self.stats.report())
+
+    async def _worker(self, session: aiohttp.ClientSession, queue: asyncio.Queue[IngestItem | None]) -> None:
+        while (item := await queue.get()) is not None:
+            await self._ingest(session, item)
+
+    async def run(self, items: Iterator[IngestItem]) -> BulkStats:
+        done = load_checkpoint(self.args.checkpoint)
+        if done:
+            logger.info("Resuming: %d documents already published according to %s", len(done), self.args.checkpoint)
+
+        self.stats.started = time.monotonic()
+        queue: asyncio.Queue[IngestItem | None] = asyncio.Queue(maxsize=self.args.concurrency * 2)
+        connector = aiohttp.TCPConnector(limit=self.args.concurrency, limit_per_host=self.args.per_host)
+        timeout = aiohttp.ClientTimeout(total=self.args.timeout)
+        progress = asyncio.create_task(self._progress())
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                workers = [asyncio.create_task(self._worker(session, queue)) for _ in range(self.args.concurrency)]
+                for item in items:
+                    self.stats.total += 1
+                    if item.id in done:
+                        self.stats.skipped += 1
+                        continue
+                    await queue.put(item)
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+            await self.flush()
+        finally:
+            progress.cancel()
+            self.pool.shutdown()
+            self.checkpoint.close()
+        logger.info("Finished: %s", self.stats.report())
+        return self.stats
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk-ingest PDFs into the document pipeline.")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--dir", help="Directory scanned recursively for *.pdf")
+    src.add_argument("--glob", help="Glob pattern of PDF files (supports **)")
+    src.add_argument("--manifest", help="JSONL or CSV manifest with a 'url' column")
+    parser.add_argument("--source", default="bulk-ingest", help="Source recorded on each document")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum downloads in flight")
+    parser.add_argument("--per-host", type=int, default=4, help="Maximum downloads in flight per host")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction processes")
+    parser.add_argument("--batch-size", type=int, default=100, help="Messages per publish batch")
+    parser.add_argument("--timeout", type=float, default=120, help="Download timeout per document (s)")
+    parser.add_argument(
+        "--force-refetch", action="store_true", help="Download every URL, even if unchanged since the last fetch"
+    )
+    parser.add_argument("--checkpoint", default="bulk_ingest.checkpoint.jsonl", help="Checkpoint file")
+    parser.add_argument("--progress-interval", type=float, default=10, help="Seconds between progress lines")
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    connection_string = os.getenv("AZURE_SERVICEBUS_CONNECTION_STRING", "")
+    output_queue = os.getenv("AZURE_VALIDATION_QUEUE", "validation")
+    if not connection_string:
+        logger.error("AZURE_SERVICEBUS_CONNECTION_STRING not set")
+        sys.exit(1)
+
+    publisher = ServiceBusPublisher(connection_string, output_queue)
+    try:
+        stats = asyncio.run(BulkIngestor(args, publisher).run(iter_items(args)))
+    except KeyboardInterrupt:
+        logger.info("Interrupted; rerun with the same --checkpoint to resume")
+        sys.exit(130)
+    finally:
+        publisher.close()
+    sys.exit(1 if stats.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,11 @@ import logging
 import os
 import sys
 import tempfile
+import threading
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
-import PyPDF2
 import requests  # type: ignore
 import urllib3
 from dotenv import load_dotenv
@@ -23,9 +25,17 @@ current_dir = Path(__file__).parent
 parent_dir = current_dir.parent
 if str(parent_dir) not in sys.path:
     sys.path.insert(0, str(parent_dir))
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
 
 # Import shared modules after path is set
+from extraction_cache import get_cached_extraction, sha256_file, store_extraction
+from fetch_state import conditional_headers, get_fetch_state, store_fetch_state
+from pdf_extraction import ExtractionResult, ExtractionTimeoutError, extract_pdf_text
+from text_normalization import NORMALIZATION_ENABLED, normalize_pages
+
 from shared.models.messages import AppMessage
+from shared.tools.document_parts import split_pages
 from shared.tools.MessageProcessor import MessageProcessor
 from shared.tools.pipeline_status import update_status
 from shared.tools.ServiceBusHandler import ServiceBusHandler
@@ -42,22 +52,76 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(
 logging.getLogger("azure").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
+# Documents with more pages than this are split into parts of at most this many pages (0 = never split)
+DOCUMENT_SPLIT_PAGES = int(os.getenv("DOCUMENT_SPLIT_PAGES", "0"))
+
+
+@dataclass
+class IngestedPdf:
+    """Extraction outcome for one PDF, keyed by the SHA-256 of its bytes."""
+
+    extraction: ExtractionResult | None
+    content_sha256: str | None
+    cache_hit: bool = False
+    # True when the server answered 304 Not Modified (nothing was downloaded)
+    unchanged: bool = False
+    previous: dict[str, Any] | None = None
+    # Validators of the download, stored for the next conditional fetch once the output is published
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+def _validators(response: requests.Response | None) -> dict[str, str | None]:
+    """ETag/Last-Modified of a download, for IngestedPdf (none for a local file)."""
+    if response is None:
+        return {}
+    return {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
 
 class DataIngestionMessageProcessor(MessageProcessor):
     """Processor that downloads PDFs, extracts text, and builds AppMessage."""
 
+    def __init__(self) -> None:
+        # Fetch state per document id, waiting for the document's output to be published: stored any
+        # earlier, a failed publish followed by a redelivery would get a 304 and drop the document
+        self._pending_fetch_state: dict[str, tuple[str, str | None, str | None, str | None]] = {}
+        self._lock = threading.Lock()
+
+    def on_published(self, message: AppMessage) -> None:
+        """Store the URL validators of a document whose output reached the validation queue."""
+        document_id = (message.data.id or message.data.name) if message.data else None
+        if not document_id:
+            return
+        with self._lock:
+            pending = self._pending_fetch_state.pop(document_id, None)
+        if pending is not None:
+            url, etag, last_modified, content_sha256 = pending
+            store_fetch_state(url, etag, last_modified, content_sha256, document_id)
+
     @staticmethod
-    def download_and_extract_pdf_text(url: str) -> str | None:
+    def download_and_extract_pdf(
+        url: str, document_id: str | None = None, conditional: bool = True
+    ) -> IngestedPdf | None:
         """
         Download PDF from URL and extract its text content.
 
+        URLs fetched before are requested with If-None-Match/If-Modified-Since;
+        a 304 response returns an IngestedPdf flagged ``unchanged`` without any
+        download or extraction. The SHA-256 of the PDF bytes is then looked up in
+        the extraction cache; on a hit the cached pages are reused. The validators
+        of a download are returned, not stored: the caller stores them once the
+        document is published.
+
         Args:
             url: URL of the PDF document to download and process
+            document_id: Pipeline id of the document
+            conditional: Send conditional request headers for known URLs
 
         Returns:
-            Extracted text content from the PDF, or None if an error occurs
+            The extracted pages and content hash, or None if an error occurs
         """
         temp_file_path = None
+        response = None
 
         try:
             # If the 'url' is actually a local path (shared volume), read directly
@@ -67,7 +131,12 @@ class DataIngestionMessageProcessor(MessageProcessor):
             else:
                 # Download the PDF without SSL verification
                 logger.info(f"Downloading PDF from {url}...")
-                response = requests.get(url, verify=False, timeout=30)
+                state = get_fetch_state(url) if conditional else None
+                response = requests.get(url, headers=conditional_headers(state), verify=False, timeout=30)
+
+                if response.status_code == 304:
+                    logger.info("PDF not modified since last fetch: %s", url)
+                    return IngestedPdf(None, (state or {}).get("content_sha256"), unchanged=True, previous=state)
 
                 if response.status_code != 200:
                     logger.error(f"Error downloading PDF: {response.status_code}")
@@ -78,31 +147,36 @@ class DataIngestionMessageProcessor(MessageProcessor):
                     temp_file_path = temp_file.name
                     temp_file.write(response.content)
 
-            # Extract text from the PDF
-            with open(temp_file_path, "rb") as file:
-                try:
-                    pdf_reader = PyPDF2.PdfReader(file)
-
-                    # Extract text from all pages
-                    text = ""
-                    for page_num in range(len(pdf_reader.pages)):
-                        page = pdf_reader.pages[page_num]
-                        page_text = page.extract_text()
-                        if page_text:  # Some pages may not have text
-                            text += page_text + "\n"
-
-                    logger.info(
-                        "Successfully extracted text from PDF (%d chars)",
-                        len(text),
-                    )
-                    return text
+            content_sha256 = sha256_file(temp_file_path)
+            cached_pages = get_cached_extraction(content_sha256)
+            if cached_pages is not None:
+                logger.info("Extraction cache hit for %s (%d pages)", content_sha256, len(cached_pages))
+                # The same PDF may be served by several URLs: each one still gets its validators
+                return IngestedPdf(
+                    ExtractionResult(pages=cached_pages), content_sha256, cache_hit=True, **_validators(response)
+                )
 
-                except Exception as e:  # noqa: BLE001
-                    logger.error(f"Error processing PDF: {e}")
-                    return None
+            # Extract text from the PDF (large documents are split across a process pool)
+            try:
+                result = extract_pdf_text(temp_file_path)
+            except ExtractionTimeoutError as e:
+                logger.error(f"PDF extraction aborted: {e}")
+                return None
+            except Exception as e:  # noqa: BLE001
+                logger.error(f"Error processing PDF: {e}")
+                return None
+
+            logger.info(
+                "Successfully extracted text from PDF (%d pages, %d chars)",
+                result.page_count,
+                len(result.text),
+            )
+            if result.text:
+                store_extraction(content_sha256, result.pages)
+            return IngestedPdf(result, content_sha256, **_validators(response))
 
         except Exception as e:  # noqa: BLE001
-            logger.error(f"Error in download_and_extract_pdf_text: {e}")
+            logger.error(f"Error in download_and_extract_pdf: {e}")
             return None
 
         finally:
@@ -123,7 +197,7 @@ class DataIngestionMessageProcessor(MessageProcessor):
                     except OSError:
                         pass
 
-    def process(self, message: AppMessage) -> AppMessage | None:
+    def process(self, message: AppMessage) -> AppMessage | list[AppMessage] | None:
         try:
             if message.data is None:
                 logger.error("Missing data block in message")
@@ -152,19 +226,87 @@ class DataIngestionMessageProcessor(MessageProcessor):
                 return None
 
             # Download and extract text from PDF
-            extracted_text = DataIngestionMessageProcessor.download_and_extract_pdf_text(pdf_url)
             document_id = message.data.id or message.data.name
-            if not extracted_text:
+            payload = dict(message.data.payload or {})
+            ingested = DataIngestionMessageProcessor.download_and_extract_pdf(
+                pdf_url, document_id, conditional=not payload.get("force_refetch", False)
+            )
+            if ingested is not None and ingested.unchanged:
+                # Nothing changed since the last ingestion: stop here instead of re-running the pipeline
+                if document_id:
+                    previous = ingested.previous or {}
+                    update_status(
+                        "ingestion",
+                        document_id,
+                        "unchanged",
+                        url=pdf_url,
+                        content_sha256=ingested.content_sha256,
+                        previous_document_id=previous.get("document_id"),
+                    )
+                return None
+            if ingested is None or ingested.extraction is None or not ingested.extraction.text:
                 if document_id:
                     update_status("ingestion", document_id, "error", reason="extraction_failed")
                 return None
 
-            # Merge payload with extracted_text
-            payload = dict(message.data.payload or {})
-            payload["extracted_text"] = extracted_text
+            # Strip layout noise (hyphenation, headers/footers, page numbers) before the text
+            # fans out to Gemini, chunking and every queue in between
+            pages = ingested.extraction.pages
+            normalization: dict[str, Any] = {}
+            if NORMALIZATION_ENABLED:
+                normalized = normalize_pages(pages)
+                pages = normalized.pages
+                normalization = normalized.stats()
+                logger.info(
+                    "Normalized text: %d -> %d chars (-%.1f%%)",
+                    normalized.original_chars,
+                    normalized.normalized_chars,
+                    normalized.shrink_ratio * 100,
+                )
+            extraction = ExtractionResult(pages=pages, engine=ingested.extraction.engine)
+
+            # Merge payload with extracted_text; the content hash is a stable key for later stages
+            payload["extracted_text"] = extraction.text
+            payload["page_count"] = extraction.page_count
+            payload["content_sha256"] = ingested.content_sha256
+            if normalization:
+                payload["normalization"] = normalization
             message.data.payload = payload
+
+            # Oversized documents continue as page-range parts so replicas can share the work;
+            # data storage reassembles them under the original id
+            parts = [message]
+            if DOCUMENT_SPLIT_PAGES > 0 and message.data.id:
+                parts = split_pages(message, extraction.pages, DOCUMENT_SPLIT_PAGES)
             if document_id:
-                update_status("ingestion", document_id, "ok")
+                extra: dict[str, Any] = {"part_count": len(parts)} if len(parts) > 1 else {}
+                if normalization:
+                    extra["normalization"] = normalization
+                update_status(
+                    "ingestion",
+                    document_id,
+                    "ok",
+                    content_sha256=ingested.content_sha256,
+                    cache_hit=ingested.cache_hit,
+                    engine=extraction.engine,
+                    **extra,
+                )
+            if document_id and (ingested.etag or ingested.last_modified) and ingested.content_sha256:
+                with self._lock:
+                    self._pending_fetch_state[document_id] = (
+                        pdf_url,
+                        ingested.etag,
+                        ingested.last_modified,
+                        ingested.content_sha256,
+                    )
+            if len(parts) > 1:
+                logger.info(
+                    "Split document %s (%d pages) into %d parts",
+                    document_id,
+                    extraction.page_count,
+                    len(parts),
+                )
+                return parts
             return message
 
         except json.JSONDecodeError as e:  # noqa: BLE001
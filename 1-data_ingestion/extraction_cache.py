@@ -0,0 +1,96 @@
+"""
+Extraction cache for the Data Ingestion Service.
+
+Extracted pages are stored in a capped MongoDB collection keyed by the
+SHA-256 of the PDF bytes, so re-ingesting the same file (repeated uploads,
+the same URL from several sources) skips parsing. The capped collection
+bounds the cache size; MongoDB evicts the oldest entries first.
+
+The cache is best-effort: any MongoDB error is logged and treated as a miss.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import logging
+import os
+
+from pymongo.collection import Collection
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, PyMongoError
+
+from shared.tools.mongo import get_database
+
+__all__ = ["get_cached_extraction", "sha256_file", "store_extraction"]
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() in {"true", "1", "yes"}
+CACHE_COLLECTION = os.getenv("EXTRACTION_CACHE_COLLECTION", "extraction_cache")
+# Total size of the capped collection; oldest entries are evicted beyond this
+CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(1024**3)))
+# Larger extractions are not cached (MongoDB documents are limited to 16 MB)
+CACHE_MAX_ENTRY_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRY_BYTES", str(8 * 1024**2)))
+
+_collection: Collection | None = None
+
+
+def sha256_file(path: str) -> str:
+    """Return the hex SHA-256 digest of a file, read in streaming fashion."""
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def _get_collection() -> Collection:
+    global _collection
+    if _collection is None:
+        db = get_database()
+        if CACHE_COLLECTION not in db.list_collection_names():
+            try:
+                db.create_collection(CACHE_COLLECTION, capped=True, size=CACHE_MAX_BYTES)
+                logger.info("Created capped extraction cache '%s' (%d bytes)", CACHE_COLLECTION, CACHE_MAX_BYTES)
+            except CollectionInvalid:
+                # Another replica created it in the meantime
+                pass
+        _collection = db[CACHE_COLLECTION]
+    return _collection
+
+
+def get_cached_extraction(content_sha256: str) -> list[str] | None:
+    """Return the cached pages for a PDF hash, or None on a miss."""
+    if not CACHE_ENABLED:
+        return None
+    try:
+        doc = _get_collection().find_one({"_id": content_sha256}, {"pages": 1})
+    except PyMongoError as e:
+        logger.warning("Extraction cache lookup failed: %s", e)
+        return None
+    if not doc or not isinstance(doc.get("pages"), list):
+        return None
+    return [str(page) for page in doc["pages"]]
+
+
+def store_extraction(content_sha256: str, pages: list[str]) -> bool:
+    """Store the extracted pages of a PDF. Returns True if the entry was written."""
+    if not CACHE_ENABLED:
+        return False
+    size = sum(len(page.encode("utf-8")) for page in pages)
+    if size > CACHE_MAX_ENTRY_BYTES:
+        logger.info("Extraction too large to cache (%d bytes)", size)
+        return False
+    try:
+        _get_collection().insert_one(
+            {
+                "_id": content_sha256,
+                "pages": pages,
+                "page_count": len(pages),
+                "size": size,
+                "created_at": dt.datetime.now(tz=dt.UTC).isoformat(),
+            }
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+    except PyMongoError as e:
+        logger.warning("Extraction cache store failed: %s", e)
+        return False
@@ -0,0 +1,80 @@
+"""
+Per-URL HTTP validators for conditional re-fetch.
+
+After a successful download the ``ETag`` and ``Last-Modified`` response
+headers are stored per URL. Later ingestions of the same URL send them back
+as ``If-None-Match`` / ``If-Modified-Since`` so an unchanged document can be
+answered with ``304 Not Modified`` instead of a full download.
+
+Like the extraction cache this is best-effort: MongoDB errors are logged and
+the document is simply fetched unconditionally.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import os
+from typing import Any
+
+from pymongo.errors import PyMongoError
+
+from shared.tools.mongo import get_collection
+
+__all__ = ["conditional_headers", "get_fetch_state", "store_fetch_state"]
+
+logger = logging.getLogger(__name__)
+
+CONDITIONAL_FETCH_ENABLED = os.getenv("CONDITIONAL_FETCH_ENABLED", "true").lower() in {"true", "1", "yes"}
+FETCH_STATE_COLLECTION = os.getenv("FETCH_STATE_COLLECTION", "url_fetch_state")
+
+
+def get_fetch_state(url: str) -> dict[str, Any] | None:
+    """Return the stored validators for a URL, or None if it was never fetched."""
+    if not CONDITIONAL_FETCH_ENABLED:
+        return None
+    try:
+        return get_collection(FETCH_STATE_COLLECTION).find_one({"_id": url})
+    except PyMongoError as e:
+        logger.warning("Fetch state lookup failed for %s: %s", url, e)
+        return None
+
+
+def conditional_headers(state: dict[str, Any] | None) -> dict[str, str]:
+    """Build If-None-Match / If-Modified-Since headers from a stored state."""
+    headers: dict[str, str] = {}
+    if not state:
+        return headers
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+    return headers
+
+
+def store_fetch_state(
+    url: str,
+    etag: str | None,
+    last_modified: str | None,
+    content_sha256: str,
+    document_id: str | None = None,
+) -> None:
+    """Remember the validators of a successful download (no-op if the server sent none)."""
+    if not CONDITIONAL_FETCH_ENABLED or not (etag or last_modified):
+        return
+    try:
+        get_collection(FETCH_STATE_COLLECTION).update_one(
+            {"_id": url},
+            {
+                "$set": {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "content_sha256": content_sha256,
+                    "document_id": document_id,
+                    "fetched_at": dt.datetime.now(tz=dt.UTC).isoformat(),
+                }
+            },
+            upsert=True,
+        )
+    except PyMongoError as e:
+        logger.warning("Could not store fetch state for %s: %s", url, e)
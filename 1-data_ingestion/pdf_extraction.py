@@ -0,0 +1,352 @@
+"""
+PDF text extraction helpers for the Data Ingestion Service.
+
+Text is extracted by pluggable engines (PyPDF2, pypdf, pdfminer.six,
+pypdfium2). PDF_EXTRACTION_ENGINES lists them in order of preference; when an
+engine fails on a file (or returns no text) the next one is tried.
+
+Every step runs in a process pool: the page count, small documents as a
+single page range, and documents with many pages split into page ranges that
+are extracted in parallel and reassembled in page order. Every document gets a
+time budget; when it is exceeded the pool is torn down so a pathological PDF
+(or a single pathological page) cannot keep a worker busy.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import cached_property
+from io import StringIO
+from multiprocessing.pool import AsyncResult, Pool
+from typing import Any, Protocol
+
+logger = logging.getLogger(__name__)
+
+# Engines to try, in order, separated by commas
+EXTRACTION_ENGINES = [
+    name.strip() for name in os.getenv("PDF_EXTRACTION_ENGINES", "pypdf2,pypdfium2").split(",") if name.strip()
+]
+
+# Documents with fewer pages than this are extracted by one pool worker as a single page range
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "50"))
+# Number of extraction processes (0 = one per CPU)
+EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", "0")) or os.cpu_count() or 1
+# Time budget per document, in seconds
+EXTRACTION_TIMEOUT = float(os.getenv("PDF_EXTRACTION_TIMEOUT", "300"))
+
+_pool: Pool | None = None
+
+
+class ExtractionTimeoutError(TimeoutError):
+    """Raised when a document exceeds its extraction time budget."""
+
+
+@dataclass
+class ExtractionResult:
+    """Text of every page of a PDF, in page order."""
+
+    pages: list[str]
+    engine: str | None = None
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    @cached_property
+    def text(self) -> str:
+        # Same layout as the historic loop: one trailing newline per non-empty page
+        return "".join(page + "\n" for page in self.pages if page)
+
+
+class PdfEngine(Protocol):
+    """A text extraction backend. Implementations import their library lazily."""
+
+    name: str
+
+    def page_count(self, path: str) -> int: ...
+
+    def iter_pages(self, path: str, start: int, stop: int) -> Iterator[str]:
+        """Yield the text of pages ``[start, stop)`` in order."""
+        ...
+
+
+class PyPDF2Engine:
+    name = "pypdf2"
+
+    def _reader(self, file):  # type: ignore[no-untyped-def]
+        import PyPDF2
+
+        return PyPDF2.PdfReader(file)
+
+    def page_count(self, path: str) -> int:
+        with open(path, "rb") as file:
+            return len(self._reader(file).pages)
+
+    def iter_pages(self, path: str, start: int, stop: int) -> Iterator[str]:
+        with open(path, "rb") as file:
+            reader = self._reader(file)
+            for i in range(start, stop):
+                yield reader.pages[i].extract_text() or ""
+
+
+class PypdfEngine(PyPDF2Engine):
+    """pypdf, the maintained successor of PyPDF2 (same reader API)."""
+
+    name = "pypdf"
+
+    def _reader(self, file):  # type: ignore[no-untyped-def]
+        import pypdf
+
+        return pypdf.PdfReader(file)
+
+
+class PdfminerEngine:
+    name = "pdfminer"
+
+    def page_count(self, path: str) -> int:
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfparser import PDFParser
+        from pdfminer.pdftypes import resolve1
+
+        with open(path, "rb") as file:
+            document = PDFDocument(PDFParser(file))
+            return int(resolve1(document.catalog["Pages"])["Count"])
+
+    def iter_pages(self, path: str, start: int, stop: int) -> Iterator[str]:
+        from pdfminer.converter import TextConverter
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+
+        resources = PDFResourceManager()
+        with open(path, "rb") as file:
+            for page in PDFPage.get_pages(file, pagenos=set(range(start, stop))):
+                out = StringIO()
+                device = TextConverter(resources, out, laparams=LAParams())
+                PDFPageInterpreter(resources, device).process_page(page)
+                device.close()
+                yield out.getvalue().rstrip("\x0c")
+
+
+class Pypdfium2Engine:
+    """PDFium (the Chrome PDF engine) through its C bindings; by far the fastest."""
+
+    name = "pypdfium2"
+
+    def page_count(self, path: str) -> int:
+        import pypdfium2
+
+        document = pypdfium2.PdfDocument(path)
+        try:
+            return len(document)
+        finally:
+            document.close()
+
+    def iter_pages(self, path: str, start: int, stop: int) -> Iterator[str]:
+        import pypdfium2
+
+        document = pypdfium2.PdfDocument(path)
+        try:
+            for i in range(start, stop):
+                page = document[i]
+                text_page = page.get_textpage()
+                try:
+                    # PDFium uses CRLF line endings and U+FFFE for a hyphenated line break;
+                    # normalise both to what the other engines return
+                    yield text_page.get_text_range().replace("\r\n", "\n").replace("\ufffe", "-\n")
+                finally:
+                    text_page.close()
+                    page.close()
+        finally:
+            document.close()
+
+
+ENGINES: dict[str, PdfEngine] = {
+    engine.name: engine for engine in (PyPDF2Engine(), PypdfEngine(), PdfminerEngine(), Pypdfium2Engine())
+}
+
+
+def get_engine(name: str) -> PdfEngine:
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown PDF extraction engine '{name}' (available: {', '.join(ENGINES)})") from None
+
+
+def _get_pool() -> Pool:
+    global _pool
+    if _pool is None:
+        # 'spawn' keeps workers independent of the Service Bus client threads in the parent
+        _pool = multiprocessing.get_context("spawn").Pool(processes=EXTRACTION_WORKERS)
+    return _pool
+
+
+def _reset_pool() -> None:
+    """Kill the worker processes (e.g. after a timeout) so the next document gets a fresh pool."""
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+
+
+def _page_count(engine_name: str, path: str) -> int:
+    """Count the pages of ``path``. Runs inside a pool worker."""
+    return get_engine(engine_name).page_count(path)
+
+
+def _extract_page_range(engine_name: str, path: str, start: int, stop: int) -> list[str]:
+    """Extract pages ``[start, stop)``. Runs inside a pool worker."""
+    return list(get_engine(engine_name).iter_pages(path, start, stop))
+
+
+def _page_ranges(page_count: int, workers: int) -> list[tuple[int, int]]:
+    # Two ranges per worker so a slow range does not leave the other workers idle
+    size = max(1, math.ceil(page_count / (workers * 2)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def _wait(async_result: AsyncResult, deadline: float, message: str) -> Any:
+    """Result of a pool task, tearing the pool down when it is not ready by ``deadline``."""
+    try:
+        return async_result.get(timeout=max(0.0, deadline - time.monotonic()))
+    except multiprocessing.TimeoutError as e:
+        _reset_pool()
+        raise ExtractionTimeoutError(message) from e
+
+
+@contextmanager
+def _alarm(deadline: float, budget: float) -> Iterator[None]:
+    """
+    Raise ExtractionTimeoutError in the calling thread once ``deadline`` passes.
+
+    Uses SIGALRM, so it only applies in the main thread of a process (e.g. a
+    process pool worker); elsewhere only the checks between pages apply. The
+    timer re-fires every second, in case an engine swallows the exception. It
+    interrupts Python code only: a page stuck inside PDFium's C code is not
+    interrupted until it returns.
+    """
+    if threading.current_thread() is not threading.main_thread() or not hasattr(signal, "setitimer"):
+        yield
+        return
+
+    def expire(_signum: int, _frame: Any) -> None:
+        raise ExtractionTimeoutError(f"Extraction exceeded {budget:.0f}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, max(deadline - time.monotonic(), 0.001), 1.0)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _extract_in_process(engine: PdfEngine, path: str, deadline: float, budget: float) -> ExtractionResult:
+    """Extract ``path`` in the calling process (already a worker), bounded by an alarm at the deadline."""
+    pages: list[str] = []
+    with _alarm(deadline, budget):
+        for page_text in engine.iter_pages(path, 0, engine.page_count(path)):
+            pages.append(page_text)
+            if time.monotonic() > deadline:
+                raise ExtractionTimeoutError(f"Extraction exceeded {budget:.0f}s after {len(pages)} pages")
+    return ExtractionResult(pages=pages, engine=engine.name)
+
+
+def _extract_with_engine(
+    engine: PdfEngine, path: str, deadline: float, budget: float, parallel: bool
+) -> ExtractionResult:
+    if not parallel:
+        return _extract_in_process(engine, path, deadline, budget)
+
+    # Parsing the document to count its pages can hang on a malformed file too
+    page_count = _wait(
+        _get_pool().apply_async(_page_count, (engine.name, path)), deadline, f"Counting pages exceeded {budget:.0f}s"
+    )
+
+    if page_count < PARALLEL_MIN_PAGES or EXTRACTION_WORKERS < 2:
+        # A single range on one worker, so one pathological page is bounded by the budget as well
+        pages = _wait(
+            _get_pool().apply_async(_extract_page_range, (engine.name, path, 0, page_count)),
+            deadline,
+            f"Extraction of {page_count} pages exceeded {budget:.0f}s",
+        )
+        return ExtractionResult(pages=pages, engine=engine.name)
+
+    ranges = _page_ranges(page_count, EXTRACTION_WORKERS)
+    logger.info(
+        "Extracting %d pages with %s in %d ranges across %d processes",
+        page_count,
+        engine.name,
+        len(ranges),
+        EXTRACTION_WORKERS,
+    )
+    async_result = _get_pool().starmap_async(
+        _extract_page_range, [(engine.name, path, start, stop) for start, stop in ranges]
+    )
+    # starmap keeps the input order, so the ranges come back in page order
+    parts = _wait(async_result, deadline, f"Extraction of {page_count} pages exceeded {budget:.0f}s")
+
+    return ExtractionResult(pages=[page for part in parts for page in part], engine=engine.name)
+
+
+def extract_pdf_text(
+    path: str,
+    timeout: float | None = None,
+    parallel: bool = True,
+    engines: list[str] | None = None,
+) -> ExtractionResult:
+    """
+    Extract the text of every page of a PDF file.
+
+    Engines are tried in order; the next one is used when an engine raises or
+    returns no text at all. The time budget covers all attempts.
+
+    Args:
+        path: Path of the PDF file on disk
+        timeout: Time budget in seconds (defaults to PDF_EXTRACTION_TIMEOUT)
+        parallel: Extract in the process pool, where the time budget is enforced
+            even inside a single page (disable when the caller already runs
+            inside a worker process; the budget is then enforced by SIGALRM in
+            a main thread, which cannot interrupt C code, and otherwise only
+            between pages)
+        engines: Engine names to try (defaults to PDF_EXTRACTION_ENGINES)
+
+    Returns:
+        ExtractionResult with one text entry per page
+
+    Raises:
+        ExtractionTimeoutError: if the document exceeds its time budget
+        Exception: the last engine error if every engine failed
+    """
+    budget = EXTRACTION_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + budget
+    names = engines or EXTRACTION_ENGINES
+
+    result: ExtractionResult | None = None
+    last_error: Exception | None = None
+    for name in names:
+        try:
+            result = _extract_with_engine(get_engine(name), path, deadline, budget, parallel)
+        except ExtractionTimeoutError:
+            raise
+        except Exception as e:  # noqa: BLE001
+            logger.warning("PDF engine %s failed on %s: %s", name, path, e)
+            last_error = e
+            continue
+        if result.text:
+            return result
+        logger.info("PDF engine %s returned no text for %s", name, path)
+
+    if result is not None:
+        return result
+    raise last_error or ValueError("No PDF extraction engine configured")
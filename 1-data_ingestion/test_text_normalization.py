@@ -0,0 +1,54 @@
+"""Tests for the text normalization of extracted PDF pages."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from text_normalization import normalize_pages  # noqa: E402
+
+
+def _page(number: int, body: str) -> str:
+    return f"Staatscourant 2024 nr. 12345\n\n{body}\n\nPagina {number} van 5"
+
+
+def test_drops_running_headers_footers_and_page_numbers() -> None:
+    subjects = ["subsidies", "vergunningen", "toezicht", "handhaving", "bezwaar"]
+    pages = [_page(i + 1, f"Artikel {3 * i + 1}\nDe  minister  stelt regels over {x}.") for i, x in enumerate(subjects)]
+    result = normalize_pages(pages)
+
+    assert len(result.pages) == 5
+    for i, page in enumerate(result.pages):
+        assert "Staatscourant" not in page
+        assert "Pagina" not in page
+        # A heading with a number that does not run with the page is kept
+        assert page.startswith(f"Artikel {3 * i + 1}")
+        assert f"De minister stelt regels over {subjects[i]}." in page
+    assert result.removed_lines == 10
+    assert result.normalized_chars < result.original_chars
+    assert 0 < result.shrink_ratio < 1
+
+
+def test_joins_hyphenated_words_but_keeps_compound_names() -> None:
+    result = normalize_pages(["De wetge-\nving in Noord-\nHolland\n\n\n\nis ge-\nwijzigd."])
+    assert result.pages == ["De wetgeving in Noord-\nHolland\n\nis gewijzigd."]
+
+
+def test_short_documents_keep_repeated_lines() -> None:
+    pages = ["Concept\nEerste pagina", "Concept\nTweede pagina"]
+    assert normalize_pages(pages).pages == pages
+
+
+def test_running_page_numbers_are_dropped() -> None:
+    result = normalize_pages(["Tekst een\n3", "- 4 -\nTekst twee", "Tekst drie\n2024\n5"])
+    assert result.pages == ["Tekst een", "Tekst twee", "Tekst drie\n2024"]
+
+
+def test_other_numbers_alone_on_a_line_are_kept() -> None:
+    # One page: a year, a list number and an amount cannot be told from a page number
+    pages = ["2024\nBesluit van de minister\n12"]
+    assert normalize_pages(pages).pages == pages
+    # A labelled page number is recognised anyway
+    assert normalize_pages(["Tekst van de pagina\nblz. 4"]).pages == ["Tekst van de pagina"]
@@ -0,0 +1,161 @@
+"""
+Text normalization for extracted PDF text.
+
+PDF extraction output carries a lot of layout noise: words hyphenated at line
+breaks, running headers and footers repeated on every page, page numbers and
+long whitespace runs. All of it travels through every queue, is sent to Gemini
+as tokens and ends up in chunks and embeddings. ``normalize_pages`` removes it
+in a single linear pass over the text:
+
+- lines that repeat in the top or bottom lines of most pages are dropped;
+  a line with a running number ("Pagina 3 van 12", "Stcrt. 2024, 17 | 3")
+  repeats when that number advances with the page, so "Artikel 5" heading
+  a page is kept;
+- page numbers at the top or bottom of a page are dropped when labelled
+  ("Pagina 3", "blz. 4") or when they run with the page index on several
+  pages; any other number alone on a line (a year, a list number, an
+  amount) is kept;
+- a word hyphenated at a line break is joined again ("wetge-\\nving");
+- runs of spaces/tabs become one space and blank line runs one blank line.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+__all__ = ["NORMALIZATION_ENABLED", "NormalizedText", "normalize_pages"]
+
+NORMALIZATION_ENABLED = os.getenv("TEXT_NORMALIZATION_ENABLED", "true").lower() in {"true", "1", "yes"}
+# Number of lines at the top and at the bottom of a page considered header/footer
+EDGE_LINES = int(os.getenv("TEXT_NORMALIZATION_EDGE_LINES", "3"))
+# Share of pages a header/footer line must appear on before it is dropped
+REPEAT_RATIO = float(os.getenv("TEXT_NORMALIZATION_REPEAT_RATIO", "0.6"))
+# Repetition is meaningless on very short documents
+MIN_PAGES = 3
+# Pages an unlabelled number must run with the page index on before it is taken for a page number
+MIN_RUNNING_PAGES = 2
+
+_SPACES = re.compile(r"[ \t\f\v\u00a0]+")
+_NUMBER = re.compile(r"\d{1,4}")
+_PAGE_NUMBER = re.compile(
+    r"^(?:[-–—]\s*)?(?P<label>(?:pagina|page|blz\.?|p\.)\s*)?(?P<number>\d{1,4})"
+    r"(?:\s*(?:van|of|/)\s*\d{1,4})?(?:\s*[-–—])?$",
+    re.IGNORECASE,
+)
+# Lowercase letter, hyphen, line break, lowercase letter: a word split by the layout.
+# "Noord-\nHolland" keeps its hyphen because the next line starts with a capital.
+_HYPHENATED = re.compile(r"(?<=[a-zà-ÿ])-\n(?=[a-zà-ÿ])")
+_BLANK_RUNS = re.compile(r"\n{3,}")
+
+
+@dataclass
+class NormalizedText:
+    """Normalized pages plus how much was removed."""
+
+    pages: list[str]
+    original_chars: int
+    normalized_chars: int
+    removed_lines: int
+
+    @property
+    def shrink_ratio(self) -> float:
+        """Share of the original characters that was removed (0.0 - 1.0)."""
+        if not self.original_chars:
+            return 0.0
+        return 1 - self.normalized_chars / self.original_chars
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "original_chars": self.original_chars,
+            "normalized_chars": self.normalized_chars,
+            "removed_lines": self.removed_lines,
+            "shrink_ratio": round(self.shrink_ratio, 4),
+        }
+
+
+def _edge_indexes(lines: list[str]) -> set[int]:
+    """Indexes of the first and last EDGE_LINES non-empty lines of a page."""
+    filled = [i for i, line in enumerate(lines) if line]
+    return set(filled[:EDGE_LINES] + filled[-EDGE_LINES:])
+
+
+def _line_keys(line: str, page_index: int) -> set[tuple[str, int, int]]:
+    """Keys under which a header/footer line repeats across pages.
+
+    The line itself, plus one key per number in it: the line with that number
+    masked and the offset between the number and the page index. A running
+    page number keeps the same offset on every page.
+    """
+    keys = {(line, -1, 0)}
+    for position, match in enumerate(_NUMBER.finditer(line)):
+        masked = line[: match.start()] + "#" + line[match.end() :]
+        keys.add((masked, position, int(match.group()) - page_index))
+    return keys
+
+
+def _page_number_offset(line: str, page_index: int) -> int | None:
+    """Offset between the number of a page-number-shaped line and the page index, or None."""
+    match = _PAGE_NUMBER.match(line)
+    return int(match["number"]) - page_index if match else None
+
+
+def _is_page_number(line: str, page_index: int, running: Counter[int]) -> bool:
+    """A labelled page number, or a number whose offset to the page index recurs on several pages."""
+    match = _PAGE_NUMBER.match(line)
+    if match is None:
+        return False
+    return bool(match["label"]) or running[int(match["number"]) - page_index] >= MIN_RUNNING_PAGES
+
+
+def normalize_pages(pages: list[str]) -> NormalizedText:
+    """
+    Normalize the text of every page of a document.
+
+    Args:
+        pages: Extracted text per page, in page order
+
+    Returns:
+        NormalizedText with the cleaned pages (same number and order) and
+        shrink statistics
+    """
+    split_pages = [[_SPACES.sub(" ", line).strip() for line in page.split("\n")] for page in pages]
+    edges = [_edge_indexes(lines) for lines in split_pages]
+
+    # Count on how many pages each header/footer key appears (once per page)
+    repeated: set[tuple[str, int, int]] = set()
+    if len(pages) >= MIN_PAGES:
+        counts: Counter[tuple[str, int, int]] = Counter()
+        for page_index, (lines, edge) in enumerate(zip(split_pages, edges, strict=True)):
+            counts.update(set().union(*(_line_keys(lines[i], page_index) for i in edge)))
+        threshold = max(MIN_PAGES, REPEAT_RATIO * len(pages))
+        repeated = {key for key, count in counts.items() if count >= threshold}
+
+    # On how many pages each page-number offset appears at an edge (once per page); a page number
+    # keeps the same offset from page to page, a year or list number at a page edge does not
+    running: Counter[int] = Counter()
+    for page_index, (lines, edge) in enumerate(zip(split_pages, edges, strict=True)):
+        running.update({offset for i in edge if (offset := _page_number_offset(lines[i], page_index)) is not None})
+
+    removed_lines = 0
+    normalized: list[str] = []
+    for page_index, (lines, edge) in enumerate(zip(split_pages, edges, strict=True)):
+        kept: list[str] = []
+        for i, line in enumerate(lines):
+            if i in edge and (
+                _is_page_number(line, page_index, running) or not repeated.isdisjoint(_line_keys(line, page_index))
+            ):
+                removed_lines += 1
+                continue
+            kept.append(line)
+        text = _HYPHENATED.sub("", "\n".join(kept))
+        normalized.append(_BLANK_RUNS.sub("\n\n", text).strip("\n"))
+
+    return NormalizedText(
+        pages=normalized,
+        original_chars=sum(len(page) for page in pages),
+        normalized_chars=sum(len(page) for page in normalized),
+        removed_lines=removed_lines,
+    )
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate index benchmark
+
+Fills an LSH index with synthetic MinHash signatures and measures lookup
+latency (p50/p95/p99) and recall for near-copies of indexed documents and
+for unrelated documents. Signatures are generated directly instead of from
+text so that building a 1M-document index takes about a minute.
+
+The in-memory index needs roughly 3.5 GB for 1M documents. The MongoDB
+backend measures the production path (MONGO_* variables as for the services)
+and writes to a throwaway collection that is dropped afterwards.
+
+Examples:
+    uv run validation/benchmark_near_duplicates.py --docs 1000000
+    uv run validation/benchmark_near_duplicates.py --docs 1000000 --backend mongo
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+current_dir = Path(__file__).parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from near_duplicates import NUM_PERM, MemoryLshIndex, MongoLshIndex, band_keys, find_near_duplicate, minhash_signature
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger("benchmark_near_duplicates")
+
+
+def _near_copy(signature: np.ndarray, similarity: float, rng: np.random.Generator) -> np.ndarray:
+    """A signature agreeing with the given one on ~similarity of its positions."""
+    copy = signature.copy()
+    changed = rng.random(NUM_PERM) >= similarity
+    copy[changed] = rng.integers(0, 2**32, size=int(changed.sum()), dtype=np.uint32)
+    return copy
+
+
+def _percentiles(samples: list[float]) -> str:
+    ms = np.array(samples) * 1000
+    return (
+        f"p50 {np.percentile(ms, 50):.3f} ms | p95 {np.percentile(ms, 95):.3f} ms | p99 {np.percentile(ms, 99):.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate index lookups.")
+    parser.add_argument("--docs", type=int, default=1_000_000, help="Documents in the index")
+    parser.add_argument("--queries", type=int, default=2000, help="Lookups per query type")
+    parser.add_argument("--similarity", type=float, default=0.95, help="Similarity of the near-copy queries")
+    parser.add_argument("--backend", choices=["memory", "mongo"], default="memory")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.backend == "mongo":
+        index: MemoryLshIndex | MongoLshIndex = MongoLshIndex(f"near_duplicate_benchmark_{args.seed}")
+        index.collection.drop()
+        index.collection.create_index("bands")
+    else:
+        index = MemoryLshIndex()
+
+    started = time.perf_counter()
+    batch = 10_000
+    sample: list[tuple[str, np.ndarray]] = []
+    for start in range(0, args.docs, batch):
+        signatures = rng.integers(0, 2**32, size=(min(batch, args.docs - start), NUM_PERM), dtype=np.uint32)
+        if isinstance(index, MongoLshIndex):
+            index.collection.insert_many(
+                [
+                    {"_id": f"doc-{start + i}", "bands": band_keys(sig), "signature": sig.tobytes()}
+                    for i, sig in enumerate(signatures)
+                ]
+            )
+        else:
+            for i, sig in enumerate(signatures):
+                index.add(f"doc-{start + i}", band_keys(sig), sig)
+        if len(sample) < args.queries:
+            sample.extend((f"doc-{start + i}", sig) for i, sig in enumerate(signatures[: args.queries - len(sample)]))
+        if (start // batch) % 10 == 0:
+            logger.info("  indexed %d documents", start + len(signatures))
+    logger.info("Indexed %d documents in %.1fs (%s)\n", args.docs, time.perf_counter() - started, args.backend)
+
+    found, near_latency = 0, []
+    for doc_id, sig in sample:
+        query = _near_copy(sig, args.similarity, rng)
+        t0 = time.perf_counter()
+        match = find_near_duplicate(index, "query", query, threshold=args.similarity - 0.1)
+        near_latency.append(time.perf_counter() - t0)
+        found += match is not None and match.document_id == doc_id
+
+    false_hits, miss_latency = 0, []
+    for _ in range(args.queries):
+        query = rng.integers(0, 2**32, size=NUM_PERM, dtype=np.uint32)
+        t0 = time.perf_counter()
+        false_hits += find_near_duplicate(index, "query", query) is not None
+        miss_latency.append(time.perf_counter() - t0)
+
+    text = " ".join(f"woord{i % 977}" for i in range(20_000))
+    t0 = time.perf_counter()
+    for _ in range(20):
+        minhash_signature(text)
+    signature_ms = (time.perf_counter() - t0) / 20 * 1000
+
+    logger.info(
+        "Near-copy lookups (similarity %.2f): %s | recall %.4f",
+        args.similarity,
+        _percentiles(near_latency),
+        found / len(sample),
+    )
+    logger.info("Unrelated lookups:                 %s | false positives %d", _percentiles(miss_latency), false_hits)
+    logger.info("Signature of a 20k-word document:  %.2f ms", signature_ms)
+
+    if isinstance(index, MongoLshIndex):
+        index.collection.drop()
+
+
+if __name__ == "__main__":
+    main()
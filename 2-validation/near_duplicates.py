@@ -0,0 +1,226 @@
+"""
+Near-duplicate detection with MinHash signatures and an LSH index.
+
+Government publications are often republished with trivial differences
+(a corrected date, a different cover page). Such copies would otherwise cost
+another Gemini call and another embedding run. Validation computes a MinHash
+signature over word 5-gram shingles of every document and looks it up in a
+locality-sensitive hashing (LSH) index: the signature is cut into bands, and
+documents sharing at least one band are candidates whose estimated Jaccard
+similarity is then checked against NEAR_DUPLICATE_THRESHOLD.
+
+The persistent index lives in MongoDB (one small document per indexed
+document with a multikey index on its band keys). ``MemoryLshIndex`` offers
+the same interface in-process for tests and benchmarks.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import logging
+import os
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+import numpy as np
+from bson.binary import Binary
+from pymongo.errors import PyMongoError
+
+from shared.tools.mongo import get_collection
+
+__all__ = [
+    "MemoryLshIndex",
+    "MongoLshIndex",
+    "NearDuplicate",
+    "band_keys",
+    "check_and_index",
+    "find_near_duplicate",
+    "minhash_signature",
+]
+
+logger = logging.getLogger(__name__)
+
+NEAR_DUPLICATE_ENABLED = os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() in {"true", "1", "yes"}
+# Estimated Jaccard similarity above which a document is flagged as a near-duplicate
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+NEAR_DUPLICATE_COLLECTION = os.getenv("NEAR_DUPLICATE_COLLECTION", "near_duplicate_index")
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+# 16 bands of 8 rows: documents with a Jaccard similarity of 0.7 share a band
+# with ~50% probability, at 0.9 with >99.9%
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Candidates compared per lookup, those sharing the most bands first (very common
+# bands, e.g. boilerplate, would otherwise crowd out the real near-duplicates)
+MAX_CANDIDATES = 50
+
+_TOKEN = re.compile(r"\w+")
+_MASK32 = np.uint64(0xFFFFFFFF)
+# Fixed seed: signatures must be comparable across processes and releases
+_rng = np.random.default_rng(20240611)
+_PERM_A = _rng.integers(1, 2**63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2**63, size=NUM_PERM, dtype=np.uint64)
+_BLOCK = 4096
+
+
+@dataclass
+class NearDuplicate:
+    document_id: str
+    similarity: float
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    """32-bit hashes of the word 5-grams of a text (unique, unordered)."""
+    tokens = _TOKEN.findall(text.lower())
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    token_hashes = np.fromiter((zlib.crc32(t.encode()) for t in tokens), dtype=np.uint64, count=len(tokens))
+    if len(tokens) < SHINGLE_SIZE:
+        return np.unique(token_hashes)
+    # Polynomial rolling combination of SHINGLE_SIZE consecutive token hashes
+    shingles = np.zeros(len(tokens) - SHINGLE_SIZE + 1, dtype=np.uint64)
+    for k in range(SHINGLE_SIZE):
+        shingles = shingles * np.uint64(1_000_003) + token_hashes[k : len(shingles) + k]
+    return np.unique((shingles ^ (shingles >> np.uint64(32))) & _MASK32)
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values) of a text's word shingles."""
+    shingles = _shingle_hashes(text)
+    signature = np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint64)
+    # Multiply-shift hashing, in blocks to bound memory on very long documents
+    for start in range(0, len(shingles), _BLOCK):
+        block = shingles[start : start + _BLOCK, None]
+        hashed = (block * _PERM_A + _PERM_B) >> np.uint64(32)
+        np.minimum(signature, hashed.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+
+def band_keys(signature: np.ndarray) -> list[int]:
+    """One signed 64-bit key per LSH band (band index included, so bands never collide)."""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS : (band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + rows, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(a == b))
+
+
+class LshIndex(Protocol):
+    def candidates(self, keys: list[int], limit: int) -> list[tuple[str, np.ndarray]]:
+        """The ``limit`` indexed documents sharing the most of ``keys``, with their signatures."""
+        ...
+
+    def add(self, document_id: str, keys: list[int], signature: np.ndarray, **extra: Any) -> None: ...
+
+
+class MongoLshIndex:
+    """LSH index persisted in MongoDB (multikey index on the band keys)."""
+
+    def __init__(self, collection_name: str = NEAR_DUPLICATE_COLLECTION) -> None:
+        self.collection = get_collection(collection_name)
+        self.collection.create_index("bands")
+
+    def candidates(self, keys: list[int], limit: int) -> list[tuple[str, np.ndarray]]:
+        cursor = self.collection.aggregate(
+            [
+                {"$match": {"bands": {"$in": keys}}},
+                {"$project": {"signature": 1, "matches": {"$size": {"$setIntersection": ["$bands", keys]}}}},
+                # $sort followed by $limit keeps only the top ``limit`` documents in memory
+                {"$sort": {"matches": -1}},
+                {"$limit": limit},
+            ]
+        )
+        return [(doc["_id"], np.frombuffer(doc["signature"], dtype=np.uint32)) for doc in cursor]
+
+    def add(self, document_id: str, keys: list[int], signature: np.ndarray, **extra: Any) -> None:
+        self.collection.update_one(
+            {"_id": document_id},
+            {
+                "$set": {"bands": keys, "signature": Binary(signature.astype(np.uint32).tobytes()), **extra},
+                "$setOnInsert": {"created_at": dt.datetime.now(tz=dt.UTC)},
+            },
+            upsert=True,
+        )
+
+
+class MemoryLshIndex:
+    """In-process LSH index with the same interface (tests, benchmarks)."""
+
+    def __init__(self) -> None:
+        self.buckets: dict[int, list[str]] = {}
+        self.signatures: dict[str, np.ndarray] = {}
+
+    def candidates(self, keys: list[int], limit: int) -> list[tuple[str, np.ndarray]]:
+        matches: Counter[str] = Counter()
+        for key in keys:
+            matches.update(self.buckets.get(key, ()))
+        return [(document_id, self.signatures[document_id]) for document_id, _ in matches.most_common(limit)]
+
+    def add(self, document_id: str, keys: list[int], signature: np.ndarray, **extra: Any) -> None:
+        self.signatures[document_id] = signature
+        for key in keys:
+            self.buckets.setdefault(key, []).append(document_id)
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+
+def find_near_duplicate(
+    index: LshIndex,
+    document_id: str,
+    signature: np.ndarray,
+    keys: list[int] | None = None,
+    threshold: float = NEAR_DUPLICATE_THRESHOLD,
+) -> NearDuplicate | None:
+    """Return the most similar indexed document above the threshold, if any."""
+    keys = band_keys(signature) if keys is None else keys
+    best: NearDuplicate | None = None
+    for candidate_id, candidate in index.candidates(keys, MAX_CANDIDATES):
+        if candidate_id == document_id:
+            continue
+        score = similarity(signature, candidate)
+        if score >= threshold and (best is None or score > best.similarity):
+            best = NearDuplicate(candidate_id, score)
+    return best
+
+
+_index: MongoLshIndex | None = None
+
+
+def check_and_index(document_id: str, text: str, **extra: Any) -> NearDuplicate | None:
+    """
+    Look a document up in the persistent index, then add it.
+
+    Best-effort: MongoDB errors are logged and the document is treated as new.
+
+    Args:
+        document_id: Pipeline id of the document
+        text: Extracted text
+        **extra: Stored alongside the signature (e.g. content_sha256)
+
+    Returns:
+        The near-duplicate found, or None
+    """
+    global _index
+    signature = minhash_signature(text)
+    keys = band_keys(signature)
+    try:
+        if _index is None:
+            _index = MongoLshIndex()
+        match = find_near_duplicate(_index, document_id, signature, keys)
+        _index.add(document_id, keys, signature, **extra)
+        return match
+    except PyMongoError as e:
+        logger.warning("Near-duplicate lookup failed for %s: %s", document_id, e)
+        return None
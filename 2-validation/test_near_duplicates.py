@@ -0,0 +1,64 @@
+"""Tests for MinHash near-duplicate detection."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from near_duplicates import (  # noqa: E402
+    MemoryLshIndex,
+    band_keys,
+    find_near_duplicate,
+    minhash_signature,
+    similarity,
+)
+
+BASE = " ".join(
+    f"Artikel {i}. De minister kan bij regeling nadere regels stellen over onderwerp {i * 7} en de uitvoering."
+    for i in range(200)
+)
+
+
+def test_signature_is_deterministic() -> None:
+    assert (minhash_signature(BASE) == minhash_signature(BASE)).all()
+    assert band_keys(minhash_signature(BASE)) == band_keys(minhash_signature(BASE))
+
+
+def test_republished_copy_is_found_and_unrelated_text_is_not() -> None:
+    index = MemoryLshIndex()
+    original = minhash_signature(BASE)
+    index.add("original", band_keys(original), original)
+
+    republished = BASE.replace("Artikel 3.", "Artikel 3 (gewijzigd).") + " Datum van publicatie: 1 mei 2024."
+    copy = minhash_signature(republished)
+    assert similarity(original, copy) > 0.9
+    match = find_near_duplicate(index, "copy", copy)
+    assert match is not None and match.document_id == "original"
+
+    unrelated = minhash_signature("Besluit over de subsidie voor zonnepanelen op daken van scholen. " * 30)
+    assert find_near_duplicate(index, "other", unrelated) is None
+
+
+def test_document_does_not_match_itself() -> None:
+    index = MemoryLshIndex()
+    signature = minhash_signature(BASE)
+    index.add("doc", band_keys(signature), signature)
+    assert find_near_duplicate(index, "doc", signature) is None
+
+
+def test_candidates_sharing_more_bands_come_first() -> None:
+    index = MemoryLshIndex()
+    signature = minhash_signature(BASE)
+    keys = band_keys(signature)
+    # Many documents sharing only one band (e.g. common boilerplate), indexed before the real copy
+    for i in range(100):
+        other = minhash_signature(f"Besluit {i} over een ander onderwerp met eigen tekst. " * 20)
+        index.add(f"boilerplate-{i}", [keys[0], *band_keys(other)[1:]], other)
+    index.add("original", keys, signature)
+
+    assert index.candidates(keys, 5)[0][0] == "original"
+    match = find_near_duplicate(index, "copy", signature)
+    assert match is not None and match.document_id == "original"
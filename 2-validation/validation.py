@@ -19,9 +19,14 @@ current_dir = Path(__file__).parent
 parent_dir = current_dir.parent
 if str(parent_dir) not in sys.path:
     sys.path.insert(0, str(parent_dir))
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
 
 # Import shared modules after path is set
+from near_duplicates import NEAR_DUPLICATE_ENABLED, check_and_index
+
 from shared.models.messages import AppMessage, ValidationInfo
+from shared.tools.document_parts import part_info
 from shared.tools.MessageProcessor import MessageProcessor
 from shared.tools.pipeline_status import update_status
 from shared.tools.ServiceBusHandler import ServiceBusHandler
@@ -73,8 +78,9 @@ class ValidationProcessor(MessageProcessor):
             if not extracted_text:
                 return False, "Missing extracted text in payload", message_data
 
-            # Validate text content (minimum length)
-            if len(extracted_text) < 10:  # Arbitrary minimum length
+            # Validate text content (minimum length); a part of a split document may
+            # legitimately be short and is needed to reassemble its parent
+            if len(extracted_text) < 10 and part_info(message_data) is None:  # Arbitrary minimum length
                 return (
                     False,
                     "Document text too short, possibly empty document",
@@ -137,8 +143,29 @@ class ValidationProcessor(MessageProcessor):
 
             logger.info("Document successfully validated")
 
+            # Flag republished copies so the extractor and embedding stages can reuse earlier results.
+            # Parts of split documents are skipped: only whole documents are comparable.
+            extra = {}
+            if NEAR_DUPLICATE_ENABLED and message.data.id and part_info(message) is None:
+                payload = message.data.payload
+                match = check_and_index(
+                    message.data.id, payload["extracted_text"], content_sha256=payload.get("content_sha256")
+                )
+                if match is not None:
+                    logger.info(
+                        "Document %s is a near-duplicate of %s (similarity %.3f)",
+                        message.data.id,
+                        match.document_id,
+                        match.similarity,
+                    )
+                    payload["near_duplicate"] = {
+                        "document_id": match.document_id,
+                        "similarity": round(match.similarity, 4),
+                    }
+                    extra["near_duplicate_of"] = match.document_id
+
             if document_id:
-                update_status("validation", document_id, "ok")
+                update_status("validation", document_id, "ok", **extra)
             return app_msg_validated
 
         except Exception as e:  # noqa: BLE001  # pylint: disable=broad-except
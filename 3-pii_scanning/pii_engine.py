@@ -0,0 +1,249 @@
+"""
+Single-pass PII detection for Dutch government documents.
+
+The token-shaped detectors are alternatives of one precompiled regular
+expression, so the text is scanned once regardless of their number; e-mail
+addresses are found from their ``@`` (a C-level substring search) instead of
+trying a local part at every word. Checksums run only on the candidates:
+
+- ``email``
+- ``iban``: ISO 13616 mod-97 check (NL IBANs must also be 18 characters)
+- ``bsn``: burgerservicenummer, 11-proef
+- ``phone``: Dutch landline and mobile numbers (0..., +31..., 0031...)
+- ``postcode``: Dutch postcode (``1234 AB``)
+- ``date_of_birth``: a date following "geboren", "geboortedatum", "geb." or
+  "date of birth"
+
+Results contain the match counts, a few example values and the character
+offsets of every match (capped per detector).
+
+Texts longer than PII_PARALLEL_MIN_CHARS are cut into windows that are
+scanned in a process pool. Every window is scanned together with
+MAX_MATCH_CHARS of context on both sides and keeps only the matches that
+start inside it, so a match crossing a window boundary is found exactly once.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import multiprocessing
+import os
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing.pool import AsyncResult, Pool
+
+__all__ = ["ENGINE_NAME", "PiiScanResult", "scan_text", "scan_text_parallel"]
+
+ENGINE_NAME = "nl-regex"
+# Example values kept per detector (the status collection stores them)
+MAX_EXAMPLES = 5
+# Offsets kept per detector
+MAX_OFFSETS = 1000
+# Upper bound on the length of any match (all quantifiers below are bounded); this is the
+# context scanned around each window in parallel mode
+MAX_MATCH_CHARS = 1024
+
+# Texts with fewer characters than this are scanned in the calling process (0 = never in parallel)
+PARALLEL_MIN_CHARS = int(os.getenv("PII_PARALLEL_MIN_CHARS", "4000000"))
+# Number of scanning processes (0 = one per CPU)
+PARALLEL_WORKERS = int(os.getenv("PII_PARALLEL_WORKERS", "0")) or os.cpu_count() or 1
+# Memory budget per worker, in MB; a window is sized so that its text (up to 4 bytes per
+# character in a str) and its pickled copy fit in it
+PARALLEL_WORKER_MB = float(os.getenv("PII_PARALLEL_WORKER_MB", "64"))
+
+_pool: Pool | None = None
+
+_MONTHS = {
+    "januari": 1,
+    "februari": 2,
+    "maart": 3,
+    "april": 4,
+    "mei": 5,
+    "juni": 6,
+    "juli": 7,
+    "augustus": 8,
+    "september": 9,
+    "oktober": 10,
+    "november": 11,
+    "december": 12,
+}
+
+_PATTERN = re.compile(
+    # Every detector starts at the beginning of a token with a digit, a capital, "+" or the
+    # first letter of a birth-date keyword; rejecting all other positions up front is what
+    # keeps a single alternation over the detectors fast
+    r"(?<![\w.%+-])(?=[\dA-Z+gGdD])(?:"
+    # Date of birth: keyword, then a numeric or written-out date
+    r"(?i:(?:geboren(?:\s{1,3}op)?|geboortedatum|geb\.|date\s{1,3}of\s{1,3}birth)\s{0,3}:?\s{0,3})"
+    r"(?P<date_of_birth>\d{1,2}[-/.]\d{1,2}[-/.](?:18|19|20)\d{2}"
+    r"|\d{1,2}\s{1,3}(?i:" + "|".join(_MONTHS) + r")\s{1,3}(?:18|19|20)\d{2})"
+    r"|(?P<iban>[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){2,7}(?: ?[A-Z0-9]{1,3})?\b)"
+    r"|(?P<phone>(?:(?:\+|00)31[ -]?(?:\(0\)[ -]?)?|0)[1-9](?:[ -]?\d){8}(?![\w-]))"
+    r"|(?P<bsn>(?:\d{9}|\d{4}\.\d{2}\.\d{3})\b)"
+    r"|(?P<postcode>[1-9]\d{3} ?(?!SA|SD|SS)[A-Z]{2}\b)"
+    r")"
+)
+# Domain part of an e-mail address, matched at its "@"
+_EMAIL_DOMAIN = re.compile(r"@[A-Za-z0-9-]{1,63}(?:\.[A-Za-z0-9-]{1,63}){0,8}\.[A-Za-z]{2,24}\b")
+_EMAIL_LOCAL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789._%+-")
+# RFC 5321 limit on the local part
+_EMAIL_LOCAL_MAX = 64
+
+
+def _iban_valid(candidate: str) -> bool:
+    iban = candidate.replace(" ", "")
+    if not 15 <= len(iban) <= 34 or (iban.startswith("NL") and len(iban) != 18):
+        return False
+    rearranged = iban[4:] + iban[:4]
+    return int("".join(str(int(ch, 36)) for ch in rearranged)) % 97 == 1
+
+
+def _bsn_valid(candidate: str) -> bool:
+    digits = [int(ch) for ch in candidate if ch.isdigit()]
+    if len(digits) != 9 or not any(digits):
+        return False
+    total = sum(d * w for d, w in zip(digits[:8], range(9, 1, -1), strict=True)) - digits[8]
+    return total % 11 == 0
+
+
+def _date_of_birth_valid(candidate: str) -> bool:
+    parts = re.split(r"[-/.\s]+", candidate.strip())
+    try:
+        day = int(parts[0])
+        month = int(parts[1]) if parts[1].isdigit() else _MONTHS[parts[1].lower()]
+        born = dt.date(int(parts[2]), month, day)
+    except (ValueError, KeyError, IndexError):
+        return False
+    return born <= dt.date.today()
+
+
+_VALIDATORS = {"iban": _iban_valid, "bsn": _bsn_valid, "date_of_birth": _date_of_birth_valid}
+
+
+@dataclass
+class PiiScanResult:
+    counts: dict[str, int] = field(default_factory=dict)
+    matches: dict[str, list[str]] = field(default_factory=dict)
+    offsets: dict[str, list[list[int]]] = field(default_factory=dict)
+
+    @property
+    def has_pii(self) -> bool:
+        return bool(self.counts)
+
+    def add(self, kind: str, value: str, start: int, end: int) -> None:
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        examples = self.matches.setdefault(kind, [])
+        if len(examples) < MAX_EXAMPLES and value not in examples:
+            examples.append(value)
+        spans = self.offsets.setdefault(kind, [])
+        if len(spans) < MAX_OFFSETS:
+            spans.append([start, end])
+
+    def merge(self, other: PiiScanResult) -> None:
+        for kind, count in other.counts.items():
+            self.counts[kind] = self.counts.get(kind, 0) + count
+        for kind, values in other.matches.items():
+            examples = self.matches.setdefault(kind, [])
+            examples.extend(v for v in values if v not in examples)
+            del examples[MAX_EXAMPLES:]
+        for kind, spans in other.offsets.items():
+            own = self.offsets.setdefault(kind, [])
+            own.extend(spans[: max(0, MAX_OFFSETS - len(own))])
+
+
+def _scan(text: str, offset: int, lo: int, hi: int) -> PiiScanResult:
+    """Scan ``text`` and keep the matches starting in ``[lo, hi)``; positions are shifted by ``offset``."""
+    result = PiiScanResult()
+    at = text.find("@")
+    while at != -1:
+        domain = _EMAIL_DOMAIN.match(text, at)
+        start = at
+        while start > 0 and at - start < _EMAIL_LOCAL_MAX and text[start - 1] in _EMAIL_LOCAL_CHARS:
+            start -= 1
+        if domain is not None and lo <= start < min(at, hi):
+            result.add("email", text[start : domain.end()], start + offset, domain.end() + offset)
+        at = text.find("@", at + 1)
+    for match in _PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind is None or not lo <= match.start(kind) < hi:
+            continue
+        value = match.group(kind)
+        validator = _VALIDATORS.get(kind)
+        if validator is not None and not validator(value):
+            continue
+        result.add(kind, value, match.start(kind) + offset, match.end(kind) + offset)
+    return result
+
+
+def scan_text(text: str, offset: int = 0) -> PiiScanResult:
+    """
+    Detect PII in one pass over the text.
+
+    Args:
+        text: Text to scan
+        offset: Added to every reported position (when ``text`` is a slice)
+
+    Returns:
+        PiiScanResult with counts, example values and offsets per detector
+    """
+    if PARALLEL_MIN_CHARS and len(text) >= PARALLEL_MIN_CHARS and PARALLEL_WORKERS > 1:
+        result = scan_text_parallel(text)
+        if offset:
+            for spans in result.offsets.values():
+                for span in spans:
+                    span[0] += offset
+                    span[1] += offset
+        return result
+    return _scan(text, offset, 0, len(text))
+
+
+def _get_pool() -> Pool:
+    global _pool
+    if _pool is None:
+        # 'spawn' keeps workers independent of the Service Bus client threads in the parent
+        _pool = multiprocessing.get_context("spawn").Pool(processes=PARALLEL_WORKERS)
+    return _pool
+
+
+def _scan_window(window: str, window_start: int, lo: int, hi: int) -> PiiScanResult:
+    """Scan one window with its context. Runs inside a pool worker."""
+    return _scan(window, window_start, lo, hi)
+
+
+def window_chars(worker_mb: float = PARALLEL_WORKER_MB) -> int:
+    """Characters per window that keep a worker within ``worker_mb`` (8 bytes per character, worst case)."""
+    return max(MAX_MATCH_CHARS * 4, int(worker_mb * 1024 * 1024) // 8 - 2 * MAX_MATCH_CHARS)
+
+
+def scan_text_parallel(text: str, size: int | None = None, pool: Pool | None = None) -> PiiScanResult:
+    """
+    Detect PII in overlapping windows scanned in a process pool.
+
+    At most two windows per worker are in flight, so the parent holds no more
+    than that many copies of window text at any time.
+
+    Args:
+        text: Text to scan
+        size: Characters per window (default: derived from PII_PARALLEL_WORKER_MB)
+        pool: Pool to use (default: a shared pool of PII_PARALLEL_WORKERS processes)
+
+    Returns:
+        PiiScanResult equal to the one of a single-process scan
+    """
+    size = size or window_chars()
+    pool = pool or _get_pool()
+    max_in_flight = 2 * PARALLEL_WORKERS
+    result = PiiScanResult()
+    pending: deque[AsyncResult] = deque()
+    for lo in range(0, len(text), size):
+        hi = min(lo + size, len(text))
+        start = max(0, lo - MAX_MATCH_CHARS)
+        window = text[start : hi + MAX_MATCH_CHARS]
+        pending.append(pool.apply_async(_scan_window, (window, start, lo - start, hi - start)))
+        # Windows are merged in order, which keeps the offsets sorted
+        while len(pending) >= max_in_flight:
+            result.merge(pending.popleft().get())
+    while pending:
+        result.merge(pending.popleft().get())
+    return result
@@ -3,8 +3,11 @@
 PII Scanning Service
 
 Listens to the PII scanning queue and determines if the payload.extracted_text
-contains personal information using the octopii library.
-Prints a message to the console indicating whether PII was found.
+contains personal information. The default engine (pii_engine) detects emails,
+IBANs, BSNs, Dutch phone numbers, postcodes and dates of birth in a single pass;
+PII_ENGINE=naive-regex selects the original email/IBAN-like scan. Texts longer
+than PII_PARALLEL_MIN_CHARS are scanned in overlapping windows by a process
+pool (see pii_engine).
 """
 
 import datetime as dt
@@ -23,6 +26,10 @@ current_dir = Path(__file__).parent
 parent_dir = current_dir.parent
 if str(parent_dir) not in sys.path:
     sys.path.insert(0, str(parent_dir))
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from pii_engine import ENGINE_NAME, scan_text
 
 from shared.models.messages import AppMessage, PiiScanInfo
 from shared.tools.MessageProcessor import MessageProcessor
@@ -37,6 +44,8 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(
 logging.getLogger("azure").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
+PII_ENGINE = os.getenv("PII_ENGINE", ENGINE_NAME)
+
 
 class PiiProcessor(MessageProcessor):
     """
@@ -63,6 +72,25 @@ class PiiProcessor(MessageProcessor):
                     matches[name] = uniq
         return (len(matches) > 0), {"engine": "naive-regex", "matches": matches}
 
+    @staticmethod
+    def scan(text: str) -> tuple[bool, dict[str, Any]]:
+        """
+        Detect PII with the configured engine.
+
+        Returns:
+            Whether PII was found, and the details (engine, example matches and,
+            for the single-pass engine, counts and offsets per detector)
+        """
+        if PII_ENGINE == "naive-regex":
+            return PiiProcessor.naive_regex_pii_scan(text)
+        result = scan_text(text)
+        return result.has_pii, {
+            "engine": ENGINE_NAME,
+            "matches": result.matches,
+            "counts": result.counts,
+            "offsets": result.offsets,
+        }
+
     def process(self, message: AppMessage) -> AppMessage | None:  # type: ignore[override]
         """
         Process an incoming message, detect PII on extracted_text and print a
@@ -83,13 +111,13 @@ class PiiProcessor(MessageProcessor):
                     update_status("pii-scanning", document_id, "skipped", reason="no_text")
                 return None
             # Run scan
-            has_pii, details = PiiProcessor.naive_regex_pii_scan(text)
+            has_pii, details = PiiProcessor.scan(text)
             if has_pii:
                 logger.info(
-                    "[PII] Document '%s': PERSONAL DATA DETECTED | engine=%s | details=%s",
+                    "[PII] Document '%s': PERSONAL DATA DETECTED | engine=%s | counts=%s",
                     doc_name,
                     details.get("engine"),
-                    details.get("matches"),
+                    details.get("counts") or {k: len(v) for k, v in details.get("matches", {}).items()},
                 )
             else:
                 logger.info(
@@ -98,13 +126,17 @@ class PiiProcessor(MessageProcessor):
                     details.get("engine"),
                 )
             if document_id:
-                update_status("pii-scanning", document_id, "ok", details=details)
+                # Offsets can be long; the status only needs the summary
+                summary = {key: value for key, value in details.items() if key != "offsets"}
+                update_status("pii-scanning", document_id, "ok", details=summary)
 
             message.pii = PiiScanInfo(
                 has_pii=has_pii,
                 engine=details.get("engine"),
                 matches=details.get("matches"),
                 timestamp=dt.datetime.now(),
+                counts=details.get("counts"),
+                offsets=details.get("offsets"),
             )
             return message
         except (ValueError, TypeError, KeyError, json.JSONDecodeError) as e:  # noqa: BLE001
@@ -0,0 +1,51 @@
+"""Tests for the single-pass PII engine."""
+
+from __future__ import annotations
+
+import multiprocessing
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pii_engine import scan_text, scan_text_parallel  # noqa: E402
+
+
+def test_detects_dutch_identifiers_with_offsets() -> None:
+    text = (
+        "Aanvrager j.jansen@gemeente.nl, geboren op 3 februari 1975, BSN 111222333, "
+        "IBAN NL91 ABNA 0417 1643 00, telefoon 06-12345678, adres Postbus 20011, 2500 EA Den Haag."
+    )
+    result = scan_text(text, offset=100)
+    assert result.has_pii
+    assert result.counts == {"email": 1, "date_of_birth": 1, "bsn": 1, "iban": 1, "phone": 1, "postcode": 1}
+    assert result.matches["date_of_birth"] == ["3 februari 1975"]
+    start, end = result.offsets["email"][0]
+    assert text[start - 100 : end - 100] == "j.jansen@gemeente.nl"
+    start, end = result.offsets["iban"][0]
+    assert text[start - 100 : end - 100] == "NL91 ABNA 0417 1643 00"
+
+
+def test_checksums_reject_lookalikes() -> None:
+    text = "Kenmerk NL12ABNA0417164300, zaaknummer 123456789, geboortedatum 31-02-1980 en artikel 2500 van de wet."
+    result = scan_text(text)
+    assert not result.has_pii, result.counts
+
+
+def test_regular_government_text_has_no_pii() -> None:
+    text = "Dit besluit treedt in werking met ingang van 1 januari 2025. Artikel 4.12 van de Omgevingswet."
+    assert not scan_text(text).has_pii
+
+
+def test_parallel_scan_matches_single_pass_across_window_boundaries() -> None:
+    sentence = (
+        "Brief aan j.jansen@gemeente.nl (geboren op 3 februari 1975), BSN 111222333, "
+        "IBAN NL91 ABNA 0417 1643 00, telefoon +31 6 12345678, 2500 EA Den Haag. "
+    )
+    # Varying padding shifts the matches across the window boundaries
+    text = "".join(sentence + "x" * (i % 37) + " " for i in range(300))
+    with multiprocessing.get_context("spawn").Pool(2) as pool:
+        parallel = scan_text_parallel(text, size=997, pool=pool)
+    single = scan_text(text)
+    assert single.counts["email"] == 300
+    assert parallel == single
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Embedding backend benchmark
+
+Loads EMBEDDING_MODEL with each backend (torch, onnx, onnx-int8) in a fresh
+process and reports load time, batch throughput in chunks/s, single-chunk
+latency, peak resident memory and the mean cosine similarity of its vectors
+to the torch ones. The chunks are synthetic Dutch government text of about
+CHUNK_SIZE characters.
+
+Example:
+    uv run embedding_generator/benchmark_backends.py
+    uv run embedding_generator/benchmark_backends.py --backends torch,onnx-int8 --chunks 2000 --threads 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing
+import random
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+current_dir = Path(__file__).parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", force=True)
+logger = logging.getLogger("benchmark_backends")
+
+_SENTENCES = [
+    "De minister van Binnenlandse Zaken en Koninkrijksrelaties stelt bij regeling nadere regels vast.",
+    "Dit besluit treedt in werking met ingang van de dag na de datum van uitgifte van de Staatscourant.",
+    "Artikel 4.12 van de Omgevingswet is van overeenkomstige toepassing op de aanvraag.",
+    "Het college van burgemeester en wethouders beslist binnen acht weken op de aanvraag.",
+    "Bezwaar kan worden gemaakt binnen zes weken na de dag waarop dit besluit is bekendgemaakt.",
+    "Gelet op artikel 2, eerste lid, van de Wet op de ruimtelijke ordening;",
+]
+
+
+def synthetic_chunks(count: int, chunk_chars: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    chunks = []
+    for _ in range(count):
+        parts: list[str] = []
+        while sum(len(p) + 1 for p in parts) < rng.randint(chunk_chars // 4, chunk_chars):
+            parts.append(rng.choice(_SENTENCES))
+        chunks.append(" ".join(parts))
+    return chunks
+
+
+def _run_backend(backend: str, model_name: str, chunks: list[str], batch_size: int, threads: int) -> dict[str, Any]:
+    """Measure one backend; runs in its own process."""
+    import torch
+
+    from shared.tools.embedding_model import load_embedding_model
+
+    torch.set_num_threads(threads)
+    started = time.perf_counter()
+    model = load_embedding_model(model_name, backend)
+    load_seconds = time.perf_counter() - started
+    model.encode(chunks[:batch_size], batch_size=batch_size)  # warm-up
+
+    started = time.perf_counter()
+    vectors = model.encode(chunks, batch_size=batch_size, normalize_embeddings=True)
+    throughput = len(chunks) / (time.perf_counter() - started)
+
+    latencies = []
+    for chunk in chunks[:50]:
+        started = time.perf_counter()
+        model.encode([chunk])
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "load_seconds": load_seconds,
+        "chunks_per_second": throughput,
+        "latency_p50_ms": statistics.median(latencies),
+        "latency_p95_ms": sorted(latencies)[int(0.95 * len(latencies))],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "vectors": vectors,
+    }
+
+
+def main() -> None:
+    from shared.tools.embedding_model import BACKENDS, EMBEDDING_MODEL
+
+    parser = argparse.ArgumentParser(description="Compare embedding inference backends.")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma separated backends")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=1, help="Intra-op threads per backend")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.chunks, args.chunk_chars, args.seed)
+    logger.info("Model %s, %d chunks of <= %d characters\n", args.model, len(chunks), args.chunk_chars)
+    ctx = multiprocessing.get_context("spawn")
+    reference: np.ndarray | None = None
+    baseline: float | None = None
+    for backend in args.backends.split(","):
+        with ctx.Pool(1) as pool:
+            result = pool.apply(_run_backend, (backend, args.model, chunks, args.batch_size, args.threads))
+        vectors = result.pop("vectors")
+        if reference is None:
+            reference = vectors
+        baseline = baseline or result["chunks_per_second"]
+        cosine = float(np.mean(np.sum(vectors * reference, axis=1)))
+        logger.info(
+            "%-10s load %5.1fs  %8.1f chunks/s (x%.2f)  latency p50 %6.1f ms p95 %6.1f ms  "
+            "peak RSS %6.0f MB  cosine %.4f",
+            backend,
+            result["load_seconds"],
+            result["chunks_per_second"],
+            result["chunks_per_second"] / baseline,
+            result["latency_p50_ms"],
+            result["latency_p95_ms"],
+            result["peak_rss_mb"],
+            cosine,
+        )
+
+
+if __name__ == "__main__":
+    main()
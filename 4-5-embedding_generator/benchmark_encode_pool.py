@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Encode pool scaling benchmark
+
+Encodes the same synthetic chunks through an EncodeBatcher backed by an
+EncodePool of 1, 2, 4, ... workers and reports chunks/s, the speed-up over
+one worker and the scaling efficiency (speed-up divided by workers). The
+in-process baseline uses the model with the default PyTorch threads, as the
+service does without EMBEDDING_WORKERS.
+
+Example:
+    uv run embedding_generator/benchmark_encode_pool.py --workers 1,2,4,8 --threads 1 --affinity
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from benchmark_backends import synthetic_chunks  # noqa: E402
+from encode_batching import EncodeBatcher  # noqa: E402
+from encode_pool import EncodePool  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", force=True)
+logger = logging.getLogger("benchmark_encode_pool")
+
+
+def _throughput(batcher: EncodeBatcher, chunks: list[str], documents: int) -> float:
+    """Chunks/s with the chunks spread over ``documents`` concurrent callers."""
+    per_document = len(chunks) // documents
+    parts = [chunks[i * per_document : (i + 1) * per_document] for i in range(documents)]
+    batcher.encode(chunks[:64])  # warm-up
+    started = time.perf_counter()
+    with ThreadPoolExecutor(documents) as executor:
+        list(executor.map(batcher.encode, parts))
+    return documents * per_document / (time.perf_counter() - started)
+
+
+def _in_process_throughput(chunks: list[str], documents: int, batch_size: int) -> float:
+    from shared.tools.embedding_model import load_embedding_model
+
+    model = load_embedding_model()
+    batcher = EncodeBatcher(
+        lambda texts: model.encode(texts, batch_size=len(texts), convert_to_numpy=True), batch_size=batch_size
+    )
+    return _throughput(batcher, chunks, documents)
+
+
+def main() -> None:
+    from shared.tools.embedding_model import EMBEDDING_BACKEND, EMBEDDING_MODEL
+
+    parser = argparse.ArgumentParser(description="Measure how chunks/s scale with encode workers.")
+    parser.add_argument("--workers", default=f"1,2,{os.cpu_count()}", help="Comma separated worker counts")
+    parser.add_argument("--threads", type=int, default=1, help="Intra-op threads per worker")
+    parser.add_argument("--affinity", action="store_true", help="Pin workers to cores")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--documents", type=int, default=16, help="Concurrent documents")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.chunks, 1000, 42)
+    logger.info("%s (%s), %d chunks, %d cores\n", EMBEDDING_MODEL, EMBEDDING_BACKEND, len(chunks), os.cpu_count())
+
+    logger.info("%-22s %8.1f chunks/s", "in process", _in_process_throughput(chunks, args.documents, args.batch_size))
+
+    single: float | None = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        pool = EncodePool(
+            workers, threads=args.threads, cpu_affinity=args.affinity, loader_args=(EMBEDDING_MODEL, EMBEDDING_BACKEND)
+        )
+        try:
+            batcher = EncodeBatcher(pool.encode, batch_size=args.batch_size, concurrency=workers)
+            throughput = _throughput(batcher, chunks, args.documents)
+        finally:
+            pool.close()
+        single = single or throughput
+        logger.info(
+            "%2d workers x %d threads %8.1f chunks/s  x%.2f  efficiency %3.0f%%",
+            workers,
+            args.threads,
+            throughput,
+            throughput / single,
+            100 * throughput / single / workers,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Text splitter benchmark
+
+Splits synthetic Dutch government documents of several megabytes with:
+
+- ``langchain``: RecursiveCharacterTextSplitter measuring characters (the
+  previous splitter, CHUNK_SIZE=1000 / CHUNK_OVERLAP=200 characters);
+- ``langchain-tokens``: the same splitter measuring tokens with the
+  tokenizer (on a slice of the document: it tokenizes every split again);
+- ``streaming``: StreamingTextSplitter, measuring tokens in one pass.
+
+and reports MB/s, peak traced memory, chunk counts, the mean number of
+tokens per chunk and the share of chunks longer than the model window, which
+the model truncates silently. ``--tokenizer model`` uses the tokenizer of
+EMBEDDING_MODEL, ``regex`` counts words and punctuation marks.
+
+Example:
+    uv run embedding_generator/benchmark_splitter.py --mb 1,8
+    uv run embedding_generator/benchmark_splitter.py --tokenizer regex --window 256
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+parent_dir = current_dir.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: E402
+from text_splitter import SEPARATORS, StreamingTextSplitter, regex_token_starts, tokenizer_token_starts  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", force=True)
+logger = logging.getLogger("benchmark_splitter")
+
+_SENTENCES = [
+    "De minister van Binnenlandse Zaken en Koninkrijksrelaties stelt bij regeling nadere regels vast.",
+    "Dit besluit treedt in werking met ingang van de dag na de datum van uitgifte van de Staatscourant.",
+    "Artikel 4.12 van de Omgevingswet is van overeenkomstige toepassing op de aanvraag, voor zover het",
+    "Het college van burgemeester en wethouders beslist binnen acht weken op de aanvraag.",
+    "Bezwaar kan worden gemaakt binnen zes weken na de dag waarop dit besluit is bekendgemaakt.",
+    "Gelet op artikel 2, eerste lid, van de Wet op de ruimtelijke ordening;",
+]
+
+
+def synthetic_document(size_mb: float, seed: int) -> str:
+    rng = random.Random(seed)
+    paragraphs: list[str] = []
+    size = 0
+    while size < size_mb * 1_000_000:
+        lines = [" ".join(rng.choice(_SENTENCES) for _ in range(rng.randint(1, 8))) for _ in range(rng.randint(1, 4))]
+        paragraphs.append("\n".join(lines))
+        size += len(paragraphs[-1]) + 2
+    return "\n\n".join(paragraphs)
+
+
+def _measure(split: Callable[[str], int], text: str) -> tuple[float, float]:
+    """Seconds, and peak traced MB in a second run."""
+    started = time.perf_counter()
+    split(text)
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    split(text)
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the streaming splitter with the LangChain one.")
+    parser.add_argument("--mb", default="1,4", help="Comma separated document sizes in MB")
+    parser.add_argument("--tokenizer", choices=("model", "regex"), default="model")
+    parser.add_argument("--window", type=int, default=0, help="Model window in tokens (default: the model's)")
+    parser.add_argument("--overlap", type=int, default=50, help="Streaming overlap in tokens")
+    parser.add_argument("--slice-kb", type=int, default=200, help="Text split by langchain-tokens")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    specials = 0
+    window = args.window or 256
+    token_starts = regex_token_starts
+    if args.tokenizer == "model":
+        from shared.tools.embedding_model import load_embedding_model
+
+        model = load_embedding_model()
+        token_starts = tokenizer_token_starts(model.tokenizer)
+        specials = model.tokenizer.num_special_tokens_to_add()
+        window = args.window or model.max_seq_length
+
+    def count(text: str) -> int:
+        return len(token_starts(text))
+
+    streaming = StreamingTextSplitter(token_starts, chunk_size=window - specials, chunk_overlap=args.overlap)
+    langchain = RecursiveCharacterTextSplitter(
+        separators=list(SEPARATORS), chunk_size=1000, chunk_overlap=200, length_function=len
+    )
+    langchain_tokens = RecursiveCharacterTextSplitter(
+        separators=list(SEPARATORS), chunk_size=window - specials, chunk_overlap=args.overlap, length_function=count
+    )
+
+    for size_mb in (float(mb) for mb in args.mb.split(",")):
+        text = synthetic_document(size_mb, args.seed)
+        logger.info("Document of %.1f MB, window %d tokens (%s tokenizer)", len(text) / 1e6, window, args.tokenizer)
+        runs = [
+            ("langchain", text, langchain.split_text),
+            ("langchain-tokens", text[: args.slice_kb * 1000], langchain_tokens.split_text),
+            ("streaming", text, streaming.split_text),
+        ]
+        for name, sample, split_text in runs:
+            chunks = split_text(sample)
+            seconds, peak = _measure(
+                # Streaming: chunks consumed one at a time, as a generator
+                (lambda t: sum(1 for _ in streaming.iter_chunks(t))) if name == "streaming" else split_text,
+                sample,
+            )
+            tokens = [count(chunk) + specials for chunk in chunks]
+            logger.info(
+                "  %-17s %7.2f MB/s  peak %7.1f MB  %6d chunks  %5.1f tokens/chunk  %5.1f%% over the window",
+                name,
+                len(sample) / 1e6 / seconds,
+                peak,
+                len(chunks),
+                sum(tokens) / len(tokens),
+                100 * sum(t > window for t in tokens) / len(tokens),
+            )
+
+
+if __name__ == "__main__":
+    main()
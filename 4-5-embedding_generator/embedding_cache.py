@@ -0,0 +1,181 @@
+"""
+Content-hash cache for chunk embeddings.
+
+Government documents repeat a lot of text (standard clauses, signature
+blocks, "Gelet op ..." preambles), and re-runs embed the same chunks again.
+``EmbeddingCache.encode`` keys every chunk on the model name and the SHA-256
+of its whitespace-normalized text, serves what it can from an in-process LRU
+and then from a persistent store, and sends only the remaining (distinct)
+texts to the encoder.
+
+The persistent store is a MongoDB collection with one document per chunk and
+the vector packed as float32 bytes; ``MemoryEmbeddingStore`` offers the same
+interface in-process for tests.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Protocol
+
+import numpy as np
+from bson.binary import Binary
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from shared.tools.mongo import get_collection
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_COLLECTION = os.getenv("EMBEDDING_CACHE_COLLECTION", "embedding_cache")
+
+
+def cache_key(model_name: str, text: str) -> str:
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{model_name}\0{normalized}".encode()).hexdigest()
+
+
+class EmbeddingStore(Protocol):
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]: ...
+
+    def put_many(self, vectors: dict[str, np.ndarray]) -> None: ...
+
+
+class MongoEmbeddingStore:
+    """Vectors persisted in MongoDB as packed float32."""
+
+    def __init__(self, model_name: str, collection_name: str = EMBEDDING_CACHE_COLLECTION) -> None:
+        self.model_name = model_name
+        self.collection = get_collection(collection_name)
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        return {
+            doc["_id"]: np.frombuffer(doc["vector"], dtype=np.float32)
+            for doc in self.collection.find({"_id": {"$in": keys}}, {"vector": 1})
+        }
+
+    def put_many(self, vectors: dict[str, np.ndarray]) -> None:
+        updates = [
+            UpdateOne(
+                {"_id": key},
+                {
+                    "$setOnInsert": {
+                        "model": self.model_name,
+                        "vector": Binary(np.asarray(vector, dtype=np.float32).tobytes()),
+                    }
+                },
+                upsert=True,
+            )
+            for key, vector in vectors.items()
+        ]
+        if updates:
+            self.collection.bulk_write(updates, ordered=False)
+
+
+class MemoryEmbeddingStore:
+    """In-process store with the same interface (tests)."""
+
+    def __init__(self) -> None:
+        self.vectors: dict[str, np.ndarray] = {}
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        return {key: self.vectors[key] for key in keys if key in self.vectors}
+
+    def put_many(self, vectors: dict[str, np.ndarray]) -> None:
+        self.vectors.update(vectors)
+
+
+class EmbeddingCache:
+    """
+    LRU and persistent cache in front of an encoder.
+
+    Args:
+        model_name: Part of the key, so that vectors of different models never mix
+        encode: Encodes a list of texts into a (len(texts), dim) array
+        store: Persistent store, or None for the LRU only
+        lru_size: Vectors kept in process memory
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        encode: Callable[[list[str]], np.ndarray],
+        store: EmbeddingStore | None = None,
+        lru_size: int = 20_000,
+    ) -> None:
+        self.model_name = model_name
+        self._encode = encode
+        self.store = store
+        self.lru_size = lru_size
+        self._lru: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.memory_hits + self.store_hits + self.misses
+        return (self.memory_hits + self.store_hits) / total if total else 0.0
+
+    def _remember(self, vectors: dict[str, np.ndarray]) -> None:
+        with self._lock:
+            for key, vector in vectors.items():
+                self._lru[key] = vector
+                self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def encode(self, texts: list[str]) -> tuple[np.ndarray, int]:
+        """
+        Vectors for ``texts``, encoding only those not cached.
+
+        Returns:
+            Array with one row per text and the number of texts served from the cache
+        """
+        keys = [cache_key(self.model_name, text) for text in texts]
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    found[key] = self._lru[key]
+                    self._lru.move_to_end(key)
+        memory_hits = sum(key in found for key in keys)
+
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        if missing and self.store is not None:
+            try:
+                stored = self.store.get_many(missing)
+            except PyMongoError as e:
+                logger.warning("Embedding cache store unavailable: %s", e)
+                stored = {}
+            found.update(stored)
+            self._remember(stored)
+            missing = [key for key in missing if key not in stored]
+        store_hits = sum(key in found for key in keys) - memory_hits
+
+        if missing:
+            text_of: dict[str, str] = {}
+            for key, text in zip(keys, texts, strict=True):
+                text_of.setdefault(key, text)
+            encoded = np.asarray(self._encode([text_of[key] for key in missing]), dtype=np.float32)
+            new = dict(zip(missing, encoded, strict=True))
+            found.update(new)
+            self._remember(new)
+            if self.store is not None:
+                try:
+                    self.store.put_many(new)
+                except PyMongoError as e:
+                    logger.warning("Failed to store %d embeddings in the cache: %s", len(new), e)
+
+        cached = memory_hits + store_hits
+        with self._lock:
+            self.memory_hits += memory_hits
+            self.store_hits += store_hits
+            self.misses += len(keys) - cached
+        return np.stack([found[key] for key in keys]), cached
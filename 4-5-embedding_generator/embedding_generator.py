@@ -2,60 +2,158 @@ import json
 import logging
 import os
 import sys
+import threading
 import time
 import traceback
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 from dotenv import load_dotenv
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 
 # Ensure '/app' (the project root in containers) is on sys.path before importing 'shared'
 current_dir = Path(__file__).parent
 parent_dir = current_dir.parent
 if str(parent_dir) not in sys.path:
     sys.path.insert(0, str(parent_dir))
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from embedding_cache import EmbeddingCache, MongoEmbeddingStore, cache_key
+from encode_batching import EncodeBatcher
+from encode_pool import EncodePool
+from text_splitter import StreamingTextSplitter, tokenizer_token_starts
 
 from shared.models.messages import AppMessage
+from shared.tools.document_parts import part_info
+from shared.tools.embedding_model import EMBEDDING_BACKEND, load_embedding_model, load_embedding_tokenizer
 from shared.tools.MessageProcessor import MessageProcessor
+from shared.tools.near_duplicate_reuse import near_duplicate_of, stored_chunks
 from shared.tools.pipeline_status import update_status
 from shared.tools.ServiceBusHandler import ServiceBusHandler
+from shared.tools.startup import StartupReport
+from shared.tools.vector_codec import encode_vector_chunks
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
 logger = logging.getLogger(__name__)
 
+# Documents embedded at the same time; their chunks are encoded together
+MAX_CONCURRENT_DOCUMENTS = int(os.getenv("EMBEDDING_MAX_CONCURRENT", "8"))
+# Vectors travel to data storage as one base64 block per document ("float32" or "float16"), or as
+# JSON float lists per chunk ("json", the original form)
+VECTOR_ENCODING = os.getenv("EMBEDDING_VECTOR_ENCODING", "float32").lower()
+# Encoder processes, each with its own copy of the model (0 = encode in the service process)
+ENCODE_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "0"))
+# Intra-op threads per encoder process (0 = the usable cores divided by EMBEDDING_WORKERS)
+ENCODE_THREADS_PER_WORKER = int(os.getenv("EMBEDDING_THREADS_PER_WORKER", "0"))
+# Pin every encoder process to cores of its own
+ENCODE_CPU_AFFINITY = os.getenv("EMBEDDING_CPU_AFFINITY", "false").lower() in {"true", "1", "yes"}
+# Texts (per encoder process) encoded at startup before the service reports ready (0 = no warm-up)
+WARMUP_TEXTS = int(os.getenv("EMBEDDING_WARMUP_TEXTS", "32"))
+
 
 class EmbeddingGeneratorService:
     """Service for generating document embeddings."""
 
-    def __init__(self) -> Any:
+    _instance_lock = threading.Lock()
+
+    def __init__(self, startup: StartupReport | None = None) -> Any:
         """Initialize the EmbeddingGeneratorService with embedding model settings."""
+        startup = startup or StartupReport("embedding-generator", readiness_file=None)
         self.model_name = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
-        self.chunk_size = int(os.getenv("CHUNK_SIZE", "1000"))
-        self.chunk_overlap = int(os.getenv("CHUNK_OVERLAP", "200"))
 
         logger.info(f"Loading embedding model: {self.model_name}")
-        self.model = SentenceTransformer(self.model_name)
+        with startup.phase("model load"):
+            if ENCODE_WORKERS > 0:
+                # The encode workers hold the model; this process only measures chunks in tokens
+                self.model = None
+                self.tokenizer, self.max_seq_length = load_embedding_tokenizer(self.model_name)
+            else:
+                # EMBEDDING_BACKEND=onnx / onnx-int8 runs the model on ONNX Runtime instead of PyTorch
+                self.model = load_embedding_model(self.model_name)
+                self.tokenizer, self.max_seq_length = self.model.tokenizer, self.model.max_seq_length
+
+        # With EMBEDDING_WORKERS, batches are encoded by that many processes, one batch each at a time
+        self.pool = None
+        if ENCODE_WORKERS > 0:
+            with startup.phase("encode workers"):
+                self.pool = EncodePool(
+                    ENCODE_WORKERS,
+                    threads=ENCODE_THREADS_PER_WORKER,
+                    cpu_affinity=ENCODE_CPU_AFFINITY,
+                    loader_args=(self.model_name, EMBEDDING_BACKEND),
+                )
 
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            separators=["\n\n", "\n", ". ", ", ", " "],
+        # Chunks of concurrent documents are sorted by length and encoded in batches of at most
+        # EMBEDDING_BATCH_SIZE texts and EMBEDDING_BATCH_PADDED_TOKENS padded tokens
+        self.batcher = EncodeBatcher(
+            self.pool.encode if self.pool is not None else self._encode_batch,
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+            max_tokens=int(os.getenv("EMBEDDING_ROUND_TOKENS", "32768")),
+            padded_tokens=int(os.getenv("EMBEDDING_BATCH_PADDED_TOKENS", "8192")),
+            max_tokens_per_text=self.max_seq_length,
+            max_wait=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "10")) / 1000,
+            concurrency=max(ENCODE_WORKERS, 1),
+        )
+        # Chunks already embedded (same model, same normalized text) are not encoded again;
+        # EMBEDDING_CACHE=memory keeps only the in-process LRU, "off" disables the cache
+        cache_mode = os.getenv("EMBEDDING_CACHE", "mongo").lower()
+        # Quantized vectors differ slightly, so they are cached apart from the float32 ones
+        cache_model = self.model_name if EMBEDDING_BACKEND == "torch" else f"{self.model_name}@{EMBEDDING_BACKEND}"
+        self.cache = (
+            EmbeddingCache(
+                cache_model,
+                self.batcher.encode,
+                store=MongoEmbeddingStore(cache_model) if cache_mode == "mongo" else None,
+                lru_size=int(os.getenv("EMBEDDING_CACHE_LRU_SIZE", "20000")),
+            )
+            if cache_mode != "off"
+            else None
+        )
+
+        # Chunks are measured in model tokens: by default they fill the model window, special tokens included
+        window = self.max_seq_length - self.tokenizer.num_special_tokens_to_add()
+        self.chunk_size = min(int(os.getenv("CHUNK_TOKENS", str(window))), window)
+        self.chunk_overlap = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+        self.text_splitter = StreamingTextSplitter(
+            tokenizer_token_starts(self.tokenizer),
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
-            length_function=len,
         )
 
         logger.info(f"Embedding service initialized with model: {self.model_name}")
-        logger.info(f"Chunk size: {self.chunk_size}, Overlap: {self.chunk_overlap}")
+        logger.info(f"Chunk size: {self.chunk_size} tokens, Overlap: {self.chunk_overlap} tokens")
 
     @staticmethod
-    def _get_instance():
-        if not hasattr(EmbeddingGeneratorService, "_instance"):
-            EmbeddingGeneratorService._instance = EmbeddingGeneratorService()
+    def _get_instance(startup: StartupReport | None = None):
+        with EmbeddingGeneratorService._instance_lock:
+            if not hasattr(EmbeddingGeneratorService, "_instance"):
+                EmbeddingGeneratorService._instance = EmbeddingGeneratorService(startup)
         return EmbeddingGeneratorService._instance
 
+    def warm_up(self, texts_per_encoder: int = WARMUP_TEXTS) -> None:
+        """
+        Encode texts from a few words up to the chunk size, bypassing the cache.
+
+        The first batches of a fresh model pay for lazy initialization and for growing the allocator's
+        buffers to the largest batch shape; this runs them before any message is consumed.
+        """
+        if texts_per_encoder <= 0:
+            return
+        words = "De minister stelt bij regeling nadere regels vast over de aanvraag".split()
+        count = texts_per_encoder * max(ENCODE_WORKERS, 1)
+        texts = [
+            " ".join(words[j % len(words)] for j in range(1 + i * self.chunk_size // count))
+            for i in range(1, count + 1)
+        ]
+        self.batcher.encode(texts)
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        # The batcher already sorted and sized the batch
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
     def _split_document(self, text: str, metadata: dict = None) -> list[dict]:
         if not text:
             return []
@@ -79,6 +177,22 @@ class EmbeddingGeneratorService:
 
         return result_chunks
 
+    def _reuse_embeddings(self, chunks: list[dict], stored: list[dict[str, Any]]) -> int:
+        """
+        Copy vectors of stored chunks onto the chunks with the same whitespace-normalized text.
+
+        Returns:
+            Number of chunks that got a stored vector
+        """
+        vectors = {cache_key(self.model_name, chunk.get("text", "")): chunk.get("embedding") for chunk in stored}
+        reused = 0
+        for chunk in chunks:
+            vector = vectors.get(cache_key(self.model_name, chunk["text"]))
+            if vector is not None and len(vector):
+                chunk["embedding"] = np.asarray(vector, dtype=np.float32)
+                reused += 1
+        return reused
+
     def generate_embeddings(self, chunks: list[dict]) -> list[dict]:
         if not chunks:
             return []
@@ -86,11 +200,18 @@ class EmbeddingGeneratorService:
         texts = [chunk["text"] for chunk in chunks]
 
         try:
-            embeddings = self.model.encode(texts)
-            logger.info(f"Generated {len(embeddings)} embeddings")
+            if self.cache is not None:
+                embeddings, cached = self.cache.encode(texts)
+                logger.info(
+                    f"Generated {len(embeddings)} embeddings ({cached} from cache, "
+                    f"hit rate {self.cache.hit_rate:.1%} since start)"
+                )
+            else:
+                embeddings = self.batcher.encode(texts)
+                logger.info(f"Generated {len(embeddings)} embeddings")
 
             for i, embedding in enumerate(embeddings):
-                chunks[i]["embedding"] = embedding.tolist()
+                chunks[i]["embedding"] = embedding
 
             return chunks
         except Exception as e:
@@ -128,6 +249,11 @@ class EmbeddingGeneratorService:
                 "extension": message.data.extension,
                 "url": message.data.url,
             }
+            part = part_info(message)
+            if part is not None:
+                # Chunks of a split document are searched as chunks of the parent document
+                doc_metadata["document_id"] = part.parent_document_id
+                doc_metadata["part_index"] = part.part_index
 
             if message.metadata:
                 doc_metadata.update(
@@ -139,7 +265,8 @@ class EmbeddingGeneratorService:
                     }
                 )
 
-            chunks = instance._split_document(content_text, doc_metadata)
+            # The document metadata is sent once and applied to every chunk by data storage
+            chunks = instance._split_document(content_text)
 
             if not chunks:
                 logger.warning(f"No chunks created for document {message.data.id}")
@@ -147,24 +274,31 @@ class EmbeddingGeneratorService:
                     update_status("embedding", message.data.id, "completed", "Document too small for chunking")
                 return message
 
-            embedded_chunks = instance.generate_embeddings(chunks)
+            # A republished copy: chunks whose text is unchanged take the vectors of the earlier document
+            duplicate_of = near_duplicate_of(message)
+            reused = instance._reuse_embeddings(chunks, stored_chunks(duplicate_of)) if duplicate_of else 0
+            if reused:
+                logger.info(f"Reused {reused} of {len(chunks)} chunk vectors of near-duplicate {duplicate_of}")
 
-            if not embedded_chunks:
+            missing = [chunk for chunk in chunks if "embedding" not in chunk]
+            if missing and not instance.generate_embeddings(missing):
                 logger.error(f"Failed to generate embeddings for document {message.data.id}")
                 if message.data:
                     update_status("embedding", message.data.id, "failed", "Failed to generate embeddings")
                 return message
+            embedded_chunks = chunks
 
             if not message.data.payload:
                 message.data.payload = {}
 
-            message.data.payload["vector_chunks"] = embedded_chunks
+            message.data.payload["vector_chunks"] = encode_vector_chunks(embedded_chunks, doc_metadata, VECTOR_ENCODING)
 
             elapsed_time = time.time() - start_time
             logger.info(f"Generated embeddings for document {message.data.id} in {elapsed_time:.2f} seconds")
 
             if message.data:
-                update_status("embedding", message.data.id, "completed")
+                extra = {"reused_from": duplicate_of, "reused_chunks": reused} if reused else {}
+                update_status("embedding", message.data.id, "completed", **extra)
 
             return message
 
@@ -217,6 +351,7 @@ class EmbeddingProcessor(MessageProcessor):
 
 
 def main() -> None:
+    startup = StartupReport("embedding-generator")
     try:
         connection_string = os.getenv("AZURE_SERVICEBUS_CONNECTION_STRING", "")
         input_queue = os.getenv("AZURE_EMBEDDING_QUEUE", "embedding")
@@ -225,18 +360,29 @@ def main() -> None:
         if not connection_string:
             raise ValueError("AZURE_SERVICEBUS_CONNECTION_STRING environment variable not set")
 
-        handler = ServiceBusHandler(
-            connection_string=connection_string,
-            input_queue=input_queue,
-            output_queue=output_queue,
-            message_processor=EmbeddingProcessor(),
-        )
+        # The model is loaded and warmed up before consuming, so the first messages do not pay for it
+        # and the service reports ready (READINESS_FILE) only once it can embed at full speed
+        instance = EmbeddingGeneratorService._get_instance(startup)
+        with startup.phase("warm-up"):
+            instance.warm_up()
+
+        with startup.phase("service bus client"):
+            handler = ServiceBusHandler(
+                connection_string=connection_string,
+                input_queue=input_queue,
+                output_queue=output_queue,
+                message_processor=EmbeddingProcessor(),
+                # Messages in flight are locked (PEEK_LOCK) and share the handler's thread-safe publisher
+                max_concurrent_calls=MAX_CONCURRENT_DOCUMENTS,
+            )
+        startup.ready()
 
         logger.info("Starting Embedding Generator Service")
         logger.info(f"Listening on queue: {input_queue}")
         logger.info(f"Publishing to queue: {output_queue}")
 
         handler.start()
+        handler.close()
     except Exception as e:
         logger.error(f"Failed to start Embedding Generator Service: {e}")
         logger.error(traceback.format_exc())
@@ -0,0 +1,168 @@
+"""
+Dynamic, length-sorted batching of embedding requests.
+
+Documents are processed on several consumer threads. Each one hands its chunk
+texts to ``EncodeBatcher.encode`` and blocks until they are encoded. A single
+worker thread takes every request that is waiting, up to ``max_tokens``
+estimated tokens (the first request waits at most ``max_wait`` seconds for
+others), sorts all their texts by length and encodes them in batches whose
+padded size stays within ``padded_tokens``. Short chunks therefore go to the
+model in large batches with little padding, long ones in smaller batches,
+and the vectors are routed back to the request they came from.
+
+While the worker is encoding, new requests queue up and form the next round,
+so a burst of small documents is encoded in a few large batches instead of
+one small call per document. With ``concurrency`` above one, the batches of
+a round are encoded that many at a time (for an encoder backed by a pool of
+processes).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rough token estimate for Dutch text with a WordPiece tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+@dataclass
+class _Request:
+    texts: list[str]
+    tokens: int
+    result: Future[np.ndarray] = field(default_factory=Future)
+
+
+class EncodeBatcher:
+    """
+    Encodes the texts of concurrent callers together, sorted by length.
+
+    Args:
+        encode: Encodes a list of texts into a (len(texts), dim) float32 array
+        batch_size: Maximum texts per model call
+        max_tokens: Estimated tokens collected per round (a larger single request is taken whole)
+        padded_tokens: Maximum batch size times the longest text of the batch, in tokens
+        max_tokens_per_text: Model window; longer texts are truncated by the model
+        max_wait: Seconds the first request of a round waits for others
+        concurrency: Batches encoded at the same time; ``encode`` must then be thread-safe
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[list[str]], np.ndarray],
+        batch_size: int = 64,
+        max_tokens: int = 32768,
+        padded_tokens: int = 8192,
+        max_tokens_per_text: int = 256,
+        max_wait: float = 0.01,
+        concurrency: int = 1,
+    ) -> None:
+        self._encode = encode
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.padded_tokens = padded_tokens
+        self.max_tokens_per_text = max_tokens_per_text
+        self.max_wait = max_wait
+        self._executor = ThreadPoolExecutor(concurrency, thread_name_prefix="encode") if concurrency > 1 else None
+        self._cond = threading.Condition()
+        self._pending: list[_Request] = []
+        self._worker: threading.Thread | None = None
+        self.rounds = 0
+        self.batches = 0
+        self.texts = 0
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """
+        Encode ``texts`` as part of the next round.
+
+        Returns:
+            Array with one row per text, in the order of ``texts``
+
+        Raises:
+            Exception: Whatever the model raised for the round
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        request = _Request(texts, sum(min(estimate_tokens(t), self.max_tokens_per_text) for t in texts))
+        with self._cond:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work_forever, name="encode-batcher", daemon=True)
+                self._worker.start()
+            self._pending.append(request)
+            self._cond.notify_all()
+        return request.result.result()
+
+    def _take(self) -> list[_Request]:
+        """Wait for requests and take those of the next round."""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while sum(r.tokens for r in self._pending) < self.max_tokens and (left := deadline - time.monotonic()) > 0:
+                self._cond.wait(left)
+            taken, tokens = [], 0
+            while self._pending and (not taken or tokens + self._pending[0].tokens <= self.max_tokens):
+                tokens += self._pending[0].tokens
+                taken.append(self._pending.pop(0))
+            return taken
+
+    def _work_forever(self) -> None:
+        while True:
+            requests = self._take()
+            try:
+                results = self._run(requests)
+            except Exception as e:  # noqa: BLE001
+                for request in requests:
+                    request.result.set_exception(e)
+                continue
+            for request, result in zip(requests, results, strict=True):
+                request.result.set_result(result)
+
+    def _batches(self, lengths: list[int]) -> list[list[int]]:
+        """Indices into ``lengths`` grouped into batches, longest texts first."""
+        order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+        batches: list[list[int]] = []
+        for i in order:
+            batch = batches[-1] if batches else None
+            # The first text of a batch is its longest; the model pads the others to it
+            full = batch is None or len(batch) >= self.batch_size
+            if full or (len(batch) + 1) * lengths[batch[0]] > self.padded_tokens:
+                batches.append([i])
+            else:
+                batch.append(i)
+        return batches
+
+    def _run(self, requests: list[_Request]) -> list[np.ndarray]:
+        texts = [text for request in requests for text in request.texts]
+        lengths = [min(estimate_tokens(text), self.max_tokens_per_text) for text in texts]
+        vectors: np.ndarray | None = None
+        batches = self._batches(lengths)
+        run = self._executor.map if self._executor is not None else map
+        for batch, encoded in zip(batches, run(self._encode, [[texts[i] for i in b] for b in batches]), strict=True):
+            encoded = np.asarray(encoded, dtype=np.float32)
+            if vectors is None:
+                vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            vectors[batch] = encoded
+        assert vectors is not None
+        self.rounds += 1
+        self.batches += len(batches)
+        self.texts += len(texts)
+        logger.debug("Encoded %d texts of %d documents in %d batches", len(texts), len(requests), len(batches))
+
+        results, start = [], 0
+        for request in requests:
+            results.append(vectors[start : start + len(request.texts)])
+            start += len(request.texts)
+        return results
@@ -0,0 +1,273 @@
+"""
+Multi-process embedding encoding.
+
+A single PyTorch process does not scale much past a few intra-op threads,
+and its default thread count (one per core) competes with every other
+process in the container. ``EncodePool`` starts ``workers`` processes that
+each load the model with ``threads`` intra-op threads and, optionally, are
+pinned to their own cores. ``EncodePool.encode`` is thread-safe and runs a
+batch on the first idle worker, so an ``EncodeBatcher`` with
+``concurrency=workers`` keeps them all busy.
+
+Batches do not go through pickling: every worker has two shared-memory
+segments, one the parent writes the UTF-8 texts into and one the worker
+writes the float32 vectors into. Only the text lengths travel over the
+worker's pipe. A segment too small for a batch is replaced by a larger one.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["EncodePool", "load_model"]
+
+_INITIAL_SEGMENT_BYTES = 1 << 20
+
+
+def load_model(model_name: str, backend: str) -> Any:
+    """Default loader of the workers: ``load_embedding_model`` from ``shared``."""
+    from shared.tools.embedding_model import load_embedding_model
+
+    return load_embedding_model(model_name, backend)
+
+
+def _worker_main(
+    conn: Connection,
+    loader: Callable[..., Any],
+    loader_args: tuple[Any, ...],
+    threads: int,
+    cpus: list[int] | None,
+) -> None:
+    """Entry point of a worker process: load the model, then encode batches until the pipe closes."""
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except ImportError:
+        pass
+
+    try:
+        model = loader(*loader_args)
+        dim = int(np.asarray(model.encode(["warm-up"], batch_size=1, convert_to_numpy=True)).shape[1])
+    except Exception as e:  # noqa: BLE001
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", dim))
+
+    segments: dict[str, SharedMemory] = {}
+    while True:
+        try:
+            inbox_name, outbox_name, lengths = conn.recv()
+        except EOFError:
+            break
+        try:
+            for name in (inbox_name, outbox_name):
+                if name not in segments:
+                    # Spawned workers share the parent's resource tracker, which unlinks the segments
+                    segments[name] = SharedMemory(name=name)
+            for name in [name for name in segments if name not in (inbox_name, outbox_name)]:
+                segments.pop(name).close()
+            data = bytes(segments[inbox_name].buf[: sum(lengths)])
+            texts, start = [], 0
+            for length in lengths:
+                texts.append(data[start : start + length].decode())
+                start += length
+            vectors = np.asarray(model.encode(texts, batch_size=len(texts), convert_to_numpy=True), dtype=np.float32)
+            out = np.ndarray(vectors.shape, dtype=np.float32, buffer=segments[outbox_name].buf)
+            out[:] = vectors
+            del out
+            conn.send(("ok", len(texts)))
+        except Exception as e:  # noqa: BLE001
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+    for segment in segments.values():
+        segment.close()
+
+
+@dataclass
+class _Worker:
+    slot: int
+    process: BaseProcess
+    conn: Connection
+    inbox: SharedMemory
+    outbox: SharedMemory
+
+
+class EncodePool:
+    """
+    Processes that encode batches of texts with their own copy of the model.
+
+    Args:
+        workers: Number of processes
+        threads: Intra-op threads per process (default: the usable cores divided by ``workers``)
+        cpu_affinity: Pin each process to ``threads`` cores of its own (when there are enough)
+        loader: Picklable function that returns the model (anything with a sentence-transformers ``encode``)
+        loader_args: Arguments of ``loader``, e.g. the model name and backend
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        threads: int = 0,
+        cpu_affinity: bool = False,
+        loader: Callable[..., Any] = load_model,
+        loader_args: tuple[Any, ...] = (),
+    ) -> None:
+        cores = sorted(os.sched_getaffinity(0))
+        self.workers = workers
+        self.threads = threads or max(1, len(cores) // workers)
+        self.cpu_affinity = cpu_affinity and len(cores) >= workers * self.threads
+        if cpu_affinity and not self.cpu_affinity:
+            logger.warning(
+                "Not pinning encode workers: %d cores for %d x %d threads", len(cores), workers, self.threads
+            )
+        self._cores = cores
+        self._loader = loader
+        self._loader_args = loader_args
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._lock = threading.Lock()
+        self._all: list[_Worker] = []
+        self.dim = 0
+        started = [self._start(slot) for slot in range(workers)]
+        try:
+            for worker in started:
+                self._wait_ready(worker)
+                self._idle.put(worker)
+        except RuntimeError:
+            self.close()
+            raise
+        logger.info(
+            "Encode pool: %d workers x %d threads%s", workers, self.threads, " (pinned)" if self.cpu_affinity else ""
+        )
+
+    def _start(self, slot: int) -> _Worker:
+        cpus = self._cores[slot * self.threads : (slot + 1) * self.threads] if self.cpu_affinity else None
+        parent, child = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child, self._loader, self._loader_args, self.threads, cpus),
+            name=f"encode-worker-{slot}",
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        worker = _Worker(
+            slot,
+            process,
+            parent,
+            SharedMemory(create=True, size=_INITIAL_SEGMENT_BYTES),
+            SharedMemory(create=True, size=_INITIAL_SEGMENT_BYTES),
+        )
+        with self._lock:
+            self._all.append(worker)
+        return worker
+
+    def _wait_ready(self, worker: _Worker) -> None:
+        try:
+            status, value = worker.conn.recv()
+        except EOFError:
+            status, value = "error", f"exit code {worker.process.exitcode}"
+        if status != "ready":
+            raise RuntimeError(f"Encode worker {worker.slot} failed to start: {value}")
+        self.dim = value
+
+    def _restart(self, worker: _Worker) -> _Worker | None:
+        """Replace a dead worker; None when the replacement fails to start (the pool runs one worker short)."""
+        logger.warning("Encode worker %d died (exit code %s); restarting", worker.slot, worker.process.exitcode)
+        self._release(worker)
+        replacement = self._start(worker.slot)
+        try:
+            self._wait_ready(replacement)
+        except RuntimeError as e:
+            logger.error("%s; continuing without it", e)
+            self._release(replacement)
+            return None
+        return replacement
+
+    def _acquire(self) -> _Worker:
+        """Wait for an idle worker; fail instead of waiting forever once every worker is gone."""
+        while True:
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                with self._lock:
+                    if not self._all:
+                        raise RuntimeError("Encode pool has no workers left") from None
+
+    @staticmethod
+    def _fit(segment: SharedMemory, size: int) -> SharedMemory:
+        if segment.size >= size:
+            return segment
+        segment.close()
+        segment.unlink()
+        return SharedMemory(create=True, size=max(size, 2 * segment.size))
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """
+        Encode ``texts`` on an idle worker, waiting for one if all are busy.
+
+        Raises:
+            RuntimeError: The worker failed to encode the batch or died while encoding it, or no worker is left
+        """
+        data = [text.encode() for text in texts]
+        worker: _Worker | None = self._acquire()
+        try:
+            worker.inbox = self._fit(worker.inbox, sum(map(len, data)))
+            worker.outbox = self._fit(worker.outbox, len(texts) * self.dim * 4)
+            offset = 0
+            for encoded in data:
+                worker.inbox.buf[offset : offset + len(encoded)] = encoded
+                offset += len(encoded)
+            try:
+                worker.conn.send((worker.inbox.name, worker.outbox.name, [len(encoded) for encoded in data]))
+                status, value = worker.conn.recv()
+            except (EOFError, BrokenPipeError, ConnectionResetError) as e:
+                dead, worker = worker, None
+                worker = self._restart(dead)
+                raise RuntimeError("Encode worker died while encoding a batch") from e
+            if status != "ok":
+                raise RuntimeError(f"Encode worker failed: {value}")
+            return np.ndarray((len(texts), self.dim), dtype=np.float32, buffer=worker.outbox.buf).copy()
+        finally:
+            # A released worker (its replacement failed, or the pool was closed) is not handed out again
+            with self._lock:
+                usable = worker is not None and worker in self._all
+            if usable:
+                self._idle.put(worker)
+
+    def _release(self, worker: _Worker) -> None:
+        worker.conn.close()
+        if worker.process.is_alive():
+            worker.process.join(timeout=5)
+        if worker.process.is_alive():
+            worker.process.terminate()
+        for segment in (worker.inbox, worker.outbox):
+            segment.close()
+            segment.unlink()
+        with self._lock:
+            self._all.remove(worker)
+
+    def close(self) -> None:
+        with self._lock:
+            workers = list(self._all)
+        for worker in workers:
+            self._release(worker)
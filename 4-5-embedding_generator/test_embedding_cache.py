@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from embedding_cache import EmbeddingCache, MemoryEmbeddingStore  # noqa: E402
+
+
+def counting_encoder(encoded: list[str]):  # type: ignore[no-untyped-def]
+    def encode(texts: list[str]) -> np.ndarray:
+        encoded.extend(texts)
+        return np.array([[len(t), t.count(" ")] for t in texts], dtype=np.float32)
+
+    return encode
+
+
+def test_only_missing_distinct_chunks_are_encoded() -> None:
+    encoded: list[str] = []
+    store = MemoryEmbeddingStore()
+    cache = EmbeddingCache("model-a", counting_encoder(encoded), store)
+    preamble = "Gelet op artikel 2 van de Wet,"
+
+    vectors, cached = cache.encode([preamble, "Artikel 1", preamble + "\n"])
+    assert encoded == [preamble, "Artikel 1"] and cached == 0
+    assert vectors[2].tolist() == vectors[0].tolist()
+
+    # A new process (empty LRU) finds the vectors in the persistent store
+    other = EmbeddingCache("model-a", counting_encoder(encoded), store)
+    vectors, cached = other.encode(["Artikel 1", "Artikel 2"])
+    assert encoded[2:] == ["Artikel 2"] and cached == 1
+    assert (other.store_hits, other.misses) == (1, 1)
+
+    # Vectors of another model are never reused
+    EmbeddingCache("model-b", counting_encoder(encoded), store).encode(["Artikel 1"])
+    assert encoded[3:] == ["Artikel 1"]
+
+
+def test_lru_serves_repeated_chunks_and_reports_hit_rate() -> None:
+    encoded: list[str] = []
+    cache = EmbeddingCache("model-a", counting_encoder(encoded), lru_size=2)
+    cache.encode(["a", "b"])
+    cache.encode(["a", "b", "c"])
+    assert encoded == ["a", "b", "c"]
+    assert cache.memory_hits == 2 and cache.hit_rate == 2 / 5
+    # "a" was evicted when "c" came in
+    cache.encode(["a"])
+    assert encoded[-1] == "a"
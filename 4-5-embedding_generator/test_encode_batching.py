@@ -0,0 +1,53 @@
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from encode_batching import EncodeBatcher, estimate_tokens  # noqa: E402
+
+
+def fake_encode(calls: list[list[str]]):  # type: ignore[no-untyped-def]
+    def encode(texts: list[str]) -> np.ndarray:
+        calls.append(texts)
+        # One row per text that identifies it: (length, number in the text)
+        return np.array([[len(t), float(t.split()[-1])] for t in texts], dtype=np.float32)
+
+    return encode
+
+
+def test_concurrent_documents_share_sorted_batches() -> None:
+    calls: list[list[str]] = []
+    batcher = EncodeBatcher(fake_encode(calls), batch_size=4, padded_tokens=10_000, max_wait=0.5)
+    documents = {doc: [("woord " * (doc * 7 % 5 + i)) + f"{doc * 100 + i}" for i in range(3)] for doc in range(5)}
+    results: dict[int, np.ndarray] = {}
+
+    def run(doc: int) -> None:
+        results[doc] = batcher.encode(documents[doc])
+
+    threads = [threading.Thread(target=run, args=(doc,)) for doc in documents]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 15 chunks of 5 documents in 4 calls instead of 5, each call sorted longest first
+    assert batcher.rounds == 1 and len(calls) == 4
+    lengths = [estimate_tokens(t) for batch in calls for t in batch]
+    assert lengths == sorted(lengths, reverse=True)
+    for doc, texts in documents.items():
+        assert results[doc][:, 1].tolist() == [float(t.split()[-1]) for t in texts]
+
+
+def test_padded_token_budget_limits_batches_of_long_texts() -> None:
+    calls: list[list[str]] = []
+    batcher = EncodeBatcher(fake_encode(calls), batch_size=64, padded_tokens=1000, max_wait=0)
+    texts = ["x" * 1000 + f" {i}" for i in range(8)] + [f"kort {i}" for i in range(8)]
+
+    vectors = batcher.encode(texts)
+
+    # Long texts count as the 256-token window, so at most 3 fit in a batch
+    assert [len(batch) for batch in calls] == [3, 3, 3, 7]
+    assert vectors[:, 1].tolist() == [float(i) for i in range(8)] * 2
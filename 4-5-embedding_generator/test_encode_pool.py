@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from encode_batching import EncodeBatcher  # noqa: E402
+from encode_pool import EncodePool  # noqa: E402
+
+
+class FakeModel:
+    """Vectors that identify the text and the worker process that encoded it."""
+
+    def encode(self, texts: list[str], batch_size: int = 32, convert_to_numpy: bool = True) -> np.ndarray:
+        if "boom" in texts:
+            raise ValueError("cannot encode boom")
+        numbers = [float(t.split()[-1]) if t.split()[-1].isdigit() else -1.0 for t in texts]
+        return np.array([[len(t), n, os.getpid()] for t, n in zip(texts, numbers, strict=True)], dtype=np.float32)
+
+
+def fake_model() -> FakeModel:
+    return FakeModel()
+
+
+def fake_model_once(marker: str) -> FakeModel:
+    """Loads in the first worker only, so restarting it fails."""
+    if os.path.exists(marker):
+        raise OSError("model files gone")
+    Path(marker).touch()
+    return FakeModel()
+
+
+@pytest.fixture(scope="module")
+def pool():  # type: ignore[no-untyped-def]
+    pool = EncodePool(2, threads=1, loader=fake_model)
+    yield pool
+    pool.close()
+
+
+def test_batches_from_concurrent_callers_are_routed_back(pool: EncodePool) -> None:
+    batcher = EncodeBatcher(pool.encode, batch_size=8, padded_tokens=100_000, max_wait=0.2, concurrency=2)
+    # More text than the initial shared memory segments hold, so they are replaced by larger ones
+    documents = {doc: [("woord " * (300 * doc + i)) + f"{doc * 100 + i}" for i in range(40)] for doc in range(4)}
+    results: dict[int, np.ndarray] = {}
+
+    def run(doc: int) -> None:
+        results[doc] = batcher.encode(documents[doc])
+
+    threads = [threading.Thread(target=run, args=(doc,)) for doc in documents]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for doc, texts in documents.items():
+        assert results[doc][:, 0].tolist() == [len(t) for t in texts]
+        assert results[doc][:, 1].tolist() == [doc * 100 + i for i in range(40)]
+    # Both workers took part
+    assert len({pid for vectors in results.values() for pid in vectors[:, 2]}) == 2
+
+
+def test_worker_errors_reach_the_caller(pool: EncodePool) -> None:
+    with pytest.raises(RuntimeError, match="cannot encode boom"):
+        pool.encode(["tekst 1", "boom"])
+    # The worker is still usable
+    assert pool.encode(["tekst 7"])[0, 1] == 7
+
+
+def test_worker_that_cannot_be_restarted_is_not_reused(tmp_path: Path) -> None:
+    pool = EncodePool(1, threads=1, loader=fake_model_once, loader_args=(str(tmp_path / "loaded"),))
+    try:
+        assert pool.encode(["tekst 3"])[0, 1] == 3
+        pool._all[0].process.kill()
+        with pytest.raises(RuntimeError, match="died while encoding"):
+            pool.encode(["tekst 4"])
+        # The released worker was not put back: callers fail instead of using it or waiting forever
+        with pytest.raises(RuntimeError, match="no workers left"):
+            pool.encode(["tekst 5"])
+    finally:
+        pool.close()
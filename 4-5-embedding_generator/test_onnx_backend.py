@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("onnxruntime")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.tools.embedding_model import EMBEDDING_MODEL, load_embedding_model  # noqa: E402
+
+TEXTS = [
+    "Dit besluit treedt in werking met ingang van de dag na de datum van uitgifte van de Staatscourant.",
+    "Het college van burgemeester en wethouders beslist binnen acht weken op de aanvraag.",
+    "Gelet op artikel 2, eerste lid, van de Wet op de ruimtelijke ordening;",
+]
+
+
+@pytest.fixture(scope="module")
+def torch_vectors() -> np.ndarray:
+    try:
+        model = load_embedding_model(EMBEDDING_MODEL, "torch")
+    except OSError as e:  # model not downloadable here
+        pytest.skip(f"Model {EMBEDDING_MODEL} not available: {e}")
+    return model.encode(TEXTS, normalize_embeddings=True)
+
+
+@pytest.mark.parametrize(("backend", "min_cosine"), [("onnx", 0.999), ("onnx-int8", 0.97)])
+def test_onnx_vectors_match_torch(torch_vectors: np.ndarray, backend: str, min_cosine: float) -> None:
+    vectors = load_embedding_model(EMBEDDING_MODEL, backend).encode(TEXTS, normalize_embeddings=True)
+    assert vectors.shape == torch_vectors.shape
+    assert np.sum(vectors * torch_vectors, axis=1).min() >= min_cosine
@@ -0,0 +1,72 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from text_splitter import StreamingTextSplitter, regex_token_starts  # noqa: E402
+
+SENTENCES = [
+    "De minister stelt bij regeling nadere regels vast.",
+    "Dit besluit treedt in werking met ingang van de dag na uitgifte, tenzij anders bepaald.",
+    "Bezwaar kan worden gemaakt binnen zes weken.",
+]
+
+
+def document(paragraphs: int) -> str:
+    return "\n\n".join(
+        "\n".join(" ".join(SENTENCES[(p + line + i) % 3] for i in range(p % 4 + 1)) for line in range(p % 3 + 1))
+        for p in range(paragraphs)
+    )
+
+
+def tokens(text: str) -> int:
+    return len(regex_token_starts(text))
+
+
+def test_chunks_fit_the_window_and_prefer_higher_separators() -> None:
+    text = document(200)
+    splitter = StreamingTextSplitter(chunk_size=40, chunk_overlap=10, block_chars=100)
+    chunks = splitter.split_text(text)
+
+    assert all(tokens(chunk) <= 40 for chunk in chunks)
+    # Paragraphs that fit are never cut: every chunk that ends inside one ends on a line or sentence
+    for chunk in chunks:
+        end = text.index(chunk) + len(chunk)
+        assert end == len(text) or text[end] in "\n " or text[end - 1] in ".,"
+    # Small tokenizer blocks give the same chunks as tokenizing the text at once
+    assert chunks == StreamingTextSplitter(chunk_size=40, chunk_overlap=10, block_chars=10**9).split_text(text)
+
+
+def test_overlap_starts_on_a_separator_and_covers_the_text() -> None:
+    text = " ".join(SENTENCES * 30)
+    chunks = StreamingTextSplitter(chunk_size=30, chunk_overlap=12).split_text(text)
+
+    position = overlapping = 0
+    for previous, chunk in zip(chunks, chunks[1:], strict=False):
+        start = text.index(chunk, position)
+        end_previous = text.index(previous, position) + len(previous)
+        # Consecutive chunks overlap by at most 12 tokens, starting after ". ", or follow each other
+        assert not text[end_previous:start].strip()
+        assert tokens(text[start:end_previous]) <= 12
+        overlapping += start < end_previous
+        assert text[start - 2 : start] == ". "
+        position = start
+    assert overlapping
+    assert text.endswith(chunks[-1])
+
+
+def test_text_without_separators_fills_the_window_and_streams() -> None:
+    text = "-".join(f"art{i}" for i in range(100_000))
+    calls: list[int] = []
+
+    def counting_token_starts(block: str) -> list[int]:
+        calls.append(len(block))
+        return regex_token_starts(block)
+
+    chunks = StreamingTextSplitter(counting_token_starts, chunk_size=64, chunk_overlap=0).iter_chunks(text)
+    first, second = next(chunks), next(chunks)
+
+    assert tokens(first) == tokens(second) == 64
+    assert text.startswith(first + second)
+    # Only the first block has been tokenized so far
+    assert sum(calls) < len(text) // 5
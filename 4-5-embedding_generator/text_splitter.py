@@ -0,0 +1,175 @@
+"""
+Single-pass, token-aware text splitting.
+
+``StreamingTextSplitter`` cuts a document into chunks of at most
+``chunk_size`` tokenizer tokens with the separator priorities of the
+LangChain ``RecursiveCharacterTextSplitter`` it replaces (paragraph, line,
+sentence, clause, word): a chunk ends after the last paragraph break that
+fits in the window, else after the last line break, and so on; only text
+without any separator is cut at a token boundary. The next chunk starts at
+the earliest break of the same kind that leaves at most ``chunk_overlap``
+tokens of overlap, or right after the previous chunk when there is none.
+
+Token offsets are computed block by block (``block_chars`` characters cut at
+whitespace) as the splitter moves forward, and every window is scanned once,
+so the time is linear in the text and chunks are yielded as they are found.
+With the model's tokenizer and ``chunk_size`` set to the model window minus
+its special tokens, every chunk fills but never exceeds the window.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Callable, Iterator, Sequence
+from typing import Any
+
+import numpy as np
+
+__all__ = ["SEPARATORS", "StreamingTextSplitter", "regex_token_starts", "tokenizer_token_starts"]
+
+SEPARATORS = ("\n\n", "\n", ". ", ", ", " ")
+
+# Character offset of every token of a text
+TokenStarts = Callable[[str], Sequence[int]]
+
+_WORD_OR_PUNCT = re.compile(r"\w+|[^\w\s]")
+
+
+def regex_token_starts(text: str) -> list[int]:
+    """Words and punctuation marks as tokens; a lower bound of WordPiece tokens (tests, benchmarks)."""
+    return [match.start() for match in _WORD_OR_PUNCT.finditer(text)]
+
+
+def tokenizer_token_starts(tokenizer: Any) -> TokenStarts:
+    """Token offsets from a Hugging Face fast tokenizer, without special tokens."""
+
+    def token_starts(text: str) -> list[int]:
+        encoding = tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False,
+        )
+        return [start for start, _ in encoding["offset_mapping"]]
+
+    return token_starts
+
+
+class _TokenIndex:
+    """Token start offsets of ``text``, tokenized lazily in whitespace-aligned blocks."""
+
+    def __init__(self, text: str, token_starts: TokenStarts, block_chars: int) -> None:
+        self.text = text
+        self._token_starts = token_starts
+        self.block_chars = block_chars
+        self._starts = np.zeros(0, dtype=np.int64)
+        self._base = 0  # absolute index of self._starts[0]
+        self._tokenized_to = 0
+
+    def _extend(self) -> bool:
+        if self._tokenized_to >= len(self.text):
+            return False
+        begin = self._tokenized_to
+        end = min(len(self.text), begin + self.block_chars)
+        if end < len(self.text):
+            # Never cut a word: tokens of a block are then the tokens of the whole text
+            space = max(self.text.rfind(" ", begin, end), self.text.rfind("\n", begin, end))
+            if space > begin:
+                end = space
+        offsets = np.asarray(self._token_starts(self.text[begin:end]), dtype=np.int64) + begin
+        self._starts = np.concatenate([self._starts, offsets])
+        self._tokenized_to = end
+        return True
+
+    def index_at(self, char: int) -> int:
+        """Absolute index of the first token starting at or after ``char``."""
+        while (not len(self._starts) or self._starts[-1] < char) and self._extend():
+            pass
+        return self._base + int(np.searchsorted(self._starts, char))
+
+    def start_of(self, index: int) -> int | None:
+        """Character offset of token ``index``, or None past the end of the text."""
+        while index - self._base >= len(self._starts):
+            if not self._extend():
+                return None
+        return int(self._starts[index - self._base])
+
+    def discard_before(self, index: int) -> None:
+        drop = index - self._base
+        if drop > len(self._starts) // 2 and drop > 4096:
+            self._starts = self._starts[drop:]
+            self._base = index
+
+
+class StreamingTextSplitter:
+    """
+    Splits text into chunks measured in tokens.
+
+    Args:
+        token_starts: Character offset of every token of a text, e.g. ``tokenizer_token_starts(model.tokenizer)``
+        chunk_size: Maximum tokens per chunk
+        chunk_overlap: Maximum tokens shared by consecutive chunks
+        separators: Break points from the highest to the lowest priority
+        block_chars: Characters tokenized at a time
+    """
+
+    def __init__(
+        self,
+        token_starts: TokenStarts = regex_token_starts,
+        chunk_size: int = 254,
+        chunk_overlap: int = 50,
+        separators: Sequence[str] = SEPARATORS,
+        block_chars: int = 65_536,
+    ) -> None:
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"Chunk overlap ({chunk_overlap}) must be smaller than the chunk size ({chunk_size})")
+        self.token_starts = token_starts
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators)
+        self.block_chars = max(block_chars, 16 * chunk_size)
+
+    def _cut(self, text: str, start: int, limit: int) -> tuple[int, str | None]:
+        """End of the chunk starting at ``start`` that must end by ``limit``, and the separator it ends on."""
+        for separator in self.separators:
+            position = text.rfind(separator, start, limit)
+            if position >= 0 and text[start:position].strip():
+                return position + len(separator), separator
+        return limit, None
+
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        """Yield the chunks of ``text`` in order, stripped of surrounding whitespace."""
+        index = _TokenIndex(text, self.token_starts, self.block_chars)
+        start = 0
+        while start < len(text):
+            first = index.index_at(start)
+            limit = index.start_of(first + self.chunk_size)
+            if limit is None:
+                # The rest of the text fits
+                chunk = text[start:].strip()
+                if chunk:
+                    yield chunk
+                return
+            end, separator = self._cut(text, start, limit)
+            chunk = text[start:end].strip()
+            if chunk:
+                yield chunk
+
+            last = index.index_at(end)
+            overlap_from = index.start_of(max(last - self.chunk_overlap, first + 1))
+            next_start = end
+            if self.chunk_overlap and overlap_from is not None and overlap_from < end:
+                if separator is None:
+                    next_start = overlap_from
+                else:
+                    # Earliest break at or after overlap_from, before the one the chunk ends on
+                    position = text.find(separator, max(overlap_from - len(separator), start), end - 1)
+                    if position >= 0 and position + len(separator) > start:
+                        next_start = position + len(separator)
+            start = next_start
+            index.discard_before(index.index_at(start))
+
+    def split_text(self, text: str) -> list[str]:
+        return list(self.iter_chunks(text))
@@ -0,0 +1,96 @@
+"""
+Batching of short documents into one Gemini request.
+
+Messages are processed on several worker threads (see
+ServiceBusConsumer._listen_concurrently). A thread with a short document
+submits it to a ``BatchCollector`` and blocks until the batch it joined has
+been extracted. The first thread of a batch waits up to ``max_wait`` seconds
+for others to join; the batch is sent as soon as it is full or that time is
+up, by the thread that completed or opened it.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any
+
+
+@dataclass
+class _Item:
+    key: str
+    text: str
+    result: Future[dict[str, Any] | None] = field(default_factory=Future)
+
+
+class BatchCollector:
+    """
+    Collects (key, text) items from concurrent callers and runs them in batches.
+
+    Args:
+        run_batch: Extracts a batch, returning a result per key; keys missing
+            from the result get ``None`` (the caller then falls back)
+        max_items: Batch size that triggers an immediate send
+        max_wait: Seconds the first item of a batch waits for others
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[list[tuple[str, str]]], dict[str, dict[str, Any]]],
+        max_items: int,
+        max_wait: float,
+    ) -> None:
+        self.run_batch = run_batch
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._pending: list[_Item] = []
+        # Incremented every time the pending batch is taken, so a waiting leader knows
+        # whether its batch already left
+        self._generation = 0
+
+    def _take(self) -> list[_Item]:
+        batch, self._pending = self._pending, []
+        self._generation += 1
+        self._cond.notify_all()
+        return batch
+
+    def submit(self, key: str, text: str) -> dict[str, Any] | None:
+        """
+        Extract ``text`` as part of a batch.
+
+        Returns:
+            The result for ``key``, or None when the batch did not contain one
+
+        Raises:
+            Exception: Whatever ``run_batch`` raised for the batch
+        """
+        item = _Item(key, text)
+        batch: list[_Item] = []
+        with self._cond:
+            self._pending.append(item)
+            generation = self._generation
+            if len(self._pending) >= self.max_items:
+                batch = self._take()
+            elif len(self._pending) == 1:
+                deadline = time.monotonic() + self.max_wait
+                while self._generation == generation and (left := deadline - time.monotonic()) > 0:
+                    self._cond.wait(left)
+                if self._generation == generation:
+                    batch = self._take()
+        if batch:
+            self._run(batch)
+        return item.result.result()
+
+    def _run(self, batch: list[_Item]) -> None:
+        try:
+            results = self.run_batch([(item.key, item.text) for item in batch])
+        except Exception as e:  # noqa: BLE001
+            for item in batch:
+                item.result.set_exception(e)
+            return
+        for item in batch:
+            item.result.set_result(results.get(item.key))
@@ -0,0 +1,146 @@
+"""
+Token-budgeted selection of the text sent to Gemini for metadata extraction.
+
+Title, issuing authority, dates and publication numbers are almost always in
+the first pages and in the closing/signature block, so a long document is
+reduced to its head and tail plus the middle sections that score highest on
+cheap keyword and structure heuristics ("treedt in werking", "Artikel 1",
+"Staatscourant", dates, ...), until METADATA_INPUT_TOKEN_BUDGET is reached.
+Selected sections are returned in document order with their character spans
+so that the extractor can record exactly what was sent.
+
+Tokens are estimated at CHARS_PER_TOKEN characters per token, which is close
+to what Gemini counts for Dutch text and avoids a count_tokens round trip.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+
+# Maximum estimated tokens of document text per request (0 = send the whole text)
+TOKEN_BUDGET = int(os.getenv("METADATA_INPUT_TOKEN_BUDGET", "8000"))
+# Share of the budget reserved for the start and for the end of the document
+HEAD_SHARE = float(os.getenv("METADATA_INPUT_HEAD_SHARE", "0.5"))
+TAIL_SHARE = float(os.getenv("METADATA_INPUT_TAIL_SHARE", "0.2"))
+CHARS_PER_TOKEN = 4
+# Middle sections are paragraphs, cut to at most this many characters
+SECTION_MAX_CHARS = 2000
+# Placed between non-adjacent sections so the model knows text was left out
+GAP_MARKER = "\n\n[...]\n\n"
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_MONTHS = "januari|februari|maart|april|mei|juni|juli|augustus|september|oktober|november|december"
+# Phrases that tend to surround the metadata fields, with their weight
+_KEYWORDS = [
+    (re.compile(r"treedt in werking|inwerkingtreding|in werking treden", re.IGNORECASE), 5.0),
+    (re.compile(r"wordt ingetrokken|vervalt|intrekking", re.IGNORECASE), 4.0),
+    (re.compile(r"wijzig(ing|t)|wordt gewijzigd", re.IGNORECASE), 2.0),
+    (re.compile(r"gelet op|op grond van|ter uitvoering van|richtlijn", re.IGNORECASE), 3.0),
+    (re.compile(r"staatscourant|staatsblad|stcrt\.|stb\.|kenmerk|nr\.", re.IGNORECASE), 3.0),
+    (re.compile(r"minister|staatssecretaris|college van|gedeputeerde staten|burgemeester", re.IGNORECASE), 2.0),
+    (re.compile(r"citeertitel|wordt aangehaald als", re.IGNORECASE), 5.0),
+    (re.compile(r"bestuurlijke boete|strafbaar|sanctie|last onder dwangsom", re.IGNORECASE), 2.0),
+    (re.compile(r"uitspraak|ECLI:", re.IGNORECASE), 2.0),
+    (re.compile(rf"\b\d{{1,2}} (?:{_MONTHS}) \d{{4}}\b", re.IGNORECASE), 2.0),
+]
+# Headings: "Artikel 1", "Hoofdstuk 2", "§ 3", or a short line in capitals
+_HEADING = re.compile(
+    r"^\s*(?:(?i:artikel\s+\d+[a-z]?\b|hoofdstuk\s+\w+|paragraaf\s+\w+)|§\s*\d+|[A-Z][A-Z ,.-]{3,60}$)", re.MULTILINE
+)
+
+
+@dataclass
+class InputSelection:
+    """Text to send to the model and where in the document it came from."""
+
+    text: str
+    # [start, end) character offsets into the (stripped) document text, in order
+    spans: list[list[int]]
+    estimated_tokens: int
+    document_tokens: int
+
+    @property
+    def truncated(self) -> bool:
+        return self.estimated_tokens < self.document_tokens
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "spans": self.spans,
+            "estimated_tokens": self.estimated_tokens,
+            "document_tokens": self.document_tokens,
+            "truncated": self.truncated,
+        }
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _sections(text: str, start: int, end: int) -> list[tuple[int, int]]:
+    """Paragraph spans within ``[start, end)``, long paragraphs cut to SECTION_MAX_CHARS."""
+    spans = []
+    position = start
+    for brk in _PARAGRAPH_BREAK.finditer(text, start, end):
+        spans.append((position, brk.start()))
+        position = brk.end()
+    spans.append((position, end))
+    sections = []
+    for lo, hi in spans:
+        for cut in range(lo, hi, SECTION_MAX_CHARS):
+            sections.append((cut, min(cut + SECTION_MAX_CHARS, hi)))
+    return [(lo, hi) for lo, hi in sections if text[lo:hi].strip()]
+
+
+def score_section(section: str) -> float:
+    """Keyword and structure score per 1000 characters (so long sections are not favoured)."""
+    score = sum(weight * len(pattern.findall(section)) for pattern, weight in _KEYWORDS)
+    score += 1.5 * len(_HEADING.findall(section))
+    return score * 1000 / max(len(section), 200)
+
+
+def _merge(spans: list[tuple[int, int]]) -> list[list[int]]:
+    merged: list[list[int]] = []
+    for lo, hi in sorted(spans):
+        if merged and lo <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return merged
+
+
+def select_input(text: str, token_budget: int = TOKEN_BUDGET) -> InputSelection:
+    """
+    Reduce a document to at most ``token_budget`` estimated tokens.
+
+    Args:
+        text: Extracted document text
+        token_budget: Maximum estimated tokens (0 or less = no limit)
+
+    Returns:
+        InputSelection with the text to send and the spans it was taken from
+    """
+    text = text.strip()
+    document_tokens = estimate_tokens(text)
+    if token_budget <= 0 or document_tokens <= token_budget:
+        return InputSelection(text, [[0, len(text)]] if text else [], document_tokens, document_tokens)
+
+    budget_chars = token_budget * CHARS_PER_TOKEN
+    head_end = int(budget_chars * HEAD_SHARE)
+    tail_start = len(text) - int(budget_chars * TAIL_SHARE)
+    chosen = [(0, head_end), (tail_start, len(text))]
+    remaining = budget_chars - head_end - (len(text) - tail_start) - len(GAP_MARKER)
+
+    # Best-scoring middle sections first; the document order breaks ties, earlier text wins
+    scored = [(score_section(text[lo:hi]), lo, hi) for lo, hi in _sections(text, head_end, tail_start)]
+    for score, lo, hi in sorted(scored, key=lambda item: (-item[0], item[1])):
+        # Each gap marker costs a few characters of the budget too
+        cost = hi - lo + len(GAP_MARKER)
+        if score > 0 and cost <= remaining:
+            chosen.append((lo, hi))
+            remaining -= cost
+
+    spans = _merge(chosen)
+    selected = GAP_MARKER.join(text[lo:hi] for lo, hi in spans)
+    return InputSelection(selected, spans, estimate_tokens(selected), document_tokens)
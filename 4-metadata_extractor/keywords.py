@@ -0,0 +1,293 @@
+"""
+Local TF-IDF keyword extraction.
+
+Keywords are scored as ``(1 + log tf) * idf`` over unigram and bigram
+candidates that contain no stop words. Words are reduced with a light Dutch
+suffix stemmer ("regelingen" and "regeling" count as one term) and shown in
+their most frequent form in the document. Only the terms worth scoring are
+looked at: those repeated in the document (all terms of a tiny one), the most
+frequent first and with bigrams capped. Document frequencies come from a
+corpus vocabulary that every scored document updates once (by document id),
+so the statistics grow with the corpus without reprocessing it.
+
+The vocabulary lives in MongoDB (one small document per term) and is held in
+memory: lookups never leave the process and new documents are written in
+periodic bulk flushes. ``MemoryVocabulary`` offers the same interface
+in-process for tests.
+"""
+
+from __future__ import annotations
+
+import atexit
+import datetime as dt
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterable
+from typing import Protocol
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from shared.tools.mongo import get_collection
+
+__all__ = ["MemoryVocabulary", "MongoVocabulary", "extract_keywords", "stem"]
+
+logger = logging.getLogger(__name__)
+
+VOCABULARY_COLLECTION = os.getenv("KEYWORD_VOCABULARY_COLLECTION", "keyword_vocabulary")
+DOCUMENTS_COLLECTION = os.getenv("KEYWORD_DOCUMENTS_COLLECTION", "keyword_documents")
+TOP_K = 10
+# Only the start of very long documents is scored
+MAX_CHARS = 200_000
+MIN_WORD_CHARS = 3
+# Bigrams are more specific than single words
+BIGRAM_WEIGHT = 1.5
+# Documents with at most this many distinct terms score all of them; larger ones only repeated terms
+SMALL_DOCUMENT_TERMS = 50
+# Terms per document scored and counted in the corpus, the most frequent first
+MAX_UNIGRAMS = 300
+MAX_BIGRAMS = 100
+# New document frequencies are written in one bulk flush per this many documents or seconds
+FLUSH_DOCUMENTS = int(os.getenv("KEYWORD_VOCABULARY_FLUSH_DOCUMENTS", "100"))
+FLUSH_SECONDS = float(os.getenv("KEYWORD_VOCABULARY_FLUSH_SECONDS", "60"))
+# The in-memory vocabulary is reloaded this often to pick up documents counted by other replicas
+RELOAD_SECONDS = float(os.getenv("KEYWORD_VOCABULARY_RELOAD_SECONDS", "3600"))
+
+STOP_WORDS = frozenset(
+    """
+    aan aangezien achter af al alle alleen als alsmede alsook altijd andere anders ben bij binnen boven daar daarbij
+    daarin daarmee daarna daarom daarop daarvan dan dat de deze die dit doch doen door dus een eens en enige er
+    geen geweest haar had heb hebben heeft hem het hier hij hoe hun ieder iemand iets ik in is ja je kan kon kunnen
+    maar me meer men met mij mijn moet na naar niet niets nog nu of om omdat onder ons ook op over reeds te tegen
+    toch toen tot u uit uw van veel voor want waren was wat we wel werd wezen wie wij wil worden wordt zal ze zei
+    zelf zich zij zijn zo zonder zou zullen hierbij hiervan hierin waarbij waarin waarop waarvan welke welk
+    tevens alsmede onderscheidenlijk bedoeld bedoelde genoemd genoemde artikel artikelen lid leden onderdeel
+    onderdelen sub eerste tweede derde vierde vijfde volgende vorige nummer nr jaar dag dagen waarmee
+    the and for with from this that are was were
+    """.split()
+)
+
+_SEGMENT = re.compile(r"[.,;:!?()\[\]\"“”‘’/\n]+")
+_WORD = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)*")
+
+
+class Vocabulary(Protocol):
+    def statistics(self, terms: list[str]) -> tuple[int, dict[str, int]]:
+        """Number of documents seen and the document frequency of each of ``terms``."""
+        ...
+
+    def add_document(self, document_id: str, terms: Iterable[str]) -> bool:
+        """Count ``terms`` once for ``document_id``; False if the document was already counted."""
+        ...
+
+
+class MongoVocabulary:
+    """
+    Document frequencies persisted in MongoDB and held in memory.
+
+    The frequencies are loaded once and reloaded every RELOAD_SECONDS (other
+    replicas count documents too). A new document costs one insert of its id,
+    which keeps a redelivered document from being counted twice; its terms are
+    counted in memory and written with one bulk ``$inc`` per FLUSH_DOCUMENTS
+    documents or FLUSH_SECONDS.
+    """
+
+    def __init__(
+        self, collection_name: str = VOCABULARY_COLLECTION, documents_collection: str = DOCUMENTS_COLLECTION
+    ) -> None:
+        self.collection = get_collection(collection_name)
+        self.documents = get_collection(documents_collection)
+        self._lock = threading.Lock()
+        self._pending: Counter[str] = Counter()
+        self._pending_documents = 0
+        self._last_flush = time.monotonic()
+        self._load()
+
+    def _load(self) -> None:
+        frequencies = Counter({doc["_id"]: doc["df"] for doc in self.collection.find({}, {"df": 1})})
+        total = self.documents.estimated_document_count()
+        with self._lock:
+            # Counted here but not flushed yet, so not in the collection
+            frequencies.update(self._pending)
+            self._frequencies = frequencies
+            self._total = total
+            self._loaded_at = time.monotonic()
+
+    def statistics(self, terms: list[str]) -> tuple[int, dict[str, int]]:
+        if time.monotonic() - self._loaded_at > RELOAD_SECONDS:
+            self._load()
+        with self._lock:
+            return self._total, {term: self._frequencies[term] for term in terms if term in self._frequencies}
+
+    def add_document(self, document_id: str, terms: Iterable[str]) -> bool:
+        try:
+            self.documents.insert_one({"_id": document_id, "created_at": dt.datetime.now(tz=dt.UTC)})
+        except DuplicateKeyError:
+            return False
+        unique = set(terms)
+        with self._lock:
+            self._frequencies.update(unique)
+            self._pending.update(unique)
+            self._total += 1
+            self._pending_documents += 1
+            due = self._pending_documents >= FLUSH_DOCUMENTS or time.monotonic() - self._last_flush >= FLUSH_SECONDS
+        if due:
+            self.flush()
+        return True
+
+    def flush(self) -> None:
+        """Write the pending document frequencies; kept for the next flush when MongoDB fails."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._pending_documents = 0
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            self.collection.bulk_write(
+                [UpdateOne({"_id": term}, {"$inc": {"df": count}}, upsert=True) for term, count in pending.items()],
+                ordered=False,
+            )
+        except PyMongoError as e:
+            logger.warning("Could not flush %d keyword vocabulary terms: %s", len(pending), e)
+            with self._lock:
+                self._pending.update(pending)
+
+
+class MemoryVocabulary:
+    """In-process vocabulary with the same interface (tests)."""
+
+    def __init__(self) -> None:
+        self.documents: set[str] = set()
+        self.frequencies: Counter[str] = Counter()
+
+    def statistics(self, terms: list[str]) -> tuple[int, dict[str, int]]:
+        return len(self.documents), {term: self.frequencies[term] for term in terms if term in self.frequencies}
+
+    def add_document(self, document_id: str, terms: Iterable[str]) -> bool:
+        if document_id in self.documents:
+            return False
+        self.documents.add(document_id)
+        self.frequencies.update(set(terms))
+        return True
+
+
+def _undouble(word: str) -> str:
+    """Undouble a final consonant: "bakk" -> "bak"."""
+    if len(word) > 2 and word[-1] == word[-2] and word[-1] not in "aeiou":
+        return word[:-1]
+    return word
+
+
+def stem(word: str) -> str:
+    """
+    Light Dutch stemmer: strips plural and inflection endings.
+
+    Examples: regelingen -> regeling, vergunningen -> vergunning,
+    mogelijkheden -> mogelijkheid, subsidies -> subsidi, besluiten -> besluit.
+    """
+    if len(word) <= 4:
+        return word
+    if word.endswith("heden"):
+        return word[:-5] + "heid"
+    if word.endswith("en") and len(word) > 5:
+        return _undouble(word[:-2])
+    if word.endswith("'s"):
+        return word[:-2]
+    if word.endswith("s") and word[-2] not in "su" and len(word) > 5:
+        word = word[:-1]
+    if word.endswith("e") and len(word) > 5:
+        return _undouble(word[:-1])
+    return word
+
+
+def _candidates(text: str) -> tuple[Counter[str], dict[str, Counter[str]]]:
+    """Term frequencies of unigram/bigram stems and the surface forms seen for each."""
+    counts: Counter[str] = Counter()
+    forms: dict[str, Counter[str]] = {}
+    for segment in _SEGMENT.split(text[:MAX_CHARS].lower()):
+        previous: tuple[str, str] | None = None
+        for word in _WORD.findall(segment):
+            if len(word) < MIN_WORD_CHARS or word in STOP_WORDS:
+                previous = None
+                continue
+            current = (stem(word), word)
+            terms = [current]
+            if previous is not None:
+                terms.append((f"{previous[0]} {current[0]}", f"{previous[1]} {word}"))
+            for term, form in terms:
+                counts[term] += 1
+                forms.setdefault(term, Counter())[form] += 1
+            previous = current
+    return counts, forms
+
+
+def _scored_terms(counts: Counter[str]) -> list[str]:
+    """The terms worth scoring: repeated ones (any in a tiny document), most frequent first, bigrams capped."""
+    small = len(counts) <= SMALL_DOCUMENT_TERMS
+    # Terms seen once are noise unless the document is tiny
+    terms = [term for term, count in counts.most_common() if count >= 2 or small]
+    unigrams = [term for term in terms if " " not in term][:MAX_UNIGRAMS]
+    bigrams = [term for term in terms if " " in term][:MAX_BIGRAMS]
+    return unigrams + bigrams
+
+
+_vocabulary: Vocabulary | None = None
+
+
+def extract_keywords(
+    document_id: str, text: str, vocabulary: Vocabulary | None = None, top_k: int = TOP_K
+) -> list[str]:
+    """
+    Score the document's terms against the corpus and add the document to it.
+
+    Args:
+        document_id: Counted once in the corpus statistics
+        text: Document text
+        vocabulary: Corpus statistics (default: MongoDB); when unreachable the
+            terms are scored on frequency alone
+        top_k: Number of keywords
+
+    Returns:
+        Keywords in their most frequent surface form, best first
+    """
+    counts, forms = _candidates(text)
+    terms = _scored_terms(counts)
+    if not terms:
+        return []
+    global _vocabulary
+
+    total, frequencies = 0, {}
+    try:
+        if vocabulary is None:
+            if _vocabulary is None:
+                _vocabulary = MongoVocabulary()
+                atexit.register(_vocabulary.flush)
+            vocabulary = _vocabulary
+        total, frequencies = vocabulary.statistics(terms)
+        vocabulary.add_document(document_id, terms)
+    except PyMongoError as e:
+        logger.warning("Keyword vocabulary unavailable, scoring on term frequency only: %s", e)
+
+    def score(term: str) -> float:
+        idf = math.log((total + 1) / (frequencies.get(term, 0) + 1)) + 1
+        weight = BIGRAM_WEIGHT if " " in term else 1.0
+        return (1 + math.log(counts[term])) * idf * weight
+
+    keywords: list[str] = []
+    chosen_words: set[str] = set()
+    for term in sorted(terms, key=lambda t: (-score(t), t)):
+        words = set(term.split())
+        # Skip a word already covered by a chosen bigram, and a bigram made of chosen words
+        if words <= chosen_words:
+            continue
+        keywords.append(forms[term].most_common(1)[0][0])
+        chosen_words |= words
+        if len(keywords) >= top_k:
+            break
+    return keywords
@@ -2,13 +2,17 @@ import datetime as dt
 import json
 import logging
 import os
+import random
 import re
 import sys
+import threading
+from dataclasses import fields
 from pathlib import Path
 from typing import Any
 
 import google.generativeai as genai
 from dotenv import load_dotenv
+from google.api_core.exceptions import ResourceExhausted, TooManyRequests
 from google.generativeai import GenerativeModel
 
 # Ensure '/app' (the project root in containers) is on sys.path before importing 'shared'
@@ -16,10 +20,22 @@ current_dir = Path(__file__).parent
 parent_dir = current_dir.parent
 if str(parent_dir) not in sys.path:
     sys.path.insert(0, str(parent_dir))
+if str(current_dir) not in sys.path:
+    sys.path.insert(0, str(current_dir))
+
+from batching import BatchCollector
+from input_selection import estimate_tokens, select_input
+from keywords import extract_keywords
+from rule_based import extract_rule_based
 
 from shared.models.messages import AppMessage, MetadataInfo
+from shared.tools.document_parts import part_info
+from shared.tools.llm_accounting import accounted
+from shared.tools.llm_resilience import CircuitOpenError, ResilientCaller
 from shared.tools.MessageProcessor import MessageProcessor
+from shared.tools.near_duplicate_reuse import near_duplicate_of, stored_message
 from shared.tools.pipeline_status import update_status
+from shared.tools.rate_limiter import RateLimiter
 from shared.tools.ServiceBusConsumer import ServiceBusConsumer
 from shared.tools.ServiceBusHandler import MessageHandler
 from shared.tools.ServiceBusPublisher import ServiceBusPublisher
@@ -67,6 +83,53 @@ OUTPUT_DATA_STORAGE_QUEUE_NAME = os.getenv("AZURE_EMBEDDING_QUEUE", "embedding")
 OUTPUT_SEARCH_INDEX_QUEUE_NAME = os.getenv("AZURE_SEARCH_INDEX_QUEUE", "search-index")
 OUTPUT_NOTIFICATION_QUEUE_NAME = os.getenv("AZURE_NOTIFICATION_QUEUE", "notifications")
 
+GEMINI_MODEL = "gemini-2.0-flash"
+# Seconds before a Gemini request is abandoned (also the HTTP timeout of the client)
+GEMINI_DEADLINE_SECONDS = float(os.getenv("GEMINI_DEADLINE_SECONDS", "60"))
+
+# Messages processed (and Gemini requests in flight) at the same time per process
+MAX_IN_FLIGHT = int(os.getenv("METADATA_MAX_IN_FLIGHT", "4"))
+# Gemini quota to stay under, per process (0 = unlimited)
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "1000"))
+GEMINI_TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+# Retries after a 429, with exponential backoff (seconds) and jitter
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_BACKOFF_SECONDS = float(os.getenv("GEMINI_BACKOFF_SECONDS", "2"))
+GEMINI_BACKOFF_MAX_SECONDS = 60.0
+# Output tokens counted against the token quota for one metadata response
+GEMINI_OUTPUT_TOKENS = 1000
+# Documents of at most METADATA_BATCH_DOC_TOKENS (estimated) are extracted up to
+# METADATA_BATCH_SIZE per request (1 = one request per document); the first document of a
+# batch waits at most METADATA_BATCH_WAIT_MS for others
+BATCH_SIZE = int(os.getenv("METADATA_BATCH_SIZE", "8"))
+BATCH_DOC_TOKENS = int(os.getenv("METADATA_BATCH_DOC_TOKENS", "1500"))
+BATCH_WAIT_SECONDS = float(os.getenv("METADATA_BATCH_WAIT_MS", "200")) / 1000
+# Fields found by the rule-based extractor with at least this confidence are not asked from Gemini
+RULES_ENABLED = os.getenv("METADATA_RULES_ENABLED", "true").lower() in {"1", "true", "yes"}
+RULES_MIN_CONFIDENCE = float(os.getenv("METADATA_RULES_MIN_CONFIDENCE", "0.8"))
+# Document types (comma separated, e.g. "Kennisgeving,Beschikking") for which Gemini is skipped when the
+# rules found all core fields; summary, keywords and scopes then stay empty
+RULES_SKIP_TYPES = {t.strip().lower() for t in os.getenv("METADATA_RULES_SKIP_TYPES", "").split(",") if t.strip()}
+# Keywords from the local TF-IDF extractor: "fallback" when Gemini returns none (or fails), "local" instead
+# of Gemini's, "llm" to only use Gemini's
+KEYWORDS_SOURCE = os.getenv("METADATA_KEYWORDS_SOURCE", "fallback").lower()
+
+METADATA_FIELDS = [f.name for f in fields(MetadataInfo) if f.name != "timestamp"]
+# Fields that identify one publication; a near-duplicate gets them from the rules instead of the earlier document
+PUBLICATION_FIELDS = {
+    "identifiers",
+    "official_publication",
+    "publication_number",
+    "publication_date",
+    "effective_date",
+    "repeal_date",
+}
+
+gemini_limiter = RateLimiter(MAX_IN_FLIGHT, GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE)
+# Deadline, hedging after the p95 latency and the process-wide circuit breaker; quota errors are
+# handled by the backoff in _generate and do not count as failures
+gemini_guard = ResilientCaller(GEMINI_MODEL, GEMINI_DEADLINE_SECONDS, passthrough=(ResourceExhausted, TooManyRequests))
+
 
 def _strip_code_fences(text: str) -> str:
     """Remove ```json ... ``` or ``` ... ``` fences if present."""
@@ -76,6 +139,18 @@ def _strip_code_fences(text: str) -> str:
     return m.group(1).strip() if m else text
 
 
+def _parse_json(raw: str, pattern: str) -> Any:
+    """Parse model output, falling back to the first ``pattern`` match when there is text around the JSON."""
+    cleaned = _strip_code_fences(raw)
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        maybe = re.search(pattern, cleaned, re.DOTALL)
+        if not maybe:
+            raise
+        return json.loads(maybe.group(0))
+
+
 def _coerce_bool(value: Any, default: bool = False) -> bool:
     if isinstance(value, bool):
         return value
@@ -121,35 +196,148 @@ class MetadataProcessor(MessageProcessor):
     fan-out messages, and returns a MetadataExtractedMessage.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, requeue: ServiceBusPublisher | None = None) -> None:
+        """
+        Args:
+            requeue: Publisher to the input queue that deferred messages are republished to; created once
+                and shared by all worker threads (it serializes its sends). Without one, messages are not
+                deferred but failed, and the consumer delivers them again.
+        """
         # Lazily initialize client to avoid env issues in import time
         self._client: GenerativeModel | None = None
+        self._client_lock = threading.Lock()
+        self._requeue = requeue
+        self._batcher = BatchCollector(self._extract_metadata_objs, BATCH_SIZE, BATCH_WAIT_SECONDS)
 
     def _get_gemini_client(self) -> GenerativeModel:
-        if self._client is None:
-            api_key = os.getenv("GEMINI_API_KEY")
-            if not api_key:
-                raise RuntimeError("GEMINI_API_KEY is not set in environment")
-            self._client = genai.GenerativeModel(
-                model_name="gemini-2.0-flash",
-                system_instruction=METADATA_TEXT_SYSTEM_PROMPT,
-            )
-        return self._client
+        # Messages are processed on several threads; create the client once
+        with self._client_lock:
+            if self._client is None:
+                api_key = os.getenv("GEMINI_API_KEY")
+                if not api_key:
+                    raise RuntimeError("GEMINI_API_KEY is not set in environment")
+                self._client = genai.GenerativeModel(
+                    model_name=GEMINI_MODEL,
+                    system_instruction=METADATA_TEXT_SYSTEM_PROMPT,
+                )
+            return self._client
 
     # --- Model call ---
-    def _extract_metadata_obj(self, text: str) -> dict[str, Any]:
+    def _generate(
+        self, prompt: str, responses: int = 1, document_ids: list[str] | None = None, **generation_config: Any
+    ) -> str:
+        """
+        Call Gemini within the process-wide rate limits and through gemini_guard.
+
+        A 429 pauses every caller of this process (exponential backoff with
+        jitter) before the request is retried. A hedged second request shares
+        the rate-limiter slot of the first. Every request is accounted for
+        ``document_ids`` (tokens, latency, cost).
+
+        Args:
+            prompt: User prompt
+            responses: Metadata objects expected in the answer (for the token estimate)
+            document_ids: Documents the request is made for
+            generation_config: Passed on to generate_content
+        """
         client = self._get_gemini_client()
+        tokens = estimate_tokens(METADATA_TEXT_SYSTEM_PROMPT + prompt) + GEMINI_OUTPUT_TOKENS * responses
+
+        def request() -> str:
+            response = accounted(
+                "extractor",
+                GEMINI_MODEL,
+                lambda: client.generate_content(
+                    prompt,
+                    generation_config=generation_config or None,
+                    request_options={"timeout": GEMINI_DEADLINE_SECONDS},
+                ),
+                document_ids or [],
+            )
+            return response.text or ""
+
+        attempt = 0
+        while True:
+            with gemini_limiter.slot(tokens):
+                try:
+                    return gemini_guard.call(request)
+                except (ResourceExhausted, TooManyRequests):
+                    if attempt >= GEMINI_MAX_RETRIES:
+                        raise
+            # Back off outside the slot so the in-flight limit is not held while waiting
+            backoff = min(GEMINI_BACKOFF_MAX_SECONDS, GEMINI_BACKOFF_SECONDS * 2**attempt)
+            gemini_limiter.pause(backoff * random.uniform(0.5, 1.0))
+            attempt += 1
+
+    def _extract_metadata_obj(
+        self, text: str, fields: list[str] | None = None, document_id: str | None = None
+    ) -> dict[str, Any]:
         user_prompt = f"Extract metadata from the following document text. Output only JSON.\n\nTEXT:\n{text.strip()}"
-        resp = client.generate_content(user_prompt)
-        raw = resp.text or ""
-        cleaned = _strip_code_fences(raw)
-        try:
-            return json.loads(cleaned)
-        except json.JSONDecodeError:
-            maybe = re.search(r"\{.*\}", cleaned, re.DOTALL)
-            if not maybe:
+        if fields:
+            # The other fields are already known from the rule-based extractor
+            user_prompt = f"Only these fields are needed; omit the others: {', '.join(fields)}.\n{user_prompt}"
+        document_ids = [document_id] if document_id else None
+        return _parse_json(self._generate(user_prompt, document_ids=document_ids), r"\{.*\}")
+
+    def _extract_metadata_objs(self, documents: list[tuple[str, str]]) -> dict[str, dict[str, Any]]:
+        """
+        Extract the metadata of several documents in one request.
+
+        Returns:
+            Metadata object per document id; documents whose entry is missing or
+            malformed are left out so that the caller can extract them one by one
+        """
+        if len(documents) == 1:
+            document_id, text = documents[0]
+            return {document_id: self._extract_metadata_obj(text, document_id=document_id)}
+        sections = "\n\n".join(f"=== DOCUMENT {document_id} ===\n{text.strip()}" for document_id, text in documents)
+        user_prompt = (
+            f"Extract metadata from each of the following {len(documents)} documents. Output only a JSON array "
+            'with one object per document: the fields above plus "document_id", copied from the line '
+            '"=== DOCUMENT <document_id> ===" that starts the document.\n\n' + sections
+        )
+        raw = self._generate(
+            user_prompt,
+            responses=len(documents),
+            document_ids=[document_id for document_id, _ in documents],
+            response_mime_type="application/json",
+        )
+        items = _parse_json(raw, r"\[.*\]")
+        if not isinstance(items, list):
+            return {}
+        expected = {document_id for document_id, _ in documents}
+        results: dict[str, dict[str, Any]] = {}
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get("official_title"), str):
+                continue
+            document_id = str(item.pop("document_id", ""))
+            if document_id in expected and document_id not in results:
+                results[document_id] = item
+        return results
+
+    def _extract(self, document_id: str, text: str, fields: list[str] | None = None) -> tuple[dict[str, Any], bool]:
+        """
+        Extract metadata, batched with other short documents when possible.
+
+        Args:
+            document_id: Key of the document in a batch
+            text: Text to send
+            fields: Fields to ask for in a single-document request (default: all)
+
+        Returns:
+            The metadata object and whether it came from a batched request
+        """
+        if BATCH_SIZE > 1 and estimate_tokens(text) <= BATCH_DOC_TOKENS:
+            try:
+                obj = self._batcher.submit(document_id, text)
+            except CircuitOpenError:
                 raise
-            return json.loads(maybe.group(0))
+            except Exception as e:  # noqa: BLE001
+                logger.warning("Batched extraction failed for %s, retrying on its own: %s", document_id, e)
+                obj = None
+            if obj is not None:
+                return obj, True
+        return self._extract_metadata_obj(text, fields or None, document_id=document_id), False
 
     def _to_metadata_info(self, obj: dict[str, Any]) -> MetadataInfo:
         return MetadataInfo(
@@ -176,7 +364,18 @@ class MetadataProcessor(MessageProcessor):
             timestamp=dt.datetime.now(),
         )
 
-    def process(self, message: AppMessage) -> AppMessage | None:
+    def _defer(self, message: AppMessage, delay: float) -> bool:
+        """Republish the message to the input queue, to be delivered after ``delay`` seconds."""
+        if self._requeue is None:
+            logger.error("No requeue publisher; cannot defer message %s", message.data.id if message.data else None)
+            return False
+        deliver_at = dt.datetime.now(dt.UTC) + dt.timedelta(seconds=delay)
+        if not self._requeue.publish_message(message, scheduled_enqueue_time=deliver_at):
+            logger.error("Failed to defer message %s", message.data.id if message.data else None)
+            return False
+        return True
+
+    def process(self, message: AppMessage) -> AppMessage | list[AppMessage] | None:
         document_id = message.data.id or message.data.name if message.data else "<unknown>"
 
         scanned_text = (
@@ -194,25 +393,100 @@ class MetadataProcessor(MessageProcessor):
                 update_status("extractor", document_id, "skipped", reason="no_text")
             return None
 
+        part = part_info(message)
+        if part is not None and part.part_index > 0:
+            # Metadata of a split document comes from its first part (title page, preamble);
+            # the other parts only need to reach the embedding stage
+            if document_id:
+                update_status("extractor", document_id, "skipped", reason="document_part")
+            return message
+
+        # Fields with fixed patterns (gazette header, citation, dates, ministry) come from rules
+        rules = extract_rule_based(scanned_text) if RULES_ENABLED else None
+        known = rules.known(RULES_MIN_CONFIDENCE) if rules is not None else {}
+
+        duplicate_of = near_duplicate_of(message)
+        previous = stored_message(duplicate_of) if duplicate_of else None
+        if previous is not None and previous.metadata is not None:
+            # A republished copy: reuse the descriptive and content fields of the earlier document,
+            # its own identifiers, publication number and dates only come from the rules
+            reused = {
+                name: getattr(previous.metadata, name) for name in METADATA_FIELDS if name not in PUBLICATION_FIELDS
+            }
+            message.metadata = self._to_metadata_info({**reused, **known})
+            if document_id:
+                update_status("extractor", document_id, "ok", reused_from=duplicate_of, rule_fields=sorted(known))
+            logger.info("Reused metadata of near-duplicate %s for document ID %s", duplicate_of, document_id)
+            return message
+
+        local_keywords = extract_keywords(document_id, scanned_text) if KEYWORDS_SOURCE != "llm" else []
+        if KEYWORDS_SOURCE == "local":
+            known["keywords"] = local_keywords
         try:
+            if (
+                rules is not None
+                and rules.covers_core(RULES_MIN_CONFIDENCE)
+                and str(known["document_type"]).lower() in RULES_SKIP_TYPES
+            ):
+                message.metadata = self._to_metadata_info({"keywords": local_keywords, **known})
+                if document_id:
+                    update_status(
+                        "extractor", document_id, "ok", source="rules", rule_confidence=rules.overall_confidence
+                    )
+                logger.info("Extracted metadata for document ID %s with rules only", document_id)
+                return message
+
+            # Long documents are reduced to head, tail and the most informative sections
+            selection = select_input(scanned_text)
+            if message.data is not None:
+                message.data.payload["metadata_input"] = selection.stats()
             if document_id:
-                update_status("extractor", document_id, "generating")
-            obj = self._extract_metadata_obj(scanned_text)
-            md = self._to_metadata_info(obj)
+                update_status(
+                    "extractor",
+                    document_id,
+                    "generating",
+                    input_tokens=selection.estimated_tokens,
+                    document_tokens=selection.document_tokens,
+                    input_spans=selection.spans,
+                    rule_fields=sorted(known),
+                )
+            missing = [name for name in METADATA_FIELDS if name not in known]
+            obj, batched = self._extract(document_id, selection.text, missing if known else None)
+            llm_identifiers = obj.get("identifiers") if isinstance(obj.get("identifiers"), dict) else {}
+            identifiers = {**llm_identifiers, **known.get("identifiers", {})}
+            md = self._to_metadata_info({**obj, **known, "identifiers": identifiers})
+            if not md.keywords:
+                md.keywords = local_keywords
 
             if document_id:
-                update_status("extractor", document_id, "ok")
+                update_status("extractor", document_id, "ok", batched=batched, rule_fields=sorted(known))
             message.metadata = md
             logger.info(f"Extracted metadata for document ID {document_id}")
             return message
+        except CircuitOpenError as e:
+            # Gemini is failing: put the message back on the queue for when the breaker may close
+            if not self._defer(message, e.retry_after):
+                # Not completed: the consumer abandons the message and it is delivered again
+                return None
+            if document_id:
+                update_status("extractor", document_id, "deferred", reason=str(e), retry_after=e.retry_after)
+            # Handled, with nothing to publish: the original message is completed, the scheduled copy remains
+            return []
         except Exception as e:  # noqa: BLE001
             logger.error("Failed to process message: %s", e)
+            if local_keywords and KEYWORDS_SOURCE != "llm":
+                # Pass on what is known without Gemini instead of dropping the document
+                message.metadata = self._to_metadata_info({"keywords": local_keywords, **known})
+                if document_id:
+                    update_status("extractor", document_id, "partial", reason=str(e), rule_fields=sorted(known))
+                return message
             if document_id:
                 try:
                     update_status("extractor", document_id, "error", reason=str(e))
                 except Exception:  # noqa: BLE001
                     pass
-            return None
+            # Dropping the first part would leave the other parts waiting forever for reassembly
+            return message if part is not None else None
 
 
 def main() -> None:
@@ -221,22 +495,35 @@ def main() -> None:
     )
 
     consumer = ServiceBusConsumer(CONNECTION_STRING, INPUT_QUEUE_NAME)
+    publishers: list[ServiceBusPublisher] = []
 
     try:
         logger.info("\n--- Starting continuous listening ---")
         logger.info("Press Ctrl+C to stop")
-        processor = MetadataProcessor()
+        requeue = ServiceBusPublisher(CONNECTION_STRING, INPUT_QUEUE_NAME)
+        publishers.append(requeue)
+        processor = MetadataProcessor(requeue)
+
+        # Created once and shared by the worker threads (sends are serialized per publisher)
+        dataStoragePublisher = ServiceBusPublisher(CONNECTION_STRING, OUTPUT_DATA_STORAGE_QUEUE_NAME)
+        searchIndexPublisher = ServiceBusPublisher(CONNECTION_STRING, OUTPUT_SEARCH_INDEX_QUEUE_NAME)
+        notificationPublisher = ServiceBusPublisher(CONNECTION_STRING, OUTPUT_NOTIFICATION_QUEUE_NAME)
+        publishers.extend([dataStoragePublisher, searchIndexPublisher, notificationPublisher])
 
         def publish_to_queues(msg: AppMessage) -> None:
-            dataStoragePublisher = ServiceBusPublisher(CONNECTION_STRING, OUTPUT_DATA_STORAGE_QUEUE_NAME)
-            searchIndexPublisher = ServiceBusPublisher(CONNECTION_STRING, OUTPUT_SEARCH_INDEX_QUEUE_NAME)
-            notificationPublisher = ServiceBusPublisher(CONNECTION_STRING, OUTPUT_NOTIFICATION_QUEUE_NAME)
-            dataStoragePublisher.publish_message(msg)
-            searchIndexPublisher.publish_message(msg)
-            notificationPublisher.publish_message(msg)
+            targets = [dataStoragePublisher]
+            if part_info(msg) is None:
+                # Parts of a split document are indexed and notified once, after reassembly in data storage
+                targets += [searchIndexPublisher, notificationPublisher]
+            for publisher in targets:
+                if not publisher.publish_message(msg):
+                    # The message is abandoned and extracted again rather than completed without its output
+                    raise RuntimeError(f"Failed to publish to {publisher.topic_name}")
 
         handler = MessageHandler(processor, publish_to_queues)
-        consumer.start_continuous_listening(handler)
+        # Each message is settled by the consumer once its own extraction has finished
+        # With batching, up to BATCH_SIZE messages share one Gemini request
+        consumer.start_continuous_listening(handler, max_concurrent_calls=MAX_IN_FLIGHT * max(1, BATCH_SIZE))
 
     except KeyboardInterrupt:
         logger.info("Received keyboard interrupt")
@@ -244,6 +531,8 @@ def main() -> None:
         logger.error(f"Error in main: {str(e)}")
     finally:
         consumer.close()
+        for publisher in publishers:
+            publisher.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,239 @@
+"""
+Rule-based metadata extraction for Dutch official publications.
+
+Many MetadataInfo fields follow fixed patterns in publications from
+officielebekendmakingen.nl: the gazette header ("STAATSCOURANT Officiële
+uitgave van het Koninkrijk der Nederlanden sinds 1814. Nr. 12345 15 april
+2024"), citations ("Stcrt. 2024, 12345", "Stb. 2023, 456"), the effective
+date ("treedt in werking met ingang van 1 juli 2025") and the issuing body
+("Regeling van de Minister van Infrastructuur en Waterstaat"). These are
+matched with precompiled expressions and a gazetteer of ministries; every
+field found gets a confidence between 0 and 1.
+
+The extractor uses the result to ask Gemini only for the fields that are
+still missing, or to skip Gemini for document types listed in
+METADATA_RULES_SKIP_TYPES when all core fields were found.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+# Fields that must all be known before Gemini can be skipped
+CORE_FIELDS = (
+    "official_title",
+    "document_type",
+    "issuing_authority",
+    "official_publication",
+    "publication_number",
+    "publication_date",
+)
+# Only the start of a document is searched for headers, titles and authorities
+HEAD_CHARS = 5000
+
+_MONTHS = {
+    "januari": 1,
+    "februari": 2,
+    "maart": 3,
+    "april": 4,
+    "mei": 5,
+    "juni": 6,
+    "juli": 7,
+    "augustus": 8,
+    "september": 9,
+    "oktober": 10,
+    "november": 11,
+    "december": 12,
+}
+_DATE = r"\d{1,2}\s+(?:" + "|".join(_MONTHS) + r")\s+\d{4}|\d{1,2}-\d{1,2}-\d{4}"
+
+# Gazette: header name, citation abbreviation, identifier prefix on officielebekendmakingen.nl
+_GAZETTES = {
+    "staatscourant": ("Staatscourant", "Stcrt.", "stcrt"),
+    "staatsblad": ("Staatsblad", "Stb.", "stb"),
+    "tractatenblad": ("Tractatenblad", "Trb.", "trb"),
+    "gemeenteblad": ("Gemeenteblad", "Gmb.", "gmb"),
+    "provinciaal blad": ("Provinciaal blad", "Prb.", "prb"),
+    "waterschapsblad": ("Waterschapsblad", "Wsb.", "wsb"),
+    "blad gemeenschappelijke regeling": ("Blad gemeenschappelijke regeling", "Bgr.", "bgr"),
+}
+_ABBREVIATIONS = {abbr.lower(): key for key, (_, abbr, _) in _GAZETTES.items()}
+
+# "STAATSCOURANT Officiële uitgave van het Koninkrijk der Nederlanden sinds 1814. Nr. 12345 15 april 2024"
+_HEADER = re.compile(
+    r"\b(?P<gazette>STAATSCOURANT|GEMEENTEBLAD|PROVINCIAAL BLAD|WATERSCHAPSBLAD|BLAD GEMEENSCHAPPELIJKE REGELING)"
+    r"\s+Offici[eë]le uitgave van (?P<issuer>[^\n.]{3,120}?)(?:\s+sinds \d{4})?\.?\s+"
+    r"Nr\.\s*(?P<number>\d{1,7})\s+(?P<date>" + _DATE + r")",
+    re.IGNORECASE,
+)
+# "STAATSBLAD VAN HET KONINKRIJK DER NEDERLANDEN Jaargang 2023 456"
+_STAATSBLAD_HEADER = re.compile(
+    r"\bSTAATSBLAD VAN HET KONINKRIJK DER NEDERLANDEN\s+Jaargang\s+(?P<year>\d{4})\s+(?P<number>\d{1,6})\b"
+)
+# "Stcrt. 2024, 12345", "Staatscourant 2024, nr. 12345", "Stb. 2023, 456"
+_CITATION = re.compile(
+    r"\b(?P<gazette>Stcrt\.|Stb\.|Trb\.|Gmb\.|Prb\.|Wsb\.|Bgr\.|Staatscourant|Staatsblad)\s+"
+    r"(?P<year>(?:19|20)\d{2}),?\s+(?:nr\.\s*)?(?P<number>\d{1,7})\b"
+)
+_ISSUED = re.compile(r"\b(?:datum van uitgifte|uitgegeven (?:op|de))\s*:?\s*(?P<date>" + _DATE + r")", re.IGNORECASE)
+_EFFECTIVE = re.compile(r"\btreedt in werking (?:met ingang van|op)\s+(?P<date>" + _DATE + r")", re.IGNORECASE)
+_REPEAL = re.compile(r"\bvervalt (?:met ingang van|op)\s+(?P<date>" + _DATE + r")", re.IGNORECASE)
+
+# Ministries, longest names first so that "Economische Zaken en Klimaat" wins over "Economische Zaken"
+_MINISTRIES = sorted(
+    [
+        "Algemene Zaken",
+        "Asiel en Migratie",
+        "Binnenlandse Zaken en Koninkrijksrelaties",
+        "Buitenlandse Zaken",
+        "Buitenlandse Handel en Ontwikkelingshulp",
+        "Defensie",
+        "Economische Zaken",
+        "Economische Zaken en Klimaat",
+        "Financiën",
+        "Infrastructuur en Waterstaat",
+        "Justitie en Veiligheid",
+        "Klimaat en Groene Groei",
+        "Landbouw, Natuur en Voedselkwaliteit",
+        "Landbouw, Visserij, Voedselzekerheid en Natuur",
+        "Onderwijs, Cultuur en Wetenschap",
+        "Sociale Zaken en Werkgelegenheid",
+        "Volksgezondheid, Welzijn en Sport",
+        "Volkshuisvesting en Ruimtelijke Ordening",
+    ],
+    key=len,
+    reverse=True,
+)
+_MINISTRY = re.compile(
+    r"\b(?:Minister|Staatssecretaris|Ministerie|minister|staatssecretaris|ministerie) van (?P<name>"
+    + "|".join(re.escape(name) for name in _MINISTRIES)
+    + r")\b"
+)
+_DECENTRAL = re.compile(
+    r"\b(?:college van burgemeester en wethouders van|raad van) de gemeente "
+    r"(?P<gemeente>[A-Z][\w'-]+(?: [A-Z][\w'-]+)*)"
+    r"|\bGedeputeerde Staten van (?P<provincie>[A-Z][\w-]+(?:-[A-Z][\w-]+)?)"
+)
+# A title starts with the document type and runs until the end of its paragraph
+_DOCUMENT_TYPES = (
+    "Aanwijzingsbesluit",
+    "Beleidsregel",
+    "Beleidsregels",
+    "Besluit",
+    "Beschikking",
+    "Circulaire",
+    "Instellingsbesluit",
+    "Kennisgeving",
+    "Mandaatbesluit",
+    "Regeling",
+    "Verordening",
+    "Wet",
+    "Wijzigingsregeling",
+)
+_TITLE = re.compile(r"^(?P<type>" + "|".join(_DOCUMENT_TYPES) + r")\b[^\n]*(?:\n(?!\s*\n)[^\n]*){0,4}", re.MULTILINE)
+_TITLE_MAX_CHARS = 400
+
+
+@dataclass
+class RuleResult:
+    """Field values found by the rules, with a confidence per field."""
+
+    values: dict[str, Any] = field(default_factory=dict)
+    confidence: dict[str, float] = field(default_factory=dict)
+
+    def set(self, name: str, value: Any, confidence: float) -> None:
+        if confidence > self.confidence.get(name, 0.0):
+            self.values[name] = value
+            self.confidence[name] = confidence
+
+    def known(self, min_confidence: float) -> dict[str, Any]:
+        """Fields at or above ``min_confidence``."""
+        return {name: value for name, value in self.values.items() if self.confidence[name] >= min_confidence}
+
+    @property
+    def overall_confidence(self) -> float:
+        """Mean confidence over CORE_FIELDS (missing fields count as 0)."""
+        return sum(self.confidence.get(name, 0.0) for name in CORE_FIELDS) / len(CORE_FIELDS)
+
+    def covers_core(self, min_confidence: float) -> bool:
+        return all(self.confidence.get(name, 0.0) >= min_confidence for name in CORE_FIELDS)
+
+
+def _parse_date(value: str) -> str | None:
+    """ISO date of "15 april 2024" or "15-04-2024"."""
+    parts = value.split("-") if "-" in value else value.split()
+    try:
+        month = int(parts[1]) if parts[1].isdigit() else _MONTHS[parts[1].lower()]
+        return dt.date(int(parts[2]), month, int(parts[0])).isoformat()
+    except (ValueError, KeyError, IndexError):
+        return None
+
+
+def _set_publication(result: RuleResult, gazette_key: str, year: str, number: str, confidence: float) -> None:
+    name, abbreviation, prefix = _GAZETTES[gazette_key]
+    result.set("official_publication", name, confidence)
+    result.set("publication_number", f"{abbreviation} {year}, {number}", confidence)
+    result.set("identifiers", {"officielebekendmakingen": f"{prefix}-{year}-{number}"}, confidence)
+
+
+def extract_rule_based(text: str) -> RuleResult:
+    """
+    Fill the metadata fields that follow fixed patterns.
+
+    Args:
+        text: Extracted document text
+
+    Returns:
+        RuleResult with values in the format Gemini returns them (ISO dates, strings)
+    """
+    result = RuleResult()
+    head = text[:HEAD_CHARS]
+
+    header = _HEADER.search(head)
+    if header is not None:
+        gazette_key = header.group("gazette").lower()
+        date = _parse_date(header.group("date"))
+        if date is not None:
+            result.set("publication_date", date, 0.95)
+            _set_publication(result, gazette_key, date[:4], header.group("number"), 0.95)
+        issuer = header.group("issuer").strip()
+        if gazette_key != "staatscourant" and not issuer.lower().startswith("het koninkrijk"):
+            # Decentral gazettes name the issuing body: "Officiële uitgave van de gemeente Utrecht"
+            issuer = re.sub(r"^(?:de|het)\s+", "", issuer)
+            result.set("issuing_authority", issuer[:1].upper() + issuer[1:], 0.9)
+    elif (staatsblad := _STAATSBLAD_HEADER.search(head)) is not None:
+        _set_publication(result, "staatsblad", staatsblad.group("year"), staatsblad.group("number"), 0.95)
+    elif (citation := _CITATION.search(head)) is not None:
+        # A citation near the top is usually the document's own, but may be a reference
+        gazette = citation.group("gazette").lower()
+        gazette_key = _ABBREVIATIONS.get(gazette, gazette)
+        _set_publication(result, gazette_key, citation.group("year"), citation.group("number"), 0.75)
+
+    for pattern, name, confidence in (
+        (_ISSUED, "publication_date", 0.9),
+        (_EFFECTIVE, "effective_date", 0.9),
+        (_REPEAL, "repeal_date", 0.8),
+    ):
+        match = pattern.search(text)
+        if match is not None and (date := _parse_date(match.group("date"))) is not None:
+            result.set(name, date, confidence)
+
+    title = _TITLE.search(head, header.end() if header is not None else 0)
+    if title is not None:
+        # Right below a gazette header the first such paragraph is the title
+        confidence = 0.9 if header is not None else 0.6
+        result.set("document_type", title.group("type"), confidence)
+        result.set("official_title", " ".join(title.group(0).split())[:_TITLE_MAX_CHARS], confidence)
+
+    ministry = _MINISTRY.search(head)
+    if ministry is not None:
+        result.set("issuing_authority", f"Ministerie van {ministry.group('name')}", 0.85)
+    elif (body := _DECENTRAL.search(head)) is not None:
+        if body.group("gemeente"):
+            result.set("issuing_authority", f"Gemeente {body.group('gemeente')}", 0.8)
+        else:
+            result.set("issuing_authority", f"Provincie {body.group('provincie')}", 0.8)
+    return result
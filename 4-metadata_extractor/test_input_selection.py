@@ -0,0 +1,44 @@
+"""Tests for the token-budgeted Gemini input selection."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from input_selection import CHARS_PER_TOKEN, GAP_MARKER, select_input  # noqa: E402
+
+FILLER = "De aanvraag wordt beoordeeld aan de hand van de criteria uit de bijlage. " * 12
+
+
+def _document() -> str:
+    paragraphs = ["Regeling van de Minister van Infrastructuur en Waterstaat, kenmerk IenW/BSK-2024/123"]
+    for i in range(300):
+        paragraphs.append(FILLER)
+        if i == 150:
+            paragraphs.append("Artikel 12\nDeze regeling treedt in werking met ingang van 1 juli 2025.")
+    paragraphs.append("Den Haag, 3 juni 2025\nDe Minister van Infrastructuur en Waterstaat, M. de Vries")
+    return "\n\n".join(paragraphs)
+
+
+def test_short_text_is_sent_whole() -> None:
+    selection = select_input("  Besluit van 1 mei 2024.  ", token_budget=100)
+    assert selection.text == "Besluit van 1 mei 2024."
+    assert selection.spans == [[0, len(selection.text)]]
+    assert not selection.truncated
+
+
+def test_long_text_keeps_head_tail_and_informative_middle_within_budget() -> None:
+    text = _document()
+    selection = select_input(text, token_budget=1000)
+
+    assert selection.truncated
+    assert selection.estimated_tokens <= 1000
+    assert selection.text.startswith("Regeling van de Minister")
+    assert selection.text.endswith("M. de Vries")
+    assert "treedt in werking met ingang van 1 juli 2025" in selection.text
+    # The recorded spans reproduce exactly what was sent
+    assert GAP_MARKER.join(text[lo:hi] for lo, hi in selection.spans) == selection.text
+    assert all(a[1] < b[0] for a, b in zip(selection.spans, selection.spans[1:], strict=False))
+    assert selection.document_tokens == -(-len(text) // CHARS_PER_TOKEN)
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from keywords import MAX_BIGRAMS, MAX_UNIGRAMS, MemoryVocabulary, extract_keywords, stem  # noqa: E402
+
+BOILERPLATE = "De minister van Infrastructuur en Waterstaat besluit. Deze regeling treedt in werking. "
+
+
+def test_stem_merges_plural_and_inflected_forms() -> None:
+    assert stem("regelingen") == stem("regeling")
+    assert stem("mogelijkheden") == "mogelijkheid"
+    assert stem("subsidies") == stem("subsidie")
+
+
+def test_keywords_skip_stop_words_and_use_surface_form() -> None:
+    text = "De vergunningen voor grondwateronttrekking. Een vergunning voor grondwateronttrekking wordt verleend."
+    keywords = extract_keywords("doc-1", text, MemoryVocabulary(), top_k=3)
+    assert keywords[0] == "grondwateronttrekking"
+    assert "vergunningen" in keywords or "vergunning" in keywords
+    assert not {"de", "voor", "een", "wordt"} & set(keywords)
+
+
+def test_corpus_statistics_demote_common_terms() -> None:
+    vocabulary = MemoryVocabulary()
+    for i in range(5):
+        extract_keywords(f"doc-{i}", BOILERPLATE + f"Onderwerp nummer {i}.", vocabulary)
+    text = BOILERPLATE + "Windenergie op zee. Windenergie subsidie. Subsidies voor windenergie."
+    keywords = extract_keywords("doc-wind", text, vocabulary, top_k=3)
+    assert keywords[:2] == ["windenergie", "subsidie"]
+    assert "waterstaat" not in keywords
+
+
+def test_each_document_is_counted_once() -> None:
+    vocabulary = MemoryVocabulary()
+    extract_keywords("doc-1", "Windenergie op zee.", vocabulary)
+    extract_keywords("doc-1", "Windenergie op zee.", vocabulary)
+    term = stem("windenergie")
+    assert vocabulary.statistics([term]) == (1, {term: 1})
+
+
+def test_only_repeated_terms_of_a_long_document_reach_the_vocabulary() -> None:
+    vocabulary = MemoryVocabulary()
+    # Thousands of distinct words and bigrams seen once, and a few repeated ones
+    words = {}
+    for i in range(17_000):
+        word = f"woord{chr(97 + i % 26)}{chr(97 + i // 26 % 26)}{chr(97 + i // 676)}"
+        words.setdefault(stem(word), word)
+    words = list(words.values())[:15_000]
+    text = " ".join(words) + ". Windenergie op zee. Windenergie op zee. Subsidie windenergie. Subsidie windenergie."
+    keywords = extract_keywords("doc-long", text, vocabulary, top_k=3)
+
+    assert keywords and all("woord" not in keyword for keyword in keywords)
+    assert 0 < len(vocabulary.frequencies) <= MAX_UNIGRAMS + MAX_BIGRAMS
+    assert not any(term.startswith("woord") for term in vocabulary.frequencies)
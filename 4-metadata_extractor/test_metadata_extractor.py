@@ -4,6 +4,8 @@ Se mockea:
  - Acceso a Gemini reemplazando `_extract_metadata_obj`.
  - Publicadores de ServiceBus con una clase FakePublisher que captura los tópicos.
  - `update_status` para evitar conexión a Mongo.
+ - El vocabulario de palabras clave, que se mantiene en memoria.
+ - El registro de uso de los LLM, que se captura en una lista.
 
 Se verifica:
  1. Enriquecimiento de `AppMessage.metadata`.
@@ -42,6 +44,23 @@ def metadata_module():  # type: ignore[no-untyped-def]
     return module
 
 
+@pytest.fixture(autouse=True)
+def memory_keyword_vocabulary(monkeypatch: pytest.MonkeyPatch, metadata_module: Any) -> None:
+    # El extractor local de palabras clave actualiza estadísticas del corpus; sin Mongo en los tests
+    keywords = sys.modules["keywords"]
+    monkeypatch.setattr(keywords, "_vocabulary", keywords.MemoryVocabulary())
+
+
+@pytest.fixture(autouse=True)
+def llm_calls(monkeypatch: pytest.MonkeyPatch) -> list[Any]:
+    # Las llamadas a Gemini se registran en memoria en lugar de en Mongo
+    from shared.tools import llm_accounting
+
+    calls: list[Any] = []
+    monkeypatch.setattr(llm_accounting, "record_call", calls.append)
+    return calls
+
+
 @pytest.fixture
 def sample_message() -> AppMessage:
     return AppMessage(
@@ -88,7 +107,7 @@ def test_metadata_extraction_and_fanout(
     monkeypatch.setenv("GEMINI_API_KEY", "dummy-key")
     # Evitar acceso real a Mongo
     monkeypatch.setattr(metadata_module, "update_status", lambda *_, **__: None)
-    monkeypatch.setattr(processor, "_extract_metadata_obj", lambda text: fake_metadata_json)
+    monkeypatch.setattr(processor, "_extract_metadata_obj", lambda text, *_, **__: fake_metadata_json)
 
     # Ejecutar procesamiento
     result = processor.process(sample_message)
@@ -160,3 +179,243 @@ def test_no_text_skips(monkeypatch: pytest.MonkeyPatch, metadata_module: Any) ->
     result = processor.process(msg)
     assert result is None
     assert called["n"] == 0, "No debería invocar extracción cuando no hay texto válido"
+
+
+def test_document_part_skips_gemini(monkeypatch: pytest.MonkeyPatch, metadata_module: Any) -> None:
+    # Solo la primera parte de un documento dividido pasa por Gemini; las demás siguen sin metadata
+    msg = AppMessage(
+        data=DocumentData(
+            source="upload",
+            id="doc-big.part-0002",
+            name="big.pdf",
+            payload={
+                "extracted_text": "Artikel 12. Deze regeling treedt in werking.",
+                "parent_document_id": "doc-big",
+                "part_index": 2,
+                "part_count": 3,
+            },
+        )
+    )
+    processor = metadata_module.MetadataProcessor()
+    monkeypatch.setattr(metadata_module, "update_status", lambda *_, **__: None)
+
+    called = {"n": 0}
+
+    def fake_extract(_: str) -> dict[str, str]:  # pragma: no cover - si se llama el test falla
+        called["n"] += 1
+        return {}
+
+    monkeypatch.setattr(processor, "_extract_metadata_obj", fake_extract)
+
+    result = processor.process(msg)
+    assert result is msg
+    assert result.metadata is None
+    assert called["n"] == 0
+
+
+def test_gemini_429_is_retried_after_backoff(monkeypatch: pytest.MonkeyPatch, metadata_module: Any) -> None:
+    # Un 429 de Gemini pausa las llamadas y se reintenta; el segundo intento devuelve el JSON
+    from google.api_core.exceptions import ResourceExhausted
+
+    calls = {"n": 0}
+
+    class FakeResponse:
+        text = '```json\n{"official_title": "Besluit X"}\n```'
+
+    class FakeClient:
+        def generate_content(self, _prompt: str, **_: Any) -> FakeResponse:
+            calls["n"] += 1
+            if calls["n"] == 1:
+                raise ResourceExhausted("quota")
+            return FakeResponse()
+
+    processor = metadata_module.MetadataProcessor()
+    monkeypatch.setattr(processor, "_get_gemini_client", lambda: FakeClient())
+    monkeypatch.setattr(metadata_module, "GEMINI_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(metadata_module, "gemini_limiter", metadata_module.RateLimiter(max_in_flight=2))
+
+    assert processor._extract_metadata_obj("Besluit X van de minister.") == {"official_title": "Besluit X"}
+    assert calls["n"] == 2
+
+
+def test_short_documents_are_batched_with_single_fallback(
+    monkeypatch: pytest.MonkeyPatch, metadata_module: Any
+) -> None:
+    # Tres documentos cortos comparten una petición; el que falta en la respuesta se extrae por separado
+    import json
+    import threading
+
+    prompts: list[str] = []
+
+    class FakeResponse:
+        def __init__(self, text: str) -> None:
+            self.text = text
+
+    class FakeClient:
+        def generate_content(self, prompt: str, **_: Any) -> FakeResponse:
+            prompts.append(prompt)
+            if "=== DOCUMENT" in prompt:
+                items = [
+                    {"document_id": "a", "official_title": "Titel A"},
+                    {"document_id": "b", "official_title": "Titel B"},
+                    {"document_id": "zzz", "official_title": "Onbekend"},
+                ]
+                return FakeResponse(json.dumps(items))
+            return FakeResponse('{"official_title": "Titel C"}')
+
+    monkeypatch.setattr(metadata_module, "BATCH_SIZE", 3)
+    monkeypatch.setattr(metadata_module, "BATCH_WAIT_SECONDS", 5.0)
+    processor = metadata_module.MetadataProcessor()
+    monkeypatch.setattr(processor, "_get_gemini_client", lambda: FakeClient())
+
+    results: dict[str, tuple[dict[str, Any], bool]] = {}
+
+    def extract(document_id: str) -> None:
+        results[document_id] = processor._extract(document_id, f"Korte bekendmaking {document_id}.")
+
+    threads = [threading.Thread(target=extract, args=(document_id,)) for document_id in ("a", "b", "c")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results["a"] == ({"official_title": "Titel A"}, True)
+    assert results["b"] == ({"official_title": "Titel B"}, True)
+    assert results["c"] == ({"official_title": "Titel C"}, False)
+    assert len(prompts) == 2
+
+
+def test_known_document_type_skips_gemini(monkeypatch: pytest.MonkeyPatch, metadata_module: Any) -> None:
+    # Con todos los campos básicos encontrados por las reglas y un tipo conocido no se llama a Gemini
+    text = (
+        "STAATSCOURANT\nOfficiële uitgave van het Koninkrijk der Nederlanden sinds 1814.\nNr. 12345\n15 april 2024\n\n"
+        "Regeling van de Minister van Financiën van 10 april 2024 tot vaststelling van de rentepercentages\n"
+    )
+    msg = AppMessage(data=DocumentData(source="upload", id="doc-r", name="r.pdf", payload={"extracted_text": text}))
+    monkeypatch.setattr(metadata_module, "RULES_SKIP_TYPES", {"regeling"})
+    monkeypatch.setattr(metadata_module, "update_status", lambda *_, **__: None)
+    processor = metadata_module.MetadataProcessor()
+
+    def fake_extract(*_: Any) -> dict[str, str]:  # pragma: no cover - si se llama el test falla
+        raise AssertionError("Gemini no debería llamarse")
+
+    monkeypatch.setattr(processor, "_extract_metadata_obj", fake_extract)
+
+    result = processor.process(msg)
+    assert result is not None and result.metadata is not None
+    assert result.metadata.issuing_authority == "Ministerie van Financiën"
+    assert result.metadata.publication_number == "Stcrt. 2024, 12345"
+    assert str(result.metadata.publication_date) == "2024-04-15"
+
+
+def test_near_duplicate_reuses_only_descriptive_metadata(monkeypatch: pytest.MonkeyPatch, metadata_module: Any) -> None:
+    # Una copia republicada reutiliza resumen y ámbitos, pero número y fechas salen de su propio texto
+    from shared.models.messages import MetadataInfo
+
+    text = (
+        "STAATSCOURANT\nOfficiële uitgave van het Koninkrijk der Nederlanden sinds 1814.\nNr. 12345\n15 april 2024\n\n"
+        "Regeling van de Minister van Financiën van 10 april 2024 tot vaststelling van de rentepercentages\n"
+    )
+    earlier = AppMessage(
+        data=DocumentData(source="upload", id="doc-old", name="old.pdf", payload={}),
+        metadata=MetadataInfo(
+            official_title="Regeling rentepercentages",
+            document_type="Regeling",
+            issuing_authority="Ministerie van Financiën",
+            official_publication="Staatscourant",
+            identifiers={"officielebekendmakingen": "stcrt-2023-999"},
+            summary="Stelt de rentepercentages vast.",
+            publication_number="Stcrt. 2023, 999",
+            sector_scope=["Financiën"],
+        ),
+    )
+    monkeypatch.setattr(metadata_module, "near_duplicate_of", lambda _: "doc-old")
+    monkeypatch.setattr(metadata_module, "stored_message", lambda _: earlier)
+    monkeypatch.setattr(metadata_module, "update_status", lambda *_, **__: None)
+    processor = metadata_module.MetadataProcessor()
+
+    def fake_extract(*_: Any) -> dict[str, str]:  # pragma: no cover - si se llama el test falla
+        raise AssertionError("Gemini no debería llamarse")
+
+    monkeypatch.setattr(processor, "_extract_metadata_obj", fake_extract)
+
+    msg = AppMessage(data=DocumentData(source="upload", id="doc-new", name="n.pdf", payload={"extracted_text": text}))
+    result = processor.process(msg)
+    assert result is not None and result.metadata is not None
+    assert result.metadata.summary == "Stelt de rentepercentages vast."
+    assert result.metadata.sector_scope == ["Financiën"]
+    assert result.metadata.publication_number == "Stcrt. 2024, 12345"
+    assert result.metadata.identifiers == {"officielebekendmakingen": "stcrt-2024-12345"}
+    assert str(result.metadata.publication_date) == "2024-04-15"
+
+
+def test_open_circuit_defers_message(
+    monkeypatch: pytest.MonkeyPatch, metadata_module: Any, sample_message: AppMessage
+) -> None:
+    # Con el circuito abierto no se espera a Gemini: el mensaje se vuelve a encolar con retraso
+    deferred: list[tuple[AppMessage, float]] = []
+    processor = metadata_module.MetadataProcessor()
+    monkeypatch.setattr(metadata_module, "update_status", lambda *_, **__: None)
+
+    def open_circuit(*_: Any, **__: Any) -> str:
+        raise metadata_module.CircuitOpenError("gemini-2.0-flash", 30.0)
+
+    monkeypatch.setattr(processor, "_generate", open_circuit)
+    monkeypatch.setattr(processor, "_defer", lambda message, delay: not deferred.append((message, delay)))
+
+    # Lista vacía: el mensaje original se completa sin publicar nada, queda la copia programada
+    assert processor.process(sample_message) == []
+    assert deferred == [(sample_message, 30.0)]
+
+    # Si no se puede volver a encolar, el mensaje falla y el consumer lo abandona (se vuelve a entregar)
+    monkeypatch.setattr(processor, "_defer", lambda message, delay: False)
+    assert processor.process(sample_message) is None
+
+
+def test_gemini_failure_passes_on_partial_metadata(monkeypatch: pytest.MonkeyPatch, metadata_module: Any) -> None:
+    # Si Gemini falla, el documento sigue con los campos de las reglas y las palabras clave locales
+    text = (
+        "Regeling van de Minister van Financiën over de vaststelling van de rentepercentages.\n\n"
+        "De rentepercentages voor belastingrente worden vastgesteld. Belastingrente geldt voor de aanslag.\n"
+    )
+    msg = AppMessage(data=DocumentData(source="upload", id="doc-p", name="p.pdf", payload={"extracted_text": text}))
+    statuses: list[str] = []
+    monkeypatch.setattr(metadata_module, "update_status", lambda _stage, _doc, status, **__: statuses.append(status))
+    processor = metadata_module.MetadataProcessor()
+
+    def failing_generate(*_: Any, **__: Any) -> str:
+        raise RuntimeError("500 Internal error")
+
+    monkeypatch.setattr(processor, "_generate", failing_generate)
+
+    result = processor.process(msg)
+    assert result is not None and result.metadata is not None
+    assert result.metadata.issuing_authority == "Ministerie van Financiën"
+    assert {"rentepercentages", "belastingrente"} <= set(result.metadata.keywords)
+    assert statuses[-1] == "partial"
+
+
+def test_gemini_usage_is_accounted_per_document(
+    monkeypatch: pytest.MonkeyPatch, metadata_module: Any, llm_calls: list[Any]
+) -> None:
+    # Tokens y latencia de cada petición se registran para los documentos del lote
+    import json
+    from types import SimpleNamespace
+
+    items = [{"document_id": "a", "official_title": "Titel A"}, {"document_id": "b", "official_title": "Titel B"}]
+    response = SimpleNamespace(
+        text=json.dumps(items), usage_metadata=SimpleNamespace(prompt_token_count=1200, candidates_token_count=300)
+    )
+
+    class FakeClient:
+        def generate_content(self, _prompt: str, **_: Any) -> SimpleNamespace:
+            return response
+
+    processor = metadata_module.MetadataProcessor()
+    monkeypatch.setattr(processor, "_get_gemini_client", lambda: FakeClient())
+
+    assert set(processor._extract_metadata_objs([("a", "Tekst A"), ("b", "Tekst B")])) == {"a", "b"}
+    [call] = llm_calls
+    assert (call.stage, call.model, call.document_ids) == ("extractor", "gemini-2.0-flash", ["a", "b"])
+    assert (call.prompt_tokens, call.output_tokens, call.ok) == (1200, 300, True)
+    assert call.cost_usd == pytest.approx((1200 * 0.10 + 300 * 0.40) / 1_000_000)
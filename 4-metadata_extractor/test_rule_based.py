@@ -0,0 +1,55 @@
+"""Tests for the rule-based metadata extractor."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from rule_based import extract_rule_based  # noqa: E402
+
+STAATSCOURANT = """STAATSCOURANT
+Officiële uitgave van het Koninkrijk der Nederlanden sinds 1814.
+Nr. 12345
+15 april 2024
+
+Regeling van de Minister van Infrastructuur en Waterstaat van 10 april 2024, nr. IENW/BSK-2024/98765,
+tot wijziging van de Regeling voertuigen
+
+De Minister van Infrastructuur en Waterstaat,
+Gelet op artikel 71 van de Wegenverkeerswet 1994;
+
+Artikel II
+Deze regeling treedt in werking met ingang van 1 juli 2024.
+"""
+
+
+def test_staatscourant_header_fills_core_fields() -> None:
+    result = extract_rule_based(STAATSCOURANT)
+    assert result.covers_core(0.8)
+    assert result.values["official_publication"] == "Staatscourant"
+    assert result.values["publication_number"] == "Stcrt. 2024, 12345"
+    assert result.values["identifiers"] == {"officielebekendmakingen": "stcrt-2024-12345"}
+    assert result.values["publication_date"] == "2024-04-15"
+    assert result.values["effective_date"] == "2024-07-01"
+    assert result.values["document_type"] == "Regeling"
+    assert result.values["official_title"].endswith("tot wijziging van de Regeling voertuigen")
+    assert result.values["issuing_authority"] == "Ministerie van Infrastructuur en Waterstaat"
+
+
+def test_gemeenteblad_names_the_municipality() -> None:
+    text = (
+        "GEMEENTEBLAD\nOfficiële uitgave van de gemeente Utrecht\nNr. 4567\n3 mei 2024\n\n"
+        "Besluit van het college van burgemeester en wethouders houdende aanwijzing van parkeerplaatsen\n"
+    )
+    result = extract_rule_based(text)
+    assert result.values["issuing_authority"] == "Gemeente Utrecht"
+    assert result.values["publication_number"] == "Gmb. 2024, 4567"
+
+
+def test_citation_without_header_is_low_confidence() -> None:
+    result = extract_rule_based("Wijziging van de regeling, zie Stcrt. 2023, 998.")
+    assert result.values["publication_number"] == "Stcrt. 2023, 998"
+    assert result.known(0.8) == {}
+    assert not result.covers_core(0.8)
@@ -1,12 +1,17 @@
 import atexit
+import datetime as dt
 import logging
 import os
 import sys
+from collections.abc import Callable
 from dataclasses import asdict
 from pathlib import Path
+from typing import Any
 
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument, UpdateMany
+from pymongo.collection import Collection
+from pymongo.database import Database
 from pymongo.errors import PyMongoError
 
 # Ensure '/app' (the project root in containers) is on sys.path before importing 'shared'
@@ -16,16 +21,26 @@ if str(parent_dir) not in sys.path:
     sys.path.insert(0, str(parent_dir))
 
 from shared.models.messages import AppMessage
+from shared.tools.document_parts import PartInfo, merge_parts, part_info
 from shared.tools.MessageHandler import MessageHandler
 from shared.tools.MessageProcessor import MessageProcessor
 from shared.tools.pipeline_status import update_status
 from shared.tools.ServiceBusConsumer import ServiceBusConsumer
+from shared.tools.ServiceBusPublisher import ServiceBusPublisher
+from shared.tools.vector_codec import decode_vector_chunks
 
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Parts of split documents wait here until every part has arrived
+PARTS_COLLECTION = os.getenv("MONGO_PARTS_COLLECTION", "document_parts")
+# One document per split parent: which parts arrived and whether it was reassembled
+REASSEMBLY_COLLECTION = os.getenv("MONGO_REASSEMBLY_COLLECTION", "document_reassembly")
+# Seconds a replica holds the claim on a reassembly; a replica that crashed mid-merge loses it after this
+REASSEMBLY_LEASE_SECONDS = float(os.getenv("REASSEMBLY_LEASE_SECONDS", "600"))
+
 
 # Global Mongo client (service-level singleton)
 mongo_client: MongoClient | None = None
@@ -71,6 +86,7 @@ def get_client() -> MongoClient:
         documents_collection.create_index("data.id", unique=True, sparse=True)
         chunks_collection.create_index("document_id")
         chunks_collection.create_index("chunk_id")
+        db[PARTS_COLLECTION].create_index("parent_document_id")
 
         logger.info("Connected to MongoDB %s", database_name)
         logger.info("Collections: %s, %s", documents_collection_name, chunks_collection_name)
@@ -83,7 +99,201 @@ def get_client() -> MongoClient:
         raise
 
 
+def _chunk_docs(document_id: str, doc_mongo_id: str | None, vector_chunks: list[dict]) -> list[dict[str, Any]]:
+    return [
+        {
+            "document_id": document_id,
+            "document_mongo_id": doc_mongo_id,
+            "chunk_id": chunk.get("metadata", {}).get("chunk_id"),
+            "total_chunks": chunk.get("metadata", {}).get("total_chunks"),
+            "text": chunk.get("text", ""),
+            "embedding": chunk.get("embedding", []),
+            "metadata": chunk.get("metadata", {}),
+        }
+        for chunk in vector_chunks
+    ]
+
+
+def _renumber_part_chunks(chunks_collection: Collection, parent_id: str) -> int:
+    """
+    Number the chunks of a reassembled document across its parts.
+
+    Every part numbers its chunks from 0 and counts only its own; shift each
+    part's ``chunk_id`` by the chunks of the parts before it and set
+    ``total_chunks`` to the parent's total. The part-local number is kept in
+    ``part_chunk_id``, so a retried reassembly numbers the chunks the same way.
+
+    Returns:
+        Number of chunks of the parent document
+    """
+    counts = {
+        group["_id"]: group["count"]
+        for group in chunks_collection.aggregate(
+            [
+                {"$match": {"document_id": parent_id}},
+                {"$group": {"_id": "$metadata.part_index", "count": {"$sum": 1}}},
+            ]
+        )
+    }
+    total = sum(counts.values())
+    updates, offset = [], 0
+    for part_index in sorted(counts, key=lambda index: index or 0):
+        part_chunk_id = {"$ifNull": ["$part_chunk_id", "$chunk_id"]}
+        chunk_id = {"$add": [part_chunk_id, offset]}
+        updates.append(
+            UpdateMany(
+                {"document_id": parent_id, "metadata.part_index": part_index},
+                [
+                    {
+                        "$set": {
+                            "part_chunk_id": part_chunk_id,
+                            "chunk_id": chunk_id,
+                            "total_chunks": total,
+                            "metadata.chunk_id": chunk_id,
+                            "metadata.total_chunks": total,
+                        }
+                    }
+                ],
+            )
+        )
+        offset += counts[part_index]
+    if updates:
+        chunks_collection.bulk_write(updates, ordered=False)
+    return total
+
+
 class StorageProcessor(MessageProcessor):
+    def __init__(self, on_reassembled: Callable[[AppMessage], None] | None = None) -> None:
+        """
+        Args:
+            on_reassembled: Called with the parent message once all parts of a split
+                document are stored and merged (e.g. to forward it to search indexing)
+        """
+        self.on_reassembled = on_reassembled
+
+    def _store_part(self, db: Database, message: AppMessage, part: PartInfo, vector_chunks: list[dict]) -> None:
+        """Store one part of a split document and reassemble the parent when it is the last one."""
+        chunks_collection = db[os.getenv("MONGO_CHUNKS_COLLECTION", "chunks")]
+        part_doc_id = message.data.id if message.data else None
+        parent_id = part.parent_document_id
+
+        if db[REASSEMBLY_COLLECTION].find_one({"_id": parent_id, "completed": True}, {"_id": 1}) is not None:
+            # A part delivered again after its parent was reassembled: storing it would undo the renumbering
+            logger.info("Skipping part %s: %s is already reassembled", part_doc_id, parent_id)
+            return
+
+        # Replace rather than append so a redelivered part does not duplicate its chunks
+        chunks_collection.delete_many({"document_id": parent_id, "metadata.part_index": part.part_index})
+        chunk_docs = _chunk_docs(parent_id, None, vector_chunks)
+        if chunk_docs:
+            chunks_collection.insert_many(chunk_docs)
+        db[PARTS_COLLECTION].replace_one(
+            {"_id": part_doc_id},
+            {"parent_document_id": parent_id, "part_index": part.part_index, "message": message.to_dict()},
+            upsert=True,
+        )
+        if part_doc_id:
+            update_status(
+                "data-storage", part_doc_id, "ok", parent_document_id=parent_id, chunks_inserted=len(chunk_docs)
+            )
+
+        # Atomic per parent, so replicas storing the last parts concurrently agree on the count
+        state = db[REASSEMBLY_COLLECTION].find_one_and_update(
+            {"_id": parent_id},
+            {
+                "$addToSet": {"received": part.part_index},
+                "$setOnInsert": {"part_count": part.part_count, "completed": False},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        received = len(state.get("received", []))
+        if received < part.part_count:
+            update_status("data-storage", parent_id, "waiting_for_parts", received=received, part_count=part.part_count)
+            return
+
+        # One replica at a time holds the lease and merges; "completed" is only set once the merge,
+        # the store and the forwarding succeeded, so a failed reassembly is retried by a redelivered part
+        now = dt.datetime.now(tz=dt.UTC)
+        claimed = db[REASSEMBLY_COLLECTION].find_one_and_update(
+            {
+                "_id": parent_id,
+                "completed": False,
+                "$or": [{"claimed_until": None}, {"claimed_until": {"$lt": now}}],
+            },
+            {"$set": {"claimed_until": now + dt.timedelta(seconds=REASSEMBLY_LEASE_SECONDS)}},
+        )
+        if claimed is None:
+            return
+        try:
+            reassembled = self._reassemble(db, parent_id, part.part_count)
+        except Exception:
+            db[REASSEMBLY_COLLECTION].update_one({"_id": parent_id}, {"$set": {"claimed_until": None}})
+            raise
+        completed_at = dt.datetime.now(tz=dt.UTC) if reassembled else None
+        db[REASSEMBLY_COLLECTION].update_one(
+            {"_id": parent_id},
+            {"$set": {"completed": reassembled, "completed_at": completed_at, "claimed_until": None}},
+        )
+
+    def _reassemble(self, db: Database, parent_id: str, part_count: int) -> bool:
+        """
+        Merge the stored parts into the parent document and forward it. Safe to run again after a failure.
+
+        Returns:
+            Whether the parent was reassembled (False when parts are missing)
+        """
+        documents_collection = db[os.getenv("MONGO_COLLECTION", "messages")]
+        chunks_collection = db[os.getenv("MONGO_CHUNKS_COLLECTION", "chunks")]
+
+        parts = [
+            AppMessage.parse(doc["message"]) for doc in db[PARTS_COLLECTION].find({"parent_document_id": parent_id})
+        ]
+        if len(parts) != part_count:
+            logger.error("Reassembly of %s found %d of %d parts", parent_id, len(parts), part_count)
+            update_status("data-storage", parent_id, "error", reason="missing_parts", part_count=part_count)
+            return False
+        merged = merge_parts(parts)
+
+        # Upsert, so a retry after a later failure does not hit the unique index on data.id
+        stored = documents_collection.find_one_and_replace(
+            {"data.id": parent_id},
+            asdict(merged),
+            projection={"_id": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        doc_mongo_id = str(stored["_id"])
+        chunk_update: dict[str, Any] = {"document_mongo_id": doc_mongo_id}
+        if merged.metadata is not None:
+            # Only the first part went through metadata extraction; share it with every chunk
+            chunk_update.update(
+                {
+                    "metadata.official_title": merged.metadata.official_title,
+                    "metadata.document_type": merged.metadata.document_type,
+                    "metadata.issuing_authority": merged.metadata.issuing_authority,
+                    "metadata.keywords": merged.metadata.keywords,
+                }
+            )
+        total_chunks = _renumber_part_chunks(chunks_collection, parent_id)
+        chunks = chunks_collection.update_many({"document_id": parent_id}, {"$set": chunk_update})
+
+        update_status(
+            "data-storage",
+            parent_id,
+            "ok",
+            mongo_id=doc_mongo_id,
+            chunks_inserted=chunks.modified_count,
+            total_chunks=total_chunks,
+            part_count=part_count,
+        )
+        logger.info("Reassembled document %s from %d parts (_id=%s)", parent_id, part_count, doc_mongo_id)
+        if self.on_reassembled:
+            self.on_reassembled(merged)
+        # Only now: a retry needs the parts to merge again
+        db[PARTS_COLLECTION].delete_many({"parent_document_id": parent_id})
+        return True
+
     def process(self, message: AppMessage) -> None:
         try:
             # Determine DB/collection from environment
@@ -105,7 +315,13 @@ class StorageProcessor(MessageProcessor):
 
             vector_chunks = []
             if message.data and message.data.payload and "vector_chunks" in message.data.payload:
-                vector_chunks = message.data.payload.pop("vector_chunks", [])
+                # Packed base64 vectors with shared document metadata, or the original list of chunks
+                vector_chunks = decode_vector_chunks(message.data.payload.pop("vector_chunks", []))
+
+            part = part_info(message)
+            if part is not None:
+                self._store_part(db, message, part, vector_chunks)
+                return None
 
             message_dict = asdict(message)
             result = documents_collection.insert_one(message_dict)
@@ -113,19 +329,7 @@ class StorageProcessor(MessageProcessor):
 
             chunks_inserted = 0
             if vector_chunks and document_id:
-                chunk_docs = []
-
-                for chunk in vector_chunks:
-                    chunk_doc = {
-                        "document_id": document_id,
-                        "document_mongo_id": doc_mongo_id,
-                        "chunk_id": chunk.get("metadata", {}).get("chunk_id"),
-                        "total_chunks": chunk.get("metadata", {}).get("total_chunks"),
-                        "text": chunk.get("text", ""),
-                        "embedding": chunk.get("embedding", []),
-                        "metadata": chunk.get("metadata", {}),
-                    }
-                    chunk_docs.append(chunk_doc)
+                chunk_docs = _chunk_docs(document_id, doc_mongo_id, vector_chunks)
 
                 if chunk_docs:
                     chunks_result = chunks_collection.insert_many(chunk_docs)
@@ -154,6 +358,8 @@ class StorageProcessor(MessageProcessor):
 def main() -> None:
     CONNECTION_STRING = os.getenv("AZURE_SERVICEBUS_CONNECTION_STRING", "")
     INPUT_QUEUE_NAME = os.getenv("AZURE_DATA_STORAGE_QUEUE", "data-storage")
+    SEARCH_INDEX_QUEUE_NAME = os.getenv("AZURE_SEARCH_INDEX_QUEUE", "search-index")
+    NOTIFICATION_QUEUE_NAME = os.getenv("AZURE_NOTIFICATION_QUEUE", "notifications")
 
     logger.info(f"Starting data storage service.\nInput: {INPUT_QUEUE_NAME} Output: None")
 
@@ -165,7 +371,20 @@ def main() -> None:
     try:
         logger.info("\n--- Starting continuous listening ---")
         logger.info("Press Ctrl+C to stop")
-        processor = StorageProcessor()
+        # Split documents skip search indexing and notification in the extractor;
+        # the reassembled parent is forwarded from here instead
+        publishers = [
+            ServiceBusPublisher(CONNECTION_STRING, SEARCH_INDEX_QUEUE_NAME),
+            ServiceBusPublisher(CONNECTION_STRING, NOTIFICATION_QUEUE_NAME),
+        ]
+
+        def forward_reassembled(msg: AppMessage) -> None:
+            # A failed forward fails the part, so the reassembly is retried instead of completed
+            for publisher in publishers:
+                if not publisher.publish_message(msg):
+                    raise RuntimeError(f"Failed to forward reassembled document to {publisher.topic_name}")
+
+        processor = StorageProcessor(on_reassembled=forward_reassembled)
         handler = MessageHandler(processor, None)
         consumer.start_continuous_listening(handler)
 
@@ -1,6 +1,8 @@
 import os
 import re
+import sys
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
 
 import openai
 from dotenv import load_dotenv
@@ -8,7 +10,15 @@ from fastapi import FastAPI, HTTPException
 from models import Document, QueryRequest, SummaryResponse
 from promps import systemPrompt
 from pymongo import MongoClient
-from sentence_transformers import SentenceTransformer
+
+# Ensure '/app' (the project root in containers) is on sys.path before importing 'shared'
+parent_dir = Path(__file__).parent.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+
+from shared.tools.embedding_model import load_embedding_model  # noqa: E402
+from shared.tools.llm_accounting import accounted  # noqa: E402
+from shared.tools.llm_resilience import ResilientCaller  # noqa: E402
 
 load_dotenv()
 
@@ -19,9 +29,16 @@ MONGO_URI = os.getenv("MONGO_URI")
 DATABASE_NAME = "overheid"
 COLLECTION_NAME = "chunks"
 
+REASON_MODEL = "gpt-3.5-turbo"
+# Seconds per reason request; slow requests are hedged and a failing API opens the circuit,
+# after which searches return without reasons instead of waiting on every call
+REASON_DEADLINE_SECONDS = float(os.getenv("REASON_DEADLINE_SECONDS", "8"))
+
 openai.api_key = OPENAI_API_KEY
 openai_client = openai.OpenAI()
-model = SentenceTransformer("all-MiniLM-L6-v2")
+reason_guard = ResilientCaller(REASON_MODEL, REASON_DEADLINE_SECONDS)
+# EMBEDDING_MODEL / EMBEDDING_BACKEND must match the embedding generator's
+model = load_embedding_model()
 
 mongo_client = MongoClient(MONGO_URI)
 
@@ -33,7 +50,7 @@ def get_embedding(text: str) -> list[float]:
     return model.encode(text).tolist()
 
 
-def generate_reason_via_openai(query: str, tittle: str, chunk: str, tags: list[str]) -> str:
+def generate_reason_via_openai(query: str, tittle: str, chunk: str, tags: list[str], document_id: str = "") -> str:
     tags_str = ", ".join(filter(None, tags))
     prompt = f"""
     You have a user's query: "{query}".
@@ -43,14 +60,23 @@ def generate_reason_via_openai(query: str, tittle: str, chunk: str, tags: list[s
     Based on the title and these tags, give me an array of 3 reasons why this document is relevant to the user's query.
 """
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "system", "content": systemPrompt}, {"role": "user", "content": prompt}],
-            temperature=0.2,
-            max_tokens=200,
-            n=1,
-            stream=False,
-            timeout=5,
+        response = reason_guard.call(
+            lambda: accounted(
+                "agent-backend",
+                REASON_MODEL,
+                lambda: openai_client.chat.completions.create(
+                    model=REASON_MODEL,
+                    messages=[{"role": "system", "content": systemPrompt}, {"role": "user", "content": prompt}],
+                    temperature=0.2,
+                    max_tokens=200,
+                    n=1,
+                    stream=False,
+                    timeout=5,
+                ),
+                [document_id] if document_id else [],
+                # Query-time usage, not part of processing the document
+                document_totals=False,
+            )
         )
         return response.choices[0].message.content
     except Exception as e:
@@ -102,6 +128,7 @@ def search_documents(embedding: list[float], query: str) -> list[Document]:
                     tittle=record.get("document", {}).get("data", {}).get("title", ""),
                     chunk=record.get("chunks", [{}])[0].get("text", ""),
                     tags=[tag for tag in doc_tags if tag is not None],
+                    document_id=record["document_id"],
                 )
             except Exception as e:
                 return f"Error generating reason: {str(e)}"
@@ -106,6 +106,9 @@ class PiiScanInfo:
     engine: str | None = None
     matches: dict[str, list[str]] | None = None
     timestamp: _dt.datetime | None = None
+    # Matches per detector and their [start, end) character offsets in extracted_text
+    counts: dict[str, int] | None = None
+    offsets: dict[str, list[list[int]]] | None = None
 
 
 @dataclass
@@ -189,6 +192,8 @@ class AppMessage:
                 "engine": self.pii.engine,
                 "matches": self.pii.matches,
                 "timestamp": _to_iso(self.pii.timestamp),
+                "counts": self.pii.counts,
+                "offsets": self.pii.offsets,
             }
 
         if self.metadata is not None:
@@ -269,6 +274,8 @@ class AppMessage:
                     engine=(p_raw.get("engine") if isinstance(p_raw.get("engine"), str) else None),
                     matches=matches,
                     timestamp=_to_dt(p_raw.get("timestamp")),
+                    counts=(p_raw.get("counts") if isinstance(p_raw.get("counts"), dict) else None),
+                    offsets=(p_raw.get("offsets") if isinstance(p_raw.get("offsets"), dict) else None),
                 )
 
         # Metadata (build only if present)
@@ -0,0 +1,92 @@
+"""
+CompositeMessageProcessor
+
+Chains several MessageProcessors so consecutive pipeline stages can run in a
+single service, without a Service Bus round trip (and a serialize/parse
+cycle) between them. Each stage keeps reporting its own ``update_status``;
+the composite only records what the stages cannot: a stage that raised, and
+the later stages that were skipped because an earlier one dropped the message.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from shared.models.messages import AppMessage
+from shared.tools.MessageProcessor import MessageProcessor
+from shared.tools.pipeline_status import update_status
+
+logger = logging.getLogger(__name__)
+
+
+def _document_id(message: Any) -> str | None:
+    data = getattr(message, "data", None)
+    return (data.id or data.name) if data is not None else None
+
+
+class CompositeMessageProcessor(MessageProcessor):
+    """Runs processors in order, feeding the output of each one into the next.
+
+    A stage returning None short-circuits the chain for that message (the
+    remaining stages are marked ``skipped``). A stage returning a list (e.g.
+    ingestion splitting a document into parts) continues the chain for every
+    message in it.
+
+    Parameters:
+        stages: ``(status name, processor)`` pairs in pipeline order.
+    """
+
+    def __init__(self, stages: list[tuple[str, MessageProcessor]]) -> None:
+        if not stages:
+            raise ValueError("CompositeMessageProcessor needs at least one stage")
+        self.stages = stages
+
+    def _skip_remaining(self, message: Any, index: int, reason: str) -> None:
+        document_id = _document_id(message)
+        if not document_id:
+            return
+        for name, _ in self.stages[index + 1 :]:
+            try:
+                update_status(name, document_id, "skipped", reason=reason)
+            except Exception as e:  # noqa: BLE001
+                logger.debug("Could not mark %s skipped for %s: %s", name, document_id, e)
+
+    def process(self, message: Any) -> AppMessage | list[AppMessage] | None:
+        current: list[Any] = [message]
+        for index, (name, processor) in enumerate(self.stages):
+            produced: list[AppMessage] = []
+            for msg in current:
+                try:
+                    result = processor.process(msg)
+                except Exception as e:  # noqa: BLE001
+                    logger.exception("Stage %s failed: %s", name, e)
+                    document_id = _document_id(msg)
+                    if document_id:
+                        try:
+                            update_status(name, document_id, "error", reason=str(e))
+                        except Exception:  # noqa: BLE001
+                            pass
+                    self._skip_remaining(msg, index, f"{name}_failed")
+                    continue
+                if result is None:
+                    self._skip_remaining(msg, index, f"dropped_by_{name}")
+                elif isinstance(result, list):
+                    produced.extend(result)
+                else:
+                    produced.append(result)
+            if not produced:
+                return None
+            current = produced
+        return current if len(current) > 1 else current[0]
+
+    def on_published(self, message: Any) -> None:
+        """Forward the message that entered the service to every stage that defines ``on_published``."""
+        for name, processor in self.stages:
+            callback = getattr(processor, "on_published", None)
+            if callback is None:
+                continue
+            try:
+                callback(message)
+            except Exception as e:  # noqa: BLE001
+                logger.error("on_published of stage %s failed: %s", name, e)
@@ -15,19 +15,27 @@ class MessageHandler:
     Parameters:
         message_processor: A MessageProcessor to transform/validate the incoming AppMessage.
         after_process: Callback executed only if processing returns a non-None AppMessage.
+            When the processor returns a list of messages (fan-out), it is called once per message;
+            an empty list means the message was handled with nothing to publish.
+        on_published: Called with the input message once it was processed and every after_process
+            callback succeeded (e.g. to record that its output reached the next queue). Its errors
+            are logged only: the output is already published.
 
     Returns (from handle_message):
-        bool: True if the message was processed successfully (processor returned a non-None AppMessage),
-              False otherwise.
+        bool: True if the message was processed successfully (processor returned a non-None AppMessage
+              or a non-empty list of them) and every callback succeeded, False otherwise. With a
+              PEEK_LOCK consumer a False result abandons the message, so it is delivered again.
     """
 
     def __init__(
         self,
         message_processor: MessageProcessor | None = None,
         after_process: Callable[[AppMessage], None] | None = lambda msg: None,
+        on_published: Callable[[AppMessage], None] | None = None,
     ) -> None:
         self.message_processor = message_processor
         self.after_process = after_process
+        self.on_published = on_published
 
     def handle_message(self, message: AppMessage) -> bool:
         if not self.message_processor:
@@ -40,12 +48,24 @@ class MessageHandler:
             logger.exception("Unhandled exception while processing message: %s", e)
             return False
         if msg_processed and self.after_process:
-            try:
-                self.after_process(msg_processed)
-            except Exception as cb_err:  # noqa: BLE001
-                logger.error("after_process callback failed: %s", cb_err)
+            for msg in msg_processed if isinstance(msg_processed, list) else [msg_processed]:
+                try:
+                    self.after_process(msg)
+                except Exception as cb_err:  # noqa: BLE001
+                    # e.g. the result could not be published: the message must not be completed
+                    logger.error("after_process callback failed: %s", cb_err)
+                    return False
         if msg_processed:
             logger.info("Message processed successfully: %s", msg_processed)
-            return True
-        logger.error("Message processing failed")
-        return False
+        elif isinstance(msg_processed, list):
+            # An empty list: handled, nothing to publish (e.g. the message was rescheduled)
+            logger.info("Message handled without output")
+        else:
+            logger.error("Message processing failed")
+            return False
+        if self.on_published:
+            try:
+                self.on_published(message)
+            except Exception as cb_err:  # noqa: BLE001
+                logger.error("on_published callback failed: %s", cb_err)
+        return True
@@ -32,8 +32,16 @@ class MessageProcessor(Protocol):
     inferiores (por ejemplo el consumer) entreguen aún un ``dict`` sin forzar
     dependencia en ``AppMessage``; las implementaciones concretas pueden
     inmediatamente convertir/validar (p.ej. ``AppMessage.parse``) y retornar
-    un ``AppMessage`` procesado o ``None`` para descartar.
+    un ``AppMessage`` procesado o ``None`` para descartar. Un procesador puede
+    devolver también una lista de ``AppMessage`` cuando un mensaje se divide en
+    varios (p.ej. un documento grande partido en rangos de páginas); cada uno se
+    publica por separado. Una lista vacía indica que el mensaje se ha tratado sin
+    nada que publicar (p.ej. se ha vuelto a encolar con retraso).
+
+    Opcionalmente un procesador define ``on_published(message)``: el handler lo
+    llama con el mensaje de entrada cuando toda su salida se ha publicado (p.ej.
+    para registrar algo que solo vale si el mensaje llegó a la siguiente cola).
     """
 
-    def process(self, message: Any) -> AppMessage | None:  # noqa: D401
+    def process(self, message: Any) -> AppMessage | list[AppMessage] | None:  # noqa: D401
         ...
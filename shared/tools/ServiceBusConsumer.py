@@ -1,8 +1,16 @@
 import json
 import logging
+import os
 import time
-
-from azure.servicebus import ServiceBusClient, ServiceBusReceiveMode
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from azure.servicebus import (
+    AutoLockRenewer,
+    ServiceBusClient,
+    ServiceBusReceivedMessage,
+    ServiceBusReceiveMode,
+    ServiceBusReceiver,
+)
 from azure.servicebus.management import QueueProperties
 
 from shared.models.messages import AppMessage
@@ -11,6 +19,9 @@ from shared.tools.MessageHandler import MessageHandler
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# Longest time the lock of a message in flight is kept renewed (concurrent mode)
+MAX_LOCK_RENEWAL_SECONDS = float(os.getenv("SERVICEBUS_MAX_LOCK_RENEWAL_SECONDS", "1800"))
+
 
 class ServiceBusConsumer:
     """
@@ -40,17 +51,31 @@ class ServiceBusConsumer:
 
         Args:
             message_handler: An object implementing MessageProcessor with a .process(msg) method
-            max_concurrent_calls (int): Maximum number of concurrent message processing
+            max_concurrent_calls (int): Maximum number of concurrent message processing; above 1,
+                messages are processed on that many worker threads (see _listen_concurrently)
         """
         self.is_running = True
         logger.info(f"Starting continuous listening on queue '{self.queue_name}'")
 
+        lock_renewer: AutoLockRenewer | None = None
         try:
             with self.client:
-                receiver = self.client.get_queue_receiver(
-                    queue_name=self.queue_name, receive_mode=ServiceBusReceiveMode.RECEIVE_AND_DELETE
-                )
+                if max_concurrent_calls > 1:
+                    # Messages in flight stay locked (renewed while their processing runs) and are only
+                    # removed from the queue when completed; a crash or redeploy makes them available again
+                    lock_renewer = AutoLockRenewer(max_lock_renewal_duration=MAX_LOCK_RENEWAL_SECONDS)
+                    receiver = self.client.get_queue_receiver(
+                        queue_name=self.queue_name,
+                        receive_mode=ServiceBusReceiveMode.PEEK_LOCK,
+                        auto_lock_renewer=lock_renewer,
+                    )
+                else:
+                    receiver = self.client.get_queue_receiver(
+                        queue_name=self.queue_name, receive_mode=ServiceBusReceiveMode.RECEIVE_AND_DELETE
+                    )
                 with receiver:
+                    if max_concurrent_calls > 1:
+                        self._listen_concurrently(receiver, message_handler, max_concurrent_calls)
                     while self.is_running:
                         try:
                             # Receive messages
@@ -59,30 +84,7 @@ class ServiceBusConsumer:
                             )
 
                             for message in received_msgs:
-                                settle_ok = False
-                                try:
-                                    app_message = AppMessage.parse(json.loads(str(message)))
-                                    if app_message is not None:
-                                        # Handler returns success boolean
-                                        settle_ok = message_handler.handle_message(app_message)
-                                except Exception as handler_error:  # noqa: BLE001
-                                    logger.error(
-                                        "Error processing message %s: %s",
-                                        getattr(message, "message_id", None),
-                                        handler_error,
-                                    )
-                                finally:
-                                    # If auto_complete True we let SDK complete automatically only on success.
-                                    # When auto_complete is True the SDK completes after context exit if no exception.
-                                    # We want explicit settle to avoid reprocessing loops.
-                                    try:
-                                        if settle_ok:
-                                            receiver.complete_message(message)
-                                        else:
-                                            # Abandon so it can be retried or moved to DLQ based on max delivery count
-                                            receiver.abandon_message(message)
-                                    except Exception as settle_err:  # noqa: BLE001
-                                        logger.debug("Failed to settle message explicitly: %s", settle_err)
+                                self._settle(receiver, message, self._handle(message, message_handler))
 
                             # Small delay to prevent tight loop when no messages
                             if not received_msgs:
@@ -100,8 +102,77 @@ class ServiceBusConsumer:
             logger.error(f"Failed to start continuous listening: {str(e)}")
         finally:
             self.is_running = False
+            if lock_renewer is not None:
+                lock_renewer.close()
             logger.debug("Stopped continuous listening")
 
+    @staticmethod
+    def _handle(message: ServiceBusReceivedMessage, message_handler: MessageHandler) -> bool:
+        """Parse and process one message; returns whether it should be completed."""
+        try:
+            app_message = AppMessage.parse(json.loads(str(message)))
+            if app_message is not None:
+                # Handler returns success boolean
+                return message_handler.handle_message(app_message)
+        except Exception as handler_error:  # noqa: BLE001
+            logger.error(
+                "Error processing message %s: %s",
+                getattr(message, "message_id", None),
+                handler_error,
+            )
+        return False
+
+    @staticmethod
+    def _settle(receiver: ServiceBusReceiver, message: ServiceBusReceivedMessage, settle_ok: bool) -> None:
+        # Explicit settling (PEEK_LOCK, concurrent mode): a completed message leaves the queue, an
+        # abandoned one is delivered again up to the queue's max delivery count, then dead-lettered.
+        # In RECEIVE_AND_DELETE mode the message is already gone and settling fails harmlessly.
+        try:
+            if settle_ok:
+                receiver.complete_message(message)
+            else:
+                receiver.abandon_message(message)
+        except Exception as settle_err:  # noqa: BLE001
+            if receiver.receive_mode == ServiceBusReceiveMode.PEEK_LOCK:
+                logger.warning("Failed to settle message %s: %s", getattr(message, "message_id", None), settle_err)
+            else:
+                logger.debug("Failed to settle message explicitly: %s", settle_err)
+
+    def _listen_concurrently(
+        self, receiver: ServiceBusReceiver, message_handler: MessageHandler, max_in_flight: int
+    ) -> None:
+        """
+        Process up to ``max_in_flight`` messages at a time on worker threads.
+
+        New messages are received as soon as a slot frees up. The receiver is in
+        PEEK_LOCK mode: every message is completed (or abandoned, to be delivered
+        again) from this (the receiver's) thread once its own processing has
+        finished; a slow message never holds back the others.
+        """
+        in_flight: dict[Future[bool], ServiceBusReceivedMessage] = {}
+        with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=f"{self.queue_name}-worker") as executor:
+            while self.is_running or in_flight:
+                try:
+                    free = max_in_flight - len(in_flight)
+                    if self.is_running and free > 0:
+                        received_msgs = receiver.receive_messages(
+                            max_message_count=free, max_wait_time=1 if in_flight else 10
+                        )
+                        for message in received_msgs:
+                            in_flight[executor.submit(self._handle, message, message_handler)] = message
+                    if not in_flight:
+                        continue
+                    done, _ = wait(in_flight, timeout=0 if free > 0 else 1, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._settle(receiver, in_flight.pop(future), future.result())
+                except KeyboardInterrupt:
+                    # Stop receiving, but let the messages in flight finish and settle
+                    logger.info("Received keyboard interrupt, finishing %d messages in flight...", len(in_flight))
+                    self.is_running = False
+                except Exception as e:
+                    logger.error(f"Error in message processing loop: {str(e)}")
+                    time.sleep(5)  # Wait before retrying
+
     def stop_listening(self) -> None:
         """Stop the continuous listening loop."""
         self.is_running = False
@@ -37,6 +37,7 @@ class ServiceBusHandler:
         output_queue: str | None = None,
         message_processor: MessageProcessor | None = None,
         message_subject: str = "processed_message",
+        max_concurrent_calls: int = 1,
     ) -> None:
         """
         Initialize the Service Bus handler.
@@ -48,12 +49,14 @@ class ServiceBusHandler:
             message_processor: An object implementing MessageProcessor
                 (with a .process(msg) method) that returns a BaseMessage or None.
             message_subject: Subject to use when publishing messages
+            max_concurrent_calls: Messages processed at the same time (see ServiceBusConsumer)
         """
         self.connection_string = connection_string
         self.input_queue = input_queue
         self.output_queue = output_queue
         self.message_processor = message_processor
         self.message_subject = message_subject
+        self.max_concurrent_calls = max_concurrent_calls
         self.publisher: ServiceBusPublisher | None = None
         self.consumer: ServiceBusConsumer | None = None
 
@@ -82,12 +85,20 @@ class ServiceBusHandler:
             self.consumer = ServiceBusConsumer(self.connection_string, self.input_queue)
 
             def publish_msg(msg: AppMessage) -> None:
-                self.publisher.publish_message(
-                    message_content=msg, subject=self.message_subject
-                ) if self.publisher else None
-
-            message_handler = MessageHandler(self.message_processor, publish_msg)
-            self.consumer.start_continuous_listening(message_handler)
+                # Called from max_concurrent_calls worker threads; the publisher keeps one open sender and
+                # serializes sends. A failed send fails the message, which is then abandoned and redelivered
+                # (PEEK_LOCK) instead of being completed without its output.
+                if self.publisher is None:
+                    if self.output_queue:
+                        raise RuntimeError(f"No publisher for {self.output_queue}")
+                    return
+                if not self.publisher.publish_message(message_content=msg, subject=self.message_subject):
+                    raise RuntimeError(f"Failed to publish to {self.output_queue}")
+
+            # A processor may define on_published(message), called once all output of a message was published
+            on_published = getattr(self.message_processor, "on_published", None)
+            message_handler = MessageHandler(self.message_processor, publish_msg, on_published)
+            self.consumer.start_continuous_listening(message_handler, max_concurrent_calls=self.max_concurrent_calls)
 
         except KeyboardInterrupt:
             logger.info("Service interrupted, shutting down...")
@@ -1,9 +1,11 @@
 import json
 import logging
+import threading
+from datetime import datetime
 from typing import Any
 from uuid import UUID
 
-from azure.servicebus import ServiceBusClient, ServiceBusMessage
+from azure.servicebus import ServiceBusClient, ServiceBusMessage, ServiceBusSender
 
 from shared.models.messages import AppMessage
 
@@ -14,6 +16,9 @@ logger = logging.getLogger(__name__)
 class ServiceBusPublisher:
     """
     A class to publish messages to Azure Service Bus topics.
+
+    The client and its sender stay open between messages and are shared by all
+    threads; sends are serialized by a lock. Call ``close()`` when done.
     """
 
     def __init__(self, connection_string: str, topic_name: str):
@@ -27,6 +32,23 @@ class ServiceBusPublisher:
         self.connection_string = connection_string
         self.topic_name = topic_name
         self.client = ServiceBusClient.from_connection_string(connection_string)
+        self._sender: ServiceBusSender | None = None
+        self._lock = threading.Lock()
+
+    def _get_sender(self) -> ServiceBusSender:
+        # Called with self._lock held
+        if self._sender is None:
+            self._sender = self.client.get_topic_sender(topic_name=self.topic_name)
+        return self._sender
+
+    def _reset_sender(self) -> None:
+        # Called with self._lock held; a failed sender is replaced on the next send
+        if self._sender is not None:
+            try:
+                self._sender.close()
+            except Exception as e:  # noqa: BLE001
+                logger.debug("Failed to close sender: %s", e)
+            self._sender = None
 
     def publish_message(
         self,
@@ -34,6 +56,7 @@ class ServiceBusPublisher:
         subject: str | None = None,
         content_type: str = "application/json",
         custom_properties: dict[str | bytes, int | float | bytes | bool | str | UUID] | None = None,
+        scheduled_enqueue_time: datetime | None = None,
     ) -> bool:
         """
         Publish a single message to the Service Bus topic.
@@ -43,31 +66,36 @@ class ServiceBusPublisher:
             subject (str, optional): Message subject/label
             content_type (str): Content type of the message
             custom_properties (Dict, optional): Custom properties to add to the message
+            scheduled_enqueue_time (datetime, optional): Deliver the message at this (UTC) time
 
         Returns:
             bool: True if message was sent successfully, False otherwise
         """
         try:
-            with self.client:
-                sender = self.client.get_topic_sender(topic_name=self.topic_name)
-                with sender:
-                    # Convert message AppMessage content to JSON string using its serializer
-                    message_body = json.dumps(message_content.to_dict(), ensure_ascii=False)
-                    # Create Service Bus message
-                    logger.info("Publishing message to topic '%s': %s", self.topic_name, message_body)
-                    message = ServiceBusMessage(
-                        body=message_body,
-                        content_type=content_type,
-                        application_properties=custom_properties if custom_properties else None,
-                    )
-
-                    # Add subject if provided
-                    if subject:
-                        message.subject = subject
-
-                    # Send the message
-                    sender.send_messages(message)
-                    return True
+            # Convert message AppMessage content to JSON string using its serializer
+            message_body = json.dumps(message_content.to_dict(), ensure_ascii=False)
+            # Create Service Bus message
+            logger.info("Publishing message to topic '%s': %s", self.topic_name, message_body)
+            message = ServiceBusMessage(
+                body=message_body,
+                content_type=content_type,
+                application_properties=custom_properties if custom_properties else None,
+            )
+
+            # Add subject if provided
+            if subject:
+                message.subject = subject
+            if scheduled_enqueue_time is not None:
+                message.scheduled_enqueue_time_utc = scheduled_enqueue_time
+
+            # Send the message
+            with self._lock:
+                try:
+                    self._get_sender().send_messages(message)
+                except Exception:
+                    self._reset_sender()
+                    raise
+            return True
 
         except Exception as e:
             logger.error(f"Failed to send message: {str(e)}")
@@ -85,9 +113,9 @@ class ServiceBusPublisher:
             bool: True if all batches were sent successfully, False otherwise
         """
         try:
-            with self.client:
-                sender = self.client.get_topic_sender(topic_name=self.topic_name)
-                with sender:
+            with self._lock:
+                try:
+                    sender = self._get_sender()
                     # Process messages in batches
                     for i in range(0, len(messages), batch_size):
                         batch = messages[i : i + batch_size]
@@ -111,15 +139,20 @@ class ServiceBusPublisher:
                         if len(message_batch) > 0:
                             sender.send_messages(message_batch)
                             logger.debug(f"Batch of {len(batch)} messages sent successfully")
+                except Exception:
+                    self._reset_sender()
+                    raise
 
-                    logger.debug(f"All {len(messages)} messages sent successfully to topic '{self.topic_name}'")
-                    return True
+            logger.debug(f"All {len(messages)} messages sent successfully to topic '{self.topic_name}'")
+            return True
 
         except Exception as e:
             logger.error(f"Failed to send batch messages: {str(e)}")
             return False
 
     def close(self) -> None:
-        """Close the Service Bus client connection."""
+        """Close the sender and the Service Bus client connection."""
+        with self._lock:
+            self._reset_sender()
         if self.client:
             self.client.close()
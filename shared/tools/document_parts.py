@@ -0,0 +1,161 @@
+"""Helpers for documents split into page-range parts.
+
+Oversized documents are split at ingestion into parts that travel through the
+pipeline as independent messages, so several replicas can work on one
+document. Every part keeps the parent id in its payload:
+
+    payload = {
+        "extracted_text": "<text of this page range>",
+        "parent_document_id": "<id of the whole document>",
+        "part_index": 0,          # 0-based
+        "part_count": 4,
+        "page_range": [0, 200],   # [start, stop) in the parent document
+        ...
+    }
+
+Data storage reassembles the parts once all of them have arrived.
+"""
+
+from __future__ import annotations
+
+import copy
+from dataclasses import dataclass
+
+from shared.models.messages import AppMessage
+
+__all__ = ["PartInfo", "merge_parts", "part_id", "part_info", "split_pages"]
+
+# Payload keys that only make sense on a part, dropped again on reassembly
+_PART_KEYS = ("parent_document_id", "part_index", "page_range", "vector_chunks")
+
+
+@dataclass(frozen=True)
+class PartInfo:
+    parent_document_id: str
+    part_index: int
+    part_count: int
+
+
+def part_id(parent_document_id: str, part_index: int) -> str:
+    return f"{parent_document_id}.part-{part_index:04d}"
+
+
+def part_info(message: AppMessage) -> PartInfo | None:
+    """Return the part coordinates of a message, or None for a whole document."""
+    payload = message.data.payload if message.data else None
+    if not payload or not payload.get("parent_document_id"):
+        return None
+    return PartInfo(
+        parent_document_id=str(payload["parent_document_id"]),
+        part_index=int(payload.get("part_index", 0)),
+        part_count=int(payload.get("part_count", 1)),
+    )
+
+
+def _page_text(pages: list[str]) -> str:
+    return "".join(page + "\n" for page in pages if page)
+
+
+def split_pages(message: AppMessage, pages: list[str], part_pages: int) -> list[AppMessage]:
+    """Split a document message into page-range part messages.
+
+    Page ranges without any text are merged into the previous part so that
+    every part carries text and passes validation.
+
+    Args:
+        message: The whole-document message (its payload is copied into each part)
+        pages: Text of every page, in order
+        part_pages: Maximum number of pages per part
+
+    Returns:
+        The part messages, or ``[message]`` when the document is not split
+    """
+    if message.data is None or not message.data.id or len(pages) <= part_pages:
+        return [message]
+
+    ranges: list[list[int]] = []
+    for start in range(0, len(pages), part_pages):
+        stop = min(start + part_pages, len(pages))
+        if ranges and not _page_text(pages[start:stop]):
+            ranges[-1][1] = stop
+        elif ranges and not _page_text(pages[ranges[-1][0] : ranges[-1][1]]):
+            ranges[-1][1] = stop
+        else:
+            ranges.append([start, stop])
+    if len(ranges) < 2:
+        return [message]
+
+    parent_id = message.data.id
+    parts: list[AppMessage] = []
+    for index, (start, stop) in enumerate(ranges):
+        part = copy.deepcopy(message)
+        assert part.data is not None
+        part.data.id = part_id(parent_id, index)
+        payload = dict(part.data.payload or {})
+        payload.update(
+            {
+                "extracted_text": _page_text(pages[start:stop]),
+                "page_count": stop - start,
+                "parent_document_id": parent_id,
+                "part_index": index,
+                "part_count": len(ranges),
+                "page_range": [start, stop],
+            }
+        )
+        part.data.payload = payload
+        parts.append(part)
+    return parts
+
+
+def merge_parts(parts: list[AppMessage]) -> AppMessage:
+    """Rebuild the whole-document message from all of its parts.
+
+    The text is concatenated in part order (which restores the original text
+    exactly), metadata comes from the first part that has it and the PII
+    results of all parts are combined.
+
+    Args:
+        parts: Every part of one document, in any order
+
+    Returns:
+        The message of the parent document
+    """
+    parts = sorted(parts, key=lambda p: int((p.data.payload or {}).get("part_index", 0)) if p.data else 0)
+    first = parts[0]
+    info = part_info(first)
+    if first.data is None or info is None:
+        raise ValueError("merge_parts() needs document parts")
+
+    merged = copy.deepcopy(first)
+    assert merged.data is not None
+    merged.data.id = info.parent_document_id
+    payload = {key: value for key, value in (first.data.payload or {}).items() if key not in _PART_KEYS}
+    payload["extracted_text"] = "".join(((p.data.payload or {}).get("extracted_text") or "") for p in parts if p.data)
+    payload["page_count"] = sum(int((p.data.payload or {}).get("page_count") or 0) for p in parts if p.data)
+    payload["part_count"] = len(parts)
+    merged.data.payload = payload
+    merged.metadata = next((p.metadata for p in parts if p.metadata is not None), None)
+
+    scans = [p.pii for p in parts if p.pii is not None]
+    if scans:
+        matches: dict[str, list[str]] = {}
+        counts: dict[str, int] = {}
+        offsets: dict[str, list[list[int]]] = {}
+        shift = 0
+        for p in parts:
+            scan = p.pii
+            if scan is not None:
+                for name, found in (scan.matches or {}).items():
+                    matches[name] = list(dict.fromkeys(matches.get(name, []) + found))
+                for name, count in (scan.counts or {}).items():
+                    counts[name] = counts.get(name, 0) + count
+                # Offsets are relative to the part text; shift them into the merged text
+                for name, spans in (scan.offsets or {}).items():
+                    offsets.setdefault(name, []).extend([start + shift, end + shift] for start, end in spans)
+            shift += len(((p.data.payload or {}).get("extracted_text") or "") if p.data else "")
+        merged.pii = copy.deepcopy(scans[0])
+        merged.pii.has_pii = any(scan.has_pii for scan in scans)
+        merged.pii.matches = matches
+        merged.pii.counts = counts if any(scan.counts is not None for scan in scans) else None
+        merged.pii.offsets = offsets if any(scan.offsets is not None for scan in scans) else None
+    return merged
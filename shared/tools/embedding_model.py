@@ -0,0 +1,138 @@
+"""
+Embedding model loading with a selectable inference backend.
+
+``EMBEDDING_BACKEND`` chooses how ``EMBEDDING_MODEL`` runs on CPU:
+
+- ``torch`` (default): PyTorch, as before;
+- ``onnx``: ONNX Runtime with the model's float32 ONNX export (exported on
+  first load when the model repository has none);
+- ``onnx-int8``: ONNX Runtime with a dynamically int8-quantized export,
+  ``EMBEDDING_ONNX_FILE`` inside the model repository (default
+  ``onnx/model_qint8_avx2.onnx``, published for the sentence-transformers
+  models). For a model without one, ``export_int8`` writes it to a local
+  directory that ``EMBEDDING_MODEL`` can then point to.
+
+The document side (embedding generator) and the query side (agent backend)
+should use the same backend: int8 vectors differ slightly from float32 ones
+(cosine similarity ~0.99).
+
+Models are read from ``EMBEDDING_MODEL_CACHE`` (a volume shared by the
+replicas) without asking the Hugging Face Hub first, and downloaded there
+only when missing. PyTorch weights are loaded from ``model.safetensors`` when
+the model has one, which is memory-mapped instead of unpickled, so a replica
+starting on a node where the file is in the page cache reads it from memory;
+models published with only ``pytorch_model.bin`` load from that.
+
+A process that only splits text into chunks (the embedding generator with
+``EMBEDDING_WORKERS``, whose encoder processes hold the model) uses
+``load_embedding_tokenizer``, which reads the tokenizer and the configuration
+files but no weights.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+from sentence_transformers import SentenceTransformer
+
+__all__ = ["BACKENDS", "export_int8", "load_embedding_model", "load_embedding_tokenizer"]
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx2.onnx")
+# Local model directory (empty = the Hugging Face default cache)
+EMBEDDING_MODEL_CACHE = os.getenv("EMBEDDING_MODEL_CACHE", "")
+
+
+def load_embedding_model(model_name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND) -> SentenceTransformer:
+    """
+    Load ``model_name`` for the given backend.
+
+    Raises:
+        ValueError: Unknown backend
+    """
+    logger.info("Loading embedding model %s (%s)", model_name, backend)
+    if backend == "torch":
+        # transformers prefers model.safetensors and falls back to pytorch_model.bin when there is none
+        kwargs: dict[str, Any] = {}
+    elif backend == "onnx":
+        kwargs = {"backend": "onnx"}
+    elif backend == "onnx-int8":
+        kwargs = {"backend": "onnx", "model_kwargs": {"file_name": EMBEDDING_ONNX_FILE}}
+    else:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'; expected one of {', '.join(BACKENDS)}")
+
+    cache_folder = EMBEDDING_MODEL_CACHE or None
+    try:
+        # Cached models load without a round trip to the Hub per file
+        return SentenceTransformer(model_name, cache_folder=cache_folder, local_files_only=True, **kwargs)
+    except (OSError, ValueError):
+        logger.info("Embedding model %s is not cached locally; downloading it", model_name)
+        return SentenceTransformer(model_name, cache_folder=cache_folder, **kwargs)
+
+
+# Files of a model repository besides the weights: configurations, tokenizer and vocabulary
+_TOKENIZER_FILES = ["*.json", "*.txt", "*.model"]
+
+
+def load_embedding_tokenizer(model_name: str = EMBEDDING_MODEL) -> tuple[Any, int]:
+    """
+    Load the tokenizer and maximum sequence length of ``model_name`` without its weights.
+
+    Returns:
+        The Hugging Face tokenizer and the model's ``max_seq_length``
+    """
+    from huggingface_hub import snapshot_download
+    from transformers import AutoTokenizer
+
+    path = Path(model_name)
+    if not path.is_dir():
+        # Bare names are resolved like SentenceTransformer does
+        repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        cache_dir = EMBEDDING_MODEL_CACHE or None
+        try:
+            path = Path(
+                snapshot_download(repo_id, cache_dir=cache_dir, allow_patterns=_TOKENIZER_FILES, local_files_only=True)
+            )
+        except (OSError, ValueError):
+            logger.info("Tokenizer of %s is not cached locally; downloading it", model_name)
+            path = Path(snapshot_download(repo_id, cache_dir=cache_dir, allow_patterns=_TOKENIZER_FILES))
+
+    tokenizer = AutoTokenizer.from_pretrained(str(path))
+    max_seq_length = None
+    if (path / "sentence_bert_config.json").exists():
+        max_seq_length = json.loads((path / "sentence_bert_config.json").read_text()).get("max_seq_length")
+    if max_seq_length is None:
+        # As sentence-transformers does without a configured length: what both the model and tokenizer accept
+        config = json.loads((path / "config.json").read_text()) if (path / "config.json").exists() else {}
+        max_seq_length = min(
+            config.get("max_position_embeddings", tokenizer.model_max_length), tokenizer.model_max_length
+        )
+    return tokenizer, int(max_seq_length)
+
+
+def export_int8(model_name: str, output_dir: str, config: str = "avx2") -> str:
+    """
+    Export ``model_name`` to ONNX with dynamic int8 quantization.
+
+    Args:
+        model_name: Model to export
+        output_dir: Directory the model and ``onnx/model_qint8_<config>.onnx`` are saved to
+        config: Quantization target ("arm64", "avx2", "avx512" or "avx512_vnni")
+
+    Returns:
+        The file name to set as EMBEDDING_ONNX_FILE, with EMBEDDING_MODEL=output_dir
+    """
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    model = SentenceTransformer(model_name, backend="onnx")
+    model.save_pretrained(output_dir)
+    export_dynamic_quantized_onnx_model(model, config, output_dir)
+    return f"onnx/model_qint8_{config}.onnx"
@@ -0,0 +1,200 @@
+"""
+Token, latency and cost accounting for LLM calls.
+
+``accounted(stage, model, fn, document_ids)`` runs one LLM request, reads the
+token usage from its response (Gemini ``usage_metadata`` or OpenAI ``usage``)
+and records an ``LlmCall``:
+
+- one document per request in the ``llm_calls`` collection (stage, model,
+  tokens, latency, cost, document ids);
+- totals per document and stage under ``llm.<stage>`` in ``pipeline_status``;
+  a request for a batch of documents is shared equally among them. Calls that
+  are not part of processing a document (``document_totals=False``, e.g. the
+  agent backend explaining search results) are only kept in ``llm_calls``.
+
+Records are written by a background thread in bulk, so accounting adds no
+database round trip to the LLM call and a Mongo outage only loses records.
+Failed requests are recorded too (``ok: false``, no tokens), as are both
+requests of a hedged call: each of them is billed.
+
+Prices are USD per million input/output tokens; ``LLM_PRICES`` overrides or
+extends them as JSON, e.g. ``{"gemini-2.0-flash": [0.1, 0.4]}``.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass, field
+from typing import Any, TypeVar
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from shared.tools.mongo import get_collection
+from shared.tools.pipeline_status import get_status_collection
+
+__all__ = ["LlmCall", "accounted", "cost_usd", "flush", "record_call", "usage_tokens"]
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+ACCOUNTING_ENABLED = os.getenv("LLM_ACCOUNTING_ENABLED", "true").lower() in {"1", "true", "yes"}
+CALLS_COLLECTION = os.getenv("LLM_CALLS_COLLECTION", "llm_calls")
+# USD per million (input, output) tokens
+PRICES: dict[str, tuple[float, float]] = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    **{model: (float(p[0]), float(p[1])) for model, p in json.loads(os.getenv("LLM_PRICES", "{}")).items()},
+}
+# Records waiting to be written; beyond this they are dropped rather than slowing the callers
+QUEUE_SIZE = 10_000
+WRITE_BATCH = 500
+
+
+@dataclass
+class LlmCall:
+    """One LLM request."""
+
+    stage: str
+    model: str
+    prompt_tokens: int
+    output_tokens: int
+    latency_ms: float
+    document_ids: list[str] = field(default_factory=list)
+    ok: bool = True
+    error: str | None = None
+    # Whether the call counts towards the pipeline_status totals of its documents
+    document_totals: bool = True
+    created_at: dt.datetime = field(default_factory=lambda: dt.datetime.now(tz=dt.UTC))
+
+    @property
+    def cost_usd(self) -> float:
+        return cost_usd(self.model, self.prompt_tokens, self.output_tokens)
+
+
+def cost_usd(model: str, prompt_tokens: int, output_tokens: int) -> float:
+    """Cost of a request; versioned names ("gpt-3.5-turbo-0125") use the price of their base model."""
+    price = PRICES.get(model) or next((p for name, p in PRICES.items() if model.startswith(name)), (0.0, 0.0))
+    return (prompt_tokens * price[0] + output_tokens * price[1]) / 1_000_000
+
+
+def usage_tokens(response: Any) -> tuple[int, int]:
+    """(prompt, output) tokens reported in a Gemini or OpenAI response; (0, 0) when absent."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        return int(getattr(usage, "prompt_token_count", 0) or 0), int(getattr(usage, "candidates_token_count", 0) or 0)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return int(getattr(usage, "prompt_tokens", 0) or 0), int(getattr(usage, "completion_tokens", 0) or 0)
+    return 0, 0
+
+
+def accounted(  # noqa: UP047
+    stage: str, model: str, fn: Callable[[], T], document_ids: Iterable[str] = (), document_totals: bool = True
+) -> T:
+    """
+    Run one LLM request and record its usage.
+
+    Args:
+        stage: Pipeline stage making the call (e.g. "extractor")
+        model: Model name, as used for pricing
+        fn: Sends the request and returns the raw response
+        document_ids: Documents the request is made for
+        document_totals: Add the usage to the documents' pipeline_status totals; False for calls made
+            about a document rather than while processing it
+
+    Returns:
+        The response of ``fn``; its exceptions are raised after recording the failure
+    """
+    ids = [str(document_id) for document_id in document_ids]
+    started = time.monotonic()
+    try:
+        response = fn()
+    except Exception as e:
+        latency_ms = (time.monotonic() - started) * 1000
+        record_call(LlmCall(stage, model, 0, 0, latency_ms, ids, False, type(e).__name__, document_totals))
+        raise
+    prompt_tokens, output_tokens = usage_tokens(response)
+    latency_ms = (time.monotonic() - started) * 1000
+    record_call(LlmCall(stage, model, prompt_tokens, output_tokens, latency_ms, ids, document_totals=document_totals))
+    return response
+
+
+_queue: queue.Queue[LlmCall] = queue.Queue(maxsize=QUEUE_SIZE)
+_writer: threading.Thread | None = None
+_writer_lock = threading.Lock()
+
+
+def record_call(call: LlmCall) -> None:
+    """Queue ``call`` for the background writer."""
+    global _writer
+    if not ACCOUNTING_ENABLED:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_forever, name="llm-accounting", daemon=True)
+            _writer.start()
+    try:
+        _queue.put_nowait(call)
+    except queue.Full:
+        logger.warning("LLM accounting queue full; dropping record for %s", call.model)
+
+
+def flush(timeout: float = 10.0) -> bool:
+    """Wait until queued records are written (e.g. before exiting); False on timeout."""
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return not _queue.unfinished_tasks
+
+
+def _write_forever() -> None:
+    while True:
+        calls = [_queue.get()]
+        while len(calls) < WRITE_BATCH:
+            try:
+                calls.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _write(calls)
+        except PyMongoError as e:
+            logger.warning("Failed to store %d LLM accounting records: %s", len(calls), e)
+        finally:
+            for _ in calls:
+                _queue.task_done()
+
+
+def _write(calls: list[LlmCall]) -> None:
+    get_collection(CALLS_COLLECTION).insert_many([{**asdict(call), "cost_usd": call.cost_usd} for call in calls])
+    updates = []
+    for call in calls:
+        if not call.document_totals:
+            continue
+        share = 1 / len(call.document_ids) if call.document_ids else 0.0
+        prefix = f"llm.{call.stage}"
+        for document_id in call.document_ids:
+            updates.append(
+                UpdateOne(
+                    {"_id": document_id},
+                    {
+                        "$inc": {
+                            f"{prefix}.calls": 1,
+                            f"{prefix}.prompt_tokens": call.prompt_tokens * share,
+                            f"{prefix}.output_tokens": call.output_tokens * share,
+                            f"{prefix}.cost_usd": call.cost_usd * share,
+                            f"{prefix}.latency_ms": call.latency_ms,
+                        }
+                    },
+                )
+            )
+    if updates:
+        get_status_collection().bulk_write(updates, ordered=False)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+LLM usage report
+
+Aggregates the ``llm_calls`` collection written by ``llm_accounting`` per stage
+and model: calls and failures, tokens per document, cost per 1000 documents
+and the latency distribution of successful calls.
+
+Examples:
+    uv run shared/tools/llm_report.py
+    uv run shared/tools/llm_report.py --days 7 --stage extractor
+    uv run shared/tools/llm_report.py --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import logging
+import sys
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+# Ensure the project root is on sys.path before importing 'shared'
+parent_dir = Path(__file__).parent.parent.parent
+if str(parent_dir) not in sys.path:
+    sys.path.insert(0, str(parent_dir))
+
+from shared.tools.llm_accounting import CALLS_COLLECTION  # noqa: E402
+from shared.tools.mongo import get_collection  # noqa: E402
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger("llm_report")
+
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def _percentile(ordered: list[float], q: float) -> float | None:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+def summarize(calls: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Aggregate call records per (stage, model).
+
+    Tokens and cost of a batched request count once in the totals and are shared
+    among its documents; "documents" is the number of distinct documents served.
+    """
+    groups: dict[tuple[str, str], dict[str, Any]] = {}
+    for call in calls:
+        group = groups.setdefault(
+            (call["stage"], call["model"]),
+            {"calls": 0, "failed": 0, "prompt_tokens": 0, "output_tokens": 0, "cost_usd": 0.0},
+        )
+        group.setdefault("documents", set()).update(call.get("document_ids") or [])
+        group["calls"] += 1
+        group["prompt_tokens"] += call.get("prompt_tokens", 0)
+        group["output_tokens"] += call.get("output_tokens", 0)
+        group["cost_usd"] += call.get("cost_usd", 0.0)
+        if call.get("ok", True):
+            group.setdefault("latencies", []).append(call.get("latency_ms", 0.0))
+        else:
+            group["failed"] += 1
+
+    rows = []
+    for (stage, model), group in sorted(groups.items()):
+        documents = len(group["documents"])
+        latencies = sorted(group.get("latencies", []))
+        rows.append(
+            {
+                "stage": stage,
+                "model": model,
+                "calls": group["calls"],
+                "failed": group["failed"],
+                "documents": documents,
+                "prompt_tokens": group["prompt_tokens"],
+                "output_tokens": group["output_tokens"],
+                "prompt_tokens_per_document": group["prompt_tokens"] / documents if documents else None,
+                "output_tokens_per_document": group["output_tokens"] / documents if documents else None,
+                "cost_usd": group["cost_usd"],
+                "cost_per_1k_documents_usd": group["cost_usd"] / documents * 1000 if documents else None,
+                "latency_ms": {f"p{round(q * 100)}": _percentile(latencies, q) for q in PERCENTILES},
+            }
+        )
+    return rows
+
+
+def _fmt(value: float | None, digits: int = 0) -> str:
+    return "-" if value is None else f"{value:,.{digits}f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Token, cost and latency report of LLM calls")
+    parser.add_argument("--days", type=float, default=None, help="Only calls from the last N days (default: all)")
+    parser.add_argument("--stage", default=None, help="Only this stage (e.g. extractor, agent-backend)")
+    parser.add_argument("--model", default=None, help="Only this model")
+    parser.add_argument("--json", action="store_true", help="Print the rows as JSON")
+    args = parser.parse_args()
+
+    query: dict[str, Any] = {}
+    if args.days is not None:
+        query["created_at"] = {"$gte": dt.datetime.now(tz=dt.UTC) - dt.timedelta(days=args.days)}
+    if args.stage:
+        query["stage"] = args.stage
+    if args.model:
+        query["model"] = args.model
+    rows = summarize(get_collection(CALLS_COLLECTION).find(query, {"_id": 0, "created_at": 0, "error": 0}))
+
+    if args.json:
+        logger.info(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        logger.info("No LLM calls recorded")
+        return
+    for row in rows:
+        latency = row["latency_ms"]
+        logger.info(
+            "%s / %s: %s calls (%s failed), %s documents\n"
+            "  tokens per document: %s prompt, %s output\n"
+            "  cost: $%s total, $%s per 1000 documents\n"
+            "  latency ms: p50 %s, p90 %s, p95 %s, p99 %s",
+            row["stage"],
+            row["model"],
+            _fmt(row["calls"]),
+            _fmt(row["failed"]),
+            _fmt(row["documents"]),
+            _fmt(row["prompt_tokens_per_document"]),
+            _fmt(row["output_tokens_per_document"]),
+            _fmt(row["cost_usd"], 2),
+            _fmt(row["cost_per_1k_documents_usd"], 2),
+            _fmt(latency["p50"]),
+            _fmt(latency["p90"]),
+            _fmt(latency["p95"]),
+            _fmt(latency["p99"]),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Deadlines, hedged requests and circuit breaking for LLM calls.
+
+``ResilientCaller.call(fn)`` runs ``fn`` (one LLM request) on a worker thread
+and:
+
+- gives up after ``deadline`` seconds (``DeadlineExceededError``);
+- sends the same request a second time once the first has been running for
+  longer than the p95 latency of recent successful calls, and returns
+  whichever answer arrives first (the other one is discarded);
+- fails fast with ``CircuitOpenError`` while the circuit breaker of its name
+  is open, i.e. after ``failure_threshold`` consecutive failures, until one
+  probe call succeeds after ``reset_timeout`` seconds.
+
+Breakers are kept per name in this module, so every thread (and every
+processor) of a process that calls the same model shares one breaker. The
+functions passed in must be safe to run twice, which holds for stateless
+generate/completion calls.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Consecutive failures that open a breaker, and seconds before it lets a probe call through
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+# Hedge after this percentile of recent latencies, once enough calls have been seen
+HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in {"1", "true", "yes"}
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a model whose breaker is open."""
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when no answer arrived within the call deadline."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half-open -> closed)."""
+
+    def __init__(
+        self, name: str, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET_SECONDS
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if self._probing else "open"
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through (at most one probe while half-open)."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            retry_after = self._opened_at + self.reset_timeout - time.monotonic()
+            if retry_after > 0 or self._probing:
+                raise CircuitOpenError(self.name, max(retry_after, 1.0))
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Circuit '%s' closed", self.name)
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def cancel_probe(self) -> None:
+        """Let another probe through after a call that neither proved nor disproved recovery."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                logger.warning("Circuit '%s' opened after %d failures", self.name, self._failures)
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """The process-wide breaker for ``name``."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+class LatencyTracker:
+    """Latencies of the most recent successful calls."""
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int = HEDGE_MIN_SAMPLES) -> float | None:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientCaller:
+    """
+    Runs LLM calls with a deadline, hedging and the shared breaker of ``name``.
+
+    Args:
+        name: Breaker name, e.g. the model ("gemini-2.0-flash")
+        deadline: Seconds before a call is given up
+        hedge: Whether to send a second request after the p95 latency
+        passthrough: Exceptions that are raised as they are and do not count as a
+            breaker failure (e.g. 429 quota errors that the caller backs off on)
+        max_workers: Threads running requests (two per call while hedging)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        deadline: float,
+        hedge: bool = HEDGE_ENABLED,
+        passthrough: tuple[type[BaseException], ...] = (),
+        max_workers: int = 32,
+    ) -> None:
+        self.name = name
+        self.deadline = deadline
+        self.hedge = hedge
+        self.passthrough = passthrough
+        self.breaker = get_breaker(name)
+        self.latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"llm-{name}")
+
+    @staticmethod
+    def _timed(fn: Callable[[], T]) -> tuple[T, float]:
+        started = time.monotonic()
+        result = fn()
+        return result, time.monotonic() - started
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """
+        Run ``fn`` within the deadline, hedged, unless the breaker is open.
+
+        Raises:
+            CircuitOpenError: The breaker is open; nothing was sent
+            DeadlineExceededError: No answer within the deadline
+            Exception: The error of the last failed request
+        """
+        self.breaker.before_call()
+        started = time.monotonic()
+        hedge_after = self.latency.percentile(HEDGE_PERCENTILE) if self.hedge else None
+        running: set[Future[tuple[T, float]]] = {self._executor.submit(self._timed, fn)}
+        launched = 1
+        error: BaseException | None = None
+        while running:
+            now = time.monotonic()
+            timeout = started + self.deadline - now
+            if timeout <= 0:
+                break
+            if hedge_after is not None and launched == 1:
+                timeout = min(timeout, max(0.0, started + hedge_after - now))
+            done, running = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:  # noqa: BLE001
+                    error = e
+                    continue
+                self.breaker.record_success()
+                self.latency.record(elapsed)
+                return result
+            if not done and hedge_after is not None and launched == 1:
+                logger.debug("Hedging '%s' call after %.2fs", self.name, hedge_after)
+                running.add(self._executor.submit(self._timed, fn))
+                launched += 1
+        if error is not None and not running:
+            if isinstance(error, self.passthrough):
+                # Says nothing about the health of the model
+                self.breaker.cancel_probe()
+                raise error
+            self.breaker.record_failure()
+            raise error
+        self.breaker.record_failure()
+        raise DeadlineExceededError(f"No answer from '{self.name}' within {self.deadline:.0f}s")
@@ -0,0 +1,47 @@
+"""Shared MongoDB access for the pipeline services.
+
+Connection settings come from MONGO_URI, or from MONGO_HOST/MONGO_PORT/
+MONGO_USER/MONGO_PASSWORD/MONGO_AUTH_DB when no URI is given. The client is
+created lazily and reused by every helper in the process.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any
+
+from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+__all__ = ["get_client", "get_collection", "get_database", "mongo_uri"]
+
+_mongo_client: MongoClient | None = None
+
+
+def mongo_uri() -> str:
+    uri = os.getenv("MONGO_URI")
+    if uri:
+        return uri
+    host = os.getenv("MONGO_HOST", "mongodb")
+    port = os.getenv("MONGO_PORT", "27017")
+    db = os.getenv("MONGO_DB", "overheid")
+    user = os.getenv("MONGO_USER", "mongoadmin")
+    pwd = os.getenv("MONGO_PASSWORD", "mongopass")
+    auth_db = os.getenv("MONGO_AUTH_DB", "admin")
+    return f"mongodb://{user}:{pwd}@{host}:{port}/{db}?authSource={auth_db}"
+
+
+def get_client() -> MongoClient:
+    global _mongo_client
+    if _mongo_client is None:
+        _mongo_client = MongoClient(mongo_uri())
+    return _mongo_client
+
+
+def get_database() -> Database[Any]:
+    return get_client()[os.getenv("MONGO_DB", "overheid")]
+
+
+def get_collection(name: str) -> Collection[Any]:
+    return get_database()[name]
@@ -0,0 +1,62 @@
+"""Reuse of stored results for near-duplicate documents.
+
+Validation flags a document that is a near-copy of an already indexed one:
+
+    payload["near_duplicate"] = {"document_id": "<earlier document>", "similarity": 0.97}
+
+The metadata extractor then loads what data storage kept for the earlier
+document instead of calling Gemini again, and the embedding generator reuses
+the vectors of the earlier chunks whose text did not change. Lookups are best-effort: when the earlier document is
+not stored (yet) or MongoDB fails, the stage simply does its normal work.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any
+
+from pymongo.errors import PyMongoError
+
+from shared.models.messages import AppMessage
+from shared.tools.mongo import get_collection
+
+__all__ = ["near_duplicate_of", "stored_chunks", "stored_message"]
+
+logger = logging.getLogger(__name__)
+
+NEAR_DUPLICATE_REUSE = os.getenv("NEAR_DUPLICATE_REUSE", "true").lower() in {"true", "1", "yes"}
+
+
+def near_duplicate_of(message: AppMessage) -> str | None:
+    """Id of the earlier document this one duplicates, when reuse is enabled."""
+    if not NEAR_DUPLICATE_REUSE or message.data is None:
+        return None
+    match = (message.data.payload or {}).get("near_duplicate")
+    return match.get("document_id") if isinstance(match, dict) else None
+
+
+def stored_message(document_id: str) -> AppMessage | None:
+    """The stored message of a document (as written by data storage), or None."""
+    try:
+        doc = get_collection(os.getenv("MONGO_COLLECTION", "messages")).find_one(
+            {"data.id": document_id}, {"data.payload.extracted_text": 0}
+        )
+    except PyMongoError as e:
+        logger.warning("Could not load stored document %s: %s", document_id, e)
+        return None
+    return AppMessage.parse(doc) if doc else None
+
+
+def stored_chunks(document_id: str) -> list[dict[str, Any]]:
+    """The stored chunks (text, embedding, metadata) of a document, in chunk order."""
+    try:
+        cursor = (
+            get_collection(os.getenv("MONGO_CHUNKS_COLLECTION", "chunks"))
+            .find({"document_id": document_id}, {"_id": 0, "text": 1, "embedding": 1, "metadata": 1})
+            .sort("chunk_id", 1)
+        )
+        return list(cursor)
+    except PyMongoError as e:
+        logger.warning("Could not load stored chunks of %s: %s", document_id, e)
+        return []
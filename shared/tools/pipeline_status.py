@@ -16,6 +16,9 @@ Schema (Mongo collection 'pipeline_status'):
      data-storage: { ... },
      search-index: { ... },
      notification: { ... }
+  },
+  llm: {                         # Added by llm_accounting for stages that call an LLM
+     extractor: { calls, prompt_tokens, output_tokens, cost_usd, latency_ms }
   }
 }
 
@@ -28,40 +31,18 @@ import datetime as dt
 import os
 from typing import Any
 
-from pymongo import MongoClient, ReturnDocument
+from pymongo import ReturnDocument
 from pymongo.collection import Collection
 
-__all__ = ["get_status_collection", "update_status", "upsert_initial"]
-
-_mongo_client: MongoClient | None = None
-
-
-def _mongo_uri() -> str:
-    uri = os.getenv("MONGO_URI")
-    if uri:
-        return uri
-    host = os.getenv("MONGO_HOST", "mongodb")
-    port = os.getenv("MONGO_PORT", "27017")
-    db = os.getenv("MONGO_DB", "overheid")
-    user = os.getenv("MONGO_USER", "mongoadmin")
-    pwd = os.getenv("MONGO_PASSWORD", "mongopass")
-    auth_db = os.getenv("MONGO_AUTH_DB", "admin")
-    return f"mongodb://{user}:{pwd}@{host}:{port}/{db}?authSource={auth_db}"
-
-
-def _client() -> MongoClient:
-    global _mongo_client
-    if _mongo_client is None:
-        _mongo_client = MongoClient(_mongo_uri())
-    return _mongo_client
+from shared.tools.mongo import get_collection
 
+__all__ = ["get_status_collection", "update_status", "upsert_initial"]
 
 _DEF_COLL = os.getenv("MONGO_STATUS_COLLECTION", "pipeline_status")
 
 
 def get_status_collection() -> Collection[Any]:
-    db_name = os.getenv("MONGO_DB", "overheid")
-    return _client()[db_name][_DEF_COLL]
+    return get_collection(_DEF_COLL)
 
 
 def upsert_initial(document_id: str, initial_state: str = "uploaded", **extra: Any) -> dict[str, Any]:
@@ -0,0 +1,100 @@
+"""
+Client-side rate limiting for calls to external model APIs.
+
+``RateLimiter`` combines three limits, shared by all threads of a process:
+
+- a semaphore on the number of calls in flight;
+- a token bucket for requests per minute;
+- a token bucket for (estimated) model tokens per minute.
+
+``pause`` makes every caller wait, e.g. after the API answered 429, so that
+the threads back off together instead of each retrying into the same quota.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` units are available (0 when they are)."""
+        self._refill(now)
+        # A request larger than the bucket only has to wait for a full bucket
+        amount = min(amount, self.capacity)
+        return 0.0 if self.available >= amount else (amount - self.available) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Limits calls in flight, requests per minute and tokens per minute.
+
+    Args:
+        max_in_flight: Maximum concurrent calls (0 = unlimited)
+        requests_per_minute: Request quota (0 = unlimited)
+        tokens_per_minute: Token quota (0 = unlimited)
+    """
+
+    def __init__(self, max_in_flight: int = 0, requests_per_minute: float = 0, tokens_per_minute: float = 0) -> None:
+        self._semaphore = threading.BoundedSemaphore(max_in_flight) if max_in_flight > 0 else None
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+
+    def _reserve(self, tokens: int) -> None:
+        """Block until a request of ``tokens`` fits both buckets, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._paused_until - now
+                if self._requests is not None:
+                    delay = max(delay, self._requests.wait_time(1, now))
+                if self._tokens is not None:
+                    delay = max(delay, self._tokens.wait_time(tokens, now))
+                if delay <= 0:
+                    if self._requests is not None:
+                        self._requests.take(1)
+                    if self._tokens is not None:
+                        self._tokens.take(tokens)
+                    return
+            time.sleep(delay)
+
+    @contextmanager
+    def slot(self, tokens: int = 0) -> Iterator[None]:
+        """Hold one in-flight slot for the duration of a call of about ``tokens`` tokens."""
+        if self._semaphore is not None:
+            self._semaphore.acquire()
+        try:
+            self._reserve(tokens)
+            yield
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every new call for ``seconds``."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        logger.warning("Rate limited by the API; pausing new calls for %.1fs", seconds)
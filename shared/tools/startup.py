@@ -0,0 +1,92 @@
+"""
+Startup phases and readiness of a service.
+
+A service that needs seconds of preparation (loading a model, warming it up)
+wraps each step in ``StartupReport.phase`` and calls ``ready()`` once it can
+serve. ``ready()`` logs how long every phase took and writes the report as
+JSON to the readiness file, whose existence is what the container
+healthcheck tests:
+
+    healthcheck:
+      test: ["CMD", "test", "-f", "/tmp/ready"]
+
+The file is removed when the report is created, so a restarted container is
+not reported ready before it has prepared again.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+__all__ = ["READINESS_FILE", "StartupReport"]
+
+logger = logging.getLogger(__name__)
+
+# Written once the service is ready to consume messages
+READINESS_FILE = os.getenv("READINESS_FILE", "/tmp/ready")
+
+
+def _process_age() -> float | None:
+    """Seconds since this process started (Linux), which covers the interpreter start and the imports."""
+    try:
+        # Field 22 of /proc/self/stat is the start time in clock ticks after boot; the command name may contain spaces
+        fields = Path("/proc/self/stat").read_text().rsplit(")", 1)[1].split()
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - started
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupReport:
+    """
+    Durations of the startup phases of ``service``.
+
+    Args:
+        service: Name in the log and the report
+        readiness_file: File written by ``ready()``, or None for none
+    """
+
+    def __init__(self, service: str, readiness_file: str | None = READINESS_FILE) -> None:
+        self.service = service
+        self.readiness_file = Path(readiness_file) if readiness_file else None
+        self.phases: dict[str, float] = {}
+        age = _process_age()
+        if age is not None:
+            self.phases["interpreter and imports"] = age
+        if self.readiness_file is not None:
+            self.readiness_file.unlink(missing_ok=True)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def ready(self) -> None:
+        """Log the report and write the readiness file."""
+        logger.info(
+            "%s ready after %.2fs: %s",
+            self.service,
+            self.total,
+            ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items()),
+        )
+        if self.readiness_file is not None:
+            report = {
+                "service": self.service,
+                "total_seconds": round(self.total, 3),
+                "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+            }
+            self.readiness_file.parent.mkdir(parents=True, exist_ok=True)
+            self.readiness_file.write_text(json.dumps(report))
@@ -0,0 +1,118 @@
+import threading
+import time
+from typing import Any
+
+import pytest
+
+from shared.models.messages import AppMessage
+from shared.tools import ServiceBusPublisher as publisher_module
+from shared.tools.MessageHandler import MessageHandler
+
+
+class FakeSender:
+    def __init__(self) -> None:
+        self.sent: list[Any] = []
+        self.sending = 0
+        self.overlapped = False
+        self.closed = False
+        self.fail_next = False
+
+    def send_messages(self, message: Any) -> None:
+        if self.closed:
+            raise RuntimeError("sender closed")
+        if self.fail_next:
+            self.fail_next = False
+            raise RuntimeError("link detached")
+        self.sending += 1
+        self.overlapped |= self.sending > 1
+        time.sleep(0.001)
+        self.sent.append(message)
+        self.sending -= 1
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.senders: list[FakeSender] = []
+        self.closed = False
+
+    def get_topic_sender(self, topic_name: str) -> FakeSender:
+        self.senders.append(FakeSender())
+        return self.senders[-1]
+
+    def close(self) -> None:
+        self.closed = True
+        for sender in self.senders:
+            sender.close()
+
+
+@pytest.fixture
+def client(monkeypatch: pytest.MonkeyPatch) -> FakeClient:
+    client = FakeClient()
+    monkeypatch.setattr(publisher_module.ServiceBusClient, "from_connection_string", lambda _conn: client)
+    return client
+
+
+def message(document_id: str) -> AppMessage:
+    return AppMessage.parse({"data": {"id": document_id, "name": f"{document_id}.pdf"}})
+
+
+def test_threads_share_one_open_sender(client: FakeClient) -> None:
+    publisher = publisher_module.ServiceBusPublisher("Endpoint=sb://test/", "data-storage")
+    results: list[bool] = []
+    threads = [
+        threading.Thread(target=lambda i=i: results.append(publisher.publish_message(message(f"doc-{i}"))))
+        for i in range(16)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [True] * 16
+    assert len(client.senders) == 1
+    assert len(client.senders[0].sent) == 16
+    assert not client.senders[0].overlapped
+    assert not client.closed
+
+    # A failed send is reported and the sender replaced for the next message
+    client.senders[0].fail_next = True
+    assert not publisher.publish_message(message("doc-x"))
+    assert publisher.publish_message(message("doc-y"))
+    assert len(client.senders) == 2
+
+    publisher.close()
+    assert client.closed
+
+
+def test_failed_publish_fails_the_message() -> None:
+    class Processor:
+        def process(self, msg: AppMessage) -> AppMessage:
+            return msg
+
+    def publish(_msg: AppMessage) -> None:
+        raise RuntimeError("Failed to publish to data-storage")
+
+    assert MessageHandler(Processor(), lambda _msg: None).handle_message(message("doc-1"))
+    assert not MessageHandler(Processor(), publish).handle_message(message("doc-1"))
+
+
+def test_on_published_runs_only_after_the_output_was_published() -> None:
+    class Processor:
+        def process(self, msg: AppMessage) -> AppMessage:
+            return msg
+
+    def publish(_msg: AppMessage) -> None:
+        raise RuntimeError("Failed to publish to validation")
+
+    published: list[str | None] = []
+
+    def on_published(msg: AppMessage) -> None:
+        published.append(msg.data.id if msg.data else None)
+
+    assert not MessageHandler(Processor(), publish, on_published).handle_message(message("doc-1"))
+    assert published == []
+    assert MessageHandler(Processor(), lambda _msg: None, on_published).handle_message(message("doc-2"))
+    assert published == ["doc-2"]
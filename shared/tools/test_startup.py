@@ -0,0 +1,25 @@
+import json
+import time
+from pathlib import Path
+
+from shared.tools.startup import StartupReport
+
+
+def test_readiness_file_is_written_only_when_ready(tmp_path: Path) -> None:
+    ready = tmp_path / "ready"
+    ready.write_text("stale, from before a restart")
+
+    startup = StartupReport("embedding-generator", readiness_file=str(ready))
+    assert not ready.exists()
+    with startup.phase("model load"):
+        time.sleep(0.02)
+    with startup.phase("warm-up"):
+        pass
+    assert not ready.exists()
+
+    startup.ready()
+    report = json.loads(ready.read_text())
+    assert report["service"] == "embedding-generator"
+    assert report["phases"]["model load"] >= 0.02
+    assert {"model load", "warm-up"} <= set(report["phases"])
+    assert report["total_seconds"] >= report["phases"]["model load"]
@@ -0,0 +1,56 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from shared.tools.vector_codec import decode_vector_chunks, encode_vector_chunks  # noqa: E402
+
+DOCUMENT_METADATA = {
+    "document_id": "stcrt-2024-12345",
+    "source": "officielebekendmakingen",
+    "name": "stcrt-2024-12345.pdf",
+    "official_title": "Regeling van de Minister van Financiën tot vaststelling van de rentepercentages",
+    "keywords": ["belastingrente", "invorderingsrente"],
+}
+
+
+def make_chunks(count: int, dim: int = 384) -> list[dict]:
+    rng = np.random.default_rng(7)
+    return [
+        {
+            "text": f"Artikel {i}. De rente bedraagt {i} procent.",
+            "metadata": {"chunk_id": i, "total_chunks": count},
+            "embedding": rng.standard_normal(dim).astype(np.float32),
+        }
+        for i in range(count)
+    ]
+
+
+def test_float32_round_trip_is_exact_and_applies_document_metadata() -> None:
+    chunks = make_chunks(5)
+    decoded = decode_vector_chunks(json.loads(json.dumps(encode_vector_chunks(chunks, DOCUMENT_METADATA))))
+    assert [c["embedding"] for c in decoded] == [c["embedding"].tolist() for c in chunks]
+    assert decoded[3]["metadata"] == {"chunk_id": 3, "total_chunks": 5, **DOCUMENT_METADATA}
+
+
+def test_float16_is_close_and_message_is_much_smaller() -> None:
+    chunks = make_chunks(50)
+    legacy = json.dumps(encode_vector_chunks(chunks, DOCUMENT_METADATA, "json"))
+    packed = json.dumps(encode_vector_chunks(chunks, DOCUMENT_METADATA, "float32"))
+    half = json.dumps(encode_vector_chunks(chunks, DOCUMENT_METADATA, "float16"))
+    assert len(legacy) / len(packed) > 3.5 and len(legacy) / len(half) > 6
+
+    decoded = np.array([c["embedding"] for c in decode_vector_chunks(json.loads(half))])
+    expected = np.stack([c["embedding"] for c in chunks])
+    assert np.allclose(decoded, expected, atol=1e-2)
+
+
+def test_original_list_form_is_decoded_unchanged() -> None:
+    legacy = encode_vector_chunks(make_chunks(2), DOCUMENT_METADATA, "json")
+    assert decode_vector_chunks(legacy) == legacy
+    with pytest.raises(ValueError):
+        decode_vector_chunks({"format": "packed-v1", "dtype": "float32", "dim": 3, "vectors": "AAAA", "chunks": [{}]})
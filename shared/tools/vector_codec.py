@@ -0,0 +1,94 @@
+"""Compact transport of chunk embeddings in ``payload["vector_chunks"]``.
+
+The embedding generator used to send every chunk as ``{"text", "metadata",
+"embedding": [floats]}``: about 20 bytes of JSON per dimension, and the
+document metadata repeated in every chunk. The packed form sends the vectors
+of all chunks as one base64 block of contiguous little-endian float32 (or
+float16) values and the document metadata once:
+
+    {
+        "format": "packed-v1",
+        "dtype": "float32",
+        "dim": 384,
+        "vectors": "<base64 of count * dim values>",
+        "document_metadata": {"document_id": ..., "official_title": ..., ...},
+        "chunks": [{"text": ..., "metadata": {"chunk_id": 0, ...}}, ...],
+    }
+
+``decode_vector_chunks`` turns either form back into the list of chunks that
+data storage writes to MongoDB.
+"""
+
+from __future__ import annotations
+
+import base64
+from typing import Any
+
+import numpy as np
+
+__all__ = ["DTYPES", "decode_vector_chunks", "encode_vector_chunks"]
+
+FORMAT = "packed-v1"
+DTYPES = ("float32", "float16")
+
+
+def encode_vector_chunks(
+    chunks: list[dict[str, Any]], document_metadata: dict[str, Any], dtype: str = "float32"
+) -> dict[str, Any] | list[dict[str, Any]]:
+    """
+    Pack chunks with an ``embedding`` (array or list) each.
+
+    Args:
+        chunks: ``{"text", "metadata", "embedding"}`` per chunk, metadata without the document fields
+        document_metadata: Fields shared by every chunk; they override chunk metadata on decoding
+        dtype: "float32", "float16", or "json" for the original list form
+
+    Returns:
+        The packed payload, or the list of chunks with float lists for ``dtype="json"``
+    """
+    if dtype == "json":
+        return [
+            {
+                "text": chunk["text"],
+                "metadata": {**chunk.get("metadata", {}), **document_metadata},
+                "embedding": np.asarray(chunk["embedding"]).tolist(),
+            }
+            for chunk in chunks
+        ]
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown vector dtype '{dtype}'; expected one of {', '.join(DTYPES)} or json")
+    vectors = np.stack([np.asarray(chunk["embedding"]) for chunk in chunks]).astype(np.dtype(dtype).newbyteorder("<"))
+    return {
+        "format": FORMAT,
+        "dtype": dtype,
+        "dim": int(vectors.shape[1]),
+        "vectors": base64.b64encode(np.ascontiguousarray(vectors).tobytes()).decode("ascii"),
+        "document_metadata": document_metadata,
+        "chunks": [{"text": chunk["text"], "metadata": chunk.get("metadata", {})} for chunk in chunks],
+    }
+
+
+def decode_vector_chunks(value: Any) -> list[dict[str, Any]]:
+    """
+    Chunks with ``embedding`` as a list of floats, from the packed or the original form.
+
+    Raises:
+        ValueError: Unknown format or a vector block that does not match the chunks
+    """
+    if not value:
+        return []
+    if isinstance(value, list):
+        return value
+    if value.get("format") != FORMAT:
+        raise ValueError(f"Unknown vector_chunks format '{value.get('format')}'")
+    dtype = np.dtype(value["dtype"]).newbyteorder("<")
+    chunks = value["chunks"]
+    vectors = np.frombuffer(base64.b64decode(value["vectors"]), dtype=dtype)
+    if vectors.size != len(chunks) * value["dim"]:
+        raise ValueError(f"Vector block of {vectors.size} values does not match {len(chunks)} x {value['dim']}")
+    rows = vectors.reshape(len(chunks), value["dim"]).astype(np.float32).tolist()
+    document_metadata = value.get("document_metadata") or {}
+    return [
+        {"text": chunk["text"], "metadata": {**chunk.get("metadata", {}), **document_metadata}, "embedding": row}
+        for chunk, row in zip(chunks, rows, strict=True)
+    ]